@@ -0,0 +1,102 @@
+"""
+API worker process for multi-worker mode (backend_runner.py with API_WORKERS > 1).
+
+uvicorn runs API_WORKERS copies of this app on the public port. None of them
+talks to the broker or holds trading state; that all lives in the engine
+process (main.py). A worker:
+
+- serves /api/tokens itself from the shared-memory quote table (quote_table.py):
+  each new table version is copied once, and bodies are encoded once per
+  (version, watchlist) with the engine's version numbers and SNAPSHOT_BOOT_ID,
+  so ETags agree across workers and with the engine
+- forwards every other request to the engine over the IPC channel (ipc.py)
+
+/api/tokens is forwarded as well when the engine has to act: the table is
+stale (the engine then fetches inline), the watchlist is unknown to this
+worker, or this worker has not renewed its lease on the watchlist recently
+(the engine's get_tokens subscribes it).
+"""
+import asyncio
+import os
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+
+from ipc import IpcClient, parse_address
+from market_data import token_rows
+from quote_table import SharedQuoteTable
+from reference_data import ReferenceData
+from snapshot_cache import SnapshotCache
+from watchlists import WatchlistStore
+
+QUOTE_MAX_AGE_SECONDS = float(os.getenv("QUOTE_MAX_AGE_SECONDS", "3"))
+WATCH_LEASE_SECONDS = float(os.getenv("WATCH_LEASE_SECONDS", "30"))
+
+app = FastAPI(title="Antigravity Trader API worker")
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+table = SharedQuoteTable(os.environ["QUOTE_TABLE"])
+engine = IpcClient(parse_address(os.environ["ENGINE_IPC"]), bytes.fromhex(os.environ["ENGINE_AUTHKEY"]))
+watchlists = WatchlistStore()
+reference = ReferenceData()
+snapshot = SnapshotCache(lambda quotes, view: token_rows(quotes, watchlists.get(view[0]) or [], reference.symbols),
+                         gzip_min_bytes=int(os.getenv("TOKENS_GZIP_MIN_BYTES", "2048")))
+_seen = {"ref": 0, "watch": 0}
+_renewed: dict[str, float] = {}  # watchlist -> when a request for it last went through the engine
+
+
+def _sync() -> bool:
+    """Adopt whatever the engine published since the last call; False if its data is stale."""
+    version, updated, ref_version, watch_version = table.meta()
+    if watch_version != _seen["watch"]:
+        watchlists.reload()
+        _seen["watch"] = watch_version
+    if ref_version != _seen["ref"]:
+        reference.load()
+        _seen["ref"] = ref_version
+    if version != snapshot.version:
+        news = table.read(snapshot.version)
+        if news is not None:
+            snapshot.update(news[2], version=news[0])
+    return time.time() - updated <= QUOTE_MAX_AGE_SECONDS
+
+
+async def _forward(request: Request) -> Response:
+    msg = ("http", request.method, request.url.path, request.url.query.encode(),
+           list(request.headers.raw), await request.body())
+    try:
+        status, headers, body = await asyncio.get_running_loop().run_in_executor(None, lambda: engine.request(*msg))
+    except (OSError, EOFError) as e:
+        return Response(content=f'{{"detail": "Engine unavailable: {e}"}}'.encode(), status_code=503,
+                        media_type="application/json")
+    return Response(content=body, status_code=status,
+                    headers={k.decode(): v.decode() for k, v in headers if k.lower() != b"content-length"})
+
+
+@app.get("/api/tokens")
+async def get_tokens(request: Request, watchlist: str = "default"):
+    fresh = _sync()
+    symbols = watchlists.get(watchlist)
+    now = time.time()
+    if not fresh or symbols is None or now - _renewed.get(watchlist, 0.0) > WATCH_LEASE_SECONDS / 3:
+        _renewed[watchlist] = now
+        return await _forward(request)
+    enc = snapshot.encoded((watchlist, watchlists.revision(watchlist))) if symbols else None
+    if enc is None or enc.body == b"[]":
+        return await _forward(request)
+    status, body, headers = snapshot.negotiate(
+        enc, request.headers.get("if-none-match"), request.headers.get("accept-encoding"))
+    return Response(content=body, status_code=status, media_type="application/json", headers=headers)
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def forward(request: Request, path: str):
+    return await _forward(request)
@@ -13,8 +13,10 @@ This module is designed to be language-agnostic in structure but implemented in
 It does not depend on FastAPI; you can wire it into the backend or run as a standalone service.
 """
 
+from array import array
 from dataclasses import dataclass, field
-from typing import List, Dict, Callable, Optional, Tuple
+from typing import List, Dict, Callable, Iterator, Optional, Tuple, Union
+import threading
 import time
 
 
@@ -34,6 +36,127 @@ class MarketTick:
     timestamp: float      # epoch seconds
 
 
+# Process-wide token ids so batches store a 4-byte id instead of a string per tick
+_token_ids: Dict[str, int] = {}
+_token_names: List[str] = []
+_token_lock = threading.Lock()
+
+
+def token_id(token: str) -> int:
+    tid = _token_ids.get(token)
+    if tid is None:
+        with _token_lock:
+            tid = _token_ids.get(token)
+            if tid is None:
+                tid = _token_ids[token] = len(_token_names)
+                _token_names.append(token)
+    return tid
+
+
+def token_name(tid: int) -> str:
+    return _token_names[tid]
+
+
+class TickRow:
+    """Read-only view of one row of a TickBatch; quacks like MarketTick."""
+    __slots__ = ("_b", "_i")
+
+    def __init__(self, batch: "TickBatch", index: int):
+        self._b = batch
+        self._i = index
+
+    @property
+    def token(self) -> str:
+        return _token_names[self._b.token_id[self._i]]
+
+    @property
+    def ltp(self) -> float:
+        return self._b.ltp[self._i]
+
+    @property
+    def open(self) -> float:
+        return self._b.open[self._i]
+
+    @property
+    def high(self) -> float:
+        return self._b.high[self._i]
+
+    @property
+    def low(self) -> float:
+        return self._b.low[self._i]
+
+    @property
+    def volume(self) -> int:
+        return self._b.volume[self._i]
+
+    @property
+    def timestamp(self) -> float:
+        return self._b.timestamp[self._i]
+
+    def to_tick(self) -> MarketTick:
+        return MarketTick(token=self.token, ltp=self.ltp, open=self.open, high=self.high,
+                          low=self.low, volume=self.volume, timestamp=self.timestamp)
+
+
+class TickBatch:
+    """
+    Column-oriented ticks for one snapshot: typed arrays instead of one object per
+    tick. Iterating yields TickRow views, so per-tick strategies work unchanged;
+    strategies that expose a .batch(batch) function read the columns directly.
+    """
+    __slots__ = ("token_id", "ltp", "open", "high", "low", "volume", "timestamp")
+
+    def __init__(self):
+        self.token_id = array("I")
+        self.ltp = array("d")
+        self.open = array("d")
+        self.high = array("d")
+        self.low = array("d")
+        self.volume = array("q")
+        self.timestamp = array("d")
+
+    @classmethod
+    def from_quotes(cls, quotes: Dict[str, Dict], timestamp: float) -> "TickBatch":
+        """From a normalize_quotes() snapshot (symbol -> {ltp, open, high, low, volume})."""
+        b = cls()
+        tid, ltp, open_, high, low, vol = b.token_id, b.ltp, b.open, b.high, b.low, b.volume
+        for s, q in quotes.items():
+            tid.append(token_id(s))
+            ltp.append(q["ltp"])
+            open_.append(q["open"])
+            high.append(q["high"])
+            low.append(q["low"])
+            vol.append(q["volume"] or 0)
+        b.timestamp = array("d", [timestamp]) * len(tid)
+        return b
+
+    def append(self, token: str, ltp: float, open: float, high: float, low: float,
+               volume: int, timestamp: float) -> None:
+        self.token_id.append(token_id(token))
+        self.ltp.append(ltp)
+        self.open.append(open)
+        self.high.append(high)
+        self.low.append(low)
+        self.volume.append(volume)
+        self.timestamp.append(timestamp)
+
+    def __len__(self) -> int:
+        return len(self.token_id)
+
+    def row(self, index: int) -> TickRow:
+        return TickRow(self, index)
+
+    def token(self, index: int) -> str:
+        return _token_names[self.token_id[index]]
+
+    def __iter__(self) -> Iterator[TickRow]:
+        for i in range(len(self.token_id)):
+            yield TickRow(self, i)
+
+
+Ticks = Union[List[MarketTick], TickBatch]
+
+
 @dataclass
 class TokenAutoBuyConfig:
     """Runtime-configurable token selection for auto-buy."""
@@ -72,16 +195,42 @@ class ExecutionLog:
 # Strategy & Validation Hooks
 # -----------------------------
 
-def simple_breakout_strategy(tick: MarketTick) -> StrategySignal:
+# Fraction of the session high that LTP must exceed to count as a breakout.
+# Tune with param_sweep.py rather than by hand.
+BREAKOUT_THRESHOLD = 0.995
+
+
+def simple_breakout_strategy(tick: MarketTick, threshold: float = BREAKOUT_THRESHOLD) -> StrategySignal:
     """
     Example strategy: BUY on breakout above recent high threshold.
     Replace with your actual strategy logic.
     """
-    if tick.ltp > tick.high * 0.995:  # near high
+    if tick.ltp > tick.high * threshold:  # near high
         return StrategySignal(token=tick.token, signal="BUY", score=0.7, reason="Near session high breakout")
     return StrategySignal(token=tick.token, signal="NONE", score=0.0, reason="No breakout")
 
 
+def _breakout_batch(batch: TickBatch, threshold: float = BREAKOUT_THRESHOLD) -> List[Tuple[int, StrategySignal]]:
+    """Column form of simple_breakout_strategy: (row, signal) for rows that signal."""
+    return [
+        (i, StrategySignal(token=batch.token(i), signal="BUY", score=0.7, reason="Near session high breakout"))
+        for i, (ltp, high) in enumerate(zip(batch.ltp, batch.high))
+        if ltp > high * threshold
+    ]
+
+
+# Engines use the batch form when ticks arrive as a TickBatch; rows that do not
+# signal never get a row view or a StrategySignal allocated.
+simple_breakout_strategy.batch = _breakout_batch
+
+
+# Outcomes place_buy_order may report besides a plain success/failure bool
+ORDER_PLACED = "placed"
+ORDER_DUPLICATE = "duplicate"              # this signal already has an order
+ORDER_NO_MARGIN = "insufficient_margin"    # refused by the caller's margin check
+ORDER_FAILED = "failed"
+
+
 def estimate_order_cost(token: str, ltp: float, quantity: int) -> float:
     """
     Estimate notional cost for margin validation.
@@ -109,10 +258,10 @@ class NotifyAutoBuyEngine:
     def __init__(
         self,
         token_config: List[TokenAutoBuyConfig],
-        get_latest_ticks: Callable[[], List[MarketTick]],
+        get_latest_ticks: Callable[[], Ticks],
         get_margin: Callable[[], MarginSnapshot],
         send_notification: Callable[[str, Dict], None],
-        place_buy_order: Callable[[str, int], Tuple[bool, str]],
+        place_buy_order: Callable[[str, int], Tuple[Union[bool, str], str]],
         strategy_fn: Callable[[MarketTick], StrategySignal] = simple_breakout_strategy,
         log: Optional[ExecutionLog] = None,
     ) -> None:
@@ -123,6 +272,9 @@ class NotifyAutoBuyEngine:
         self.place_buy_order = place_buy_order
         self.strategy_fn = strategy_fn
         self.log = log or ExecutionLog()
+        # Last step: every token evaluated, and token -> signal for those that signalled
+        self.evaluated: set = set()
+        self.signals: Dict[str, str] = {}
 
     def update_token_config(self, config: List[TokenAutoBuyConfig]) -> None:
         """Runtime update of token selection and flags."""
@@ -171,8 +323,28 @@ class NotifyAutoBuyEngine:
             return
 
         # Place order (safe: only BUY path, quantity from config)
-        ok, order_id = self.place_buy_order(signal.token, cfg.quantity)
-        if ok:
+        outcome, order_id = self.place_buy_order(signal.token, cfg.quantity)
+        if outcome is True or outcome is False:
+            outcome = ORDER_PLACED if outcome else ORDER_FAILED
+        if outcome == ORDER_DUPLICATE:
+            # The signal is still on and already has its order; nothing to report
+            self.log.add(f"Auto-Buy skipped: {signal.token} signal already ordered ({order_id})")
+        elif outcome == ORDER_NO_MARGIN:
+            self.log.add(f"Auto-Buy blocked for {signal.token}: {order_id}")
+            self.send_notification(
+                "insufficient_margin",
+                {
+                    "token": signal.token,
+                    "needed": est_cost,
+                    "available": margin.available,
+                    "quantity": cfg.quantity,
+                    "message": order_id,
+                },
+            )
+        elif outcome == ORDER_PLACED:
+            # Later ticks in this step must see the margin this order committed
+            margin.available -= est_cost
+            margin.utilized += est_cost
             self.log.add(f"Auto-Buy executed for {signal.token}, qty={cfg.quantity}, order_id={order_id}")
             self.send_notification(
                 "order_placed",
@@ -182,23 +354,44 @@ class NotifyAutoBuyEngine:
             self.log.add(f"Auto-Buy failed for {signal.token}: {order_id}")
             self.send_notification("order_failed", {"token": signal.token, "error": order_id})
 
-    def step(self) -> ExecutionLog:
+    def step(self, ticks: Optional[Ticks] = None) -> ExecutionLog:
         """
         Process one evaluation step:
-        - Pull latest ticks
+        - Pull latest ticks (unless the caller already fetched them)
         - Evaluate strategy
         - Send notifications for all qualifying tokens
         - Attempt auto-buy where enabled and margin allows
         Returns the execution log for inspection.
         """
-        ticks = self.get_latest_ticks()
+        if ticks is None:
+            ticks = self.get_latest_ticks()
+        return self.act(ticks, self.evaluate(ticks))
+
+    def evaluate(self, ticks: Ticks) -> List[Tuple[Union[MarketTick, TickRow], StrategySignal]]:
+        """
+        Strategy only: (tick, signal) pairs for act(). Touches no engine state, so a
+        caller may run it on another thread (e.g. while a StrategyPool works).
+        """
+        batch_fn = getattr(self.strategy_fn, "batch", None)
+        if batch_fn is not None and isinstance(ticks, TickBatch):
+            # Only signalling rows are materialised; a NONE signal never reaches auto-buy
+            return [(ticks.row(i), sig) for i, sig in batch_fn(ticks)]
+        return [(tick, self.strategy_fn(tick)) for tick in ticks]
+
+    def act(self, ticks: Ticks, results: List[Tuple[Union[MarketTick, TickRow], StrategySignal]]) -> ExecutionLog:
+        """Notify and auto-buy on evaluate()'s results; runs where notifications and orders live."""
         margin = self.get_margin()
         self.log.add(f"Fetched {len(ticks)} ticks; margin available={margin.available:.2f}")
 
-        for tick in ticks:
-            sig = self.strategy_fn(tick)
+        if isinstance(ticks, TickBatch):
+            self.evaluated = {ticks.token(i) for i in range(len(ticks))}
+        else:
+            self.evaluated = {tick.token for tick in ticks}
+        self.signals = {}
+        for tick, sig in results:
             # Notify for any non-NONE signals (or notify all if desired)
             if sig.signal != "NONE":
+                self.signals[sig.token] = sig.signal
                 self._notify(sig, tick)
             # Auto-Buy path (BUY only, strict controls)
             self._try_autobuy(sig, tick, margin)
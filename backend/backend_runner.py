@@ -1,9 +1,18 @@
 """
 Backend Runner - Entry point for packaged backend executable
 This allows the backend to run without command-line arguments
+
+API_WORKERS=1 (default) runs everything in one process as before. With
+API_WORKERS=N > 1 the backend splits into
+  - one engine process: main.py (broker, poller, auto-buy, orders) on
+    127.0.0.1:ENGINE_PORT, publishing quotes to shared memory and serving IPC
+  - N uvicorn worker processes running api_worker.py on port 8000
 """
 import sys
 import os
+import time
+import socket
+import multiprocessing
 
 # Add the current directory to Python path for imports to work
 if getattr(sys, 'frozen', False):
@@ -16,17 +25,100 @@ else:
 sys.path.insert(0, application_path)
 
 import uvicorn
-from main import app
+
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+ENGINE_PORT = int(os.getenv("ENGINE_PORT", "8001"))
+
+
+def run_engine():
+    uvicorn.run("main:app", host="127.0.0.1", port=ENGINE_PORT, log_level="warning", access_log=False)
+
+
+def wait_for_engine(engine: multiprocessing.Process, timeout: float = 60.0) -> bool:
+    """Block until the engine has created the quote table and accepts IPC connections."""
+    from multiprocessing.connection import Client
+    from ipc import parse_address
+    from quote_table import SharedQuoteTable
+
+    address = parse_address(os.environ["ENGINE_IPC"])
+    authkey = bytes.fromhex(os.environ["ENGINE_AUTHKEY"])
+    deadline = time.time() + timeout
+    while time.time() < deadline and engine.is_alive():
+        try:
+            SharedQuoteTable(os.environ["QUOTE_TABLE"]).shm.close()
+            Client(address, authkey=authkey).close()
+            return True
+        except (FileNotFoundError, ConnectionError, OSError):
+            time.sleep(0.2)
+    return False
+
+
+def run_api_worker(sock: socket.socket):
+    config = uvicorn.Config("api_worker:app", log_level="warning", access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def bind_api_socket(host: str = "127.0.0.1", port: int = 8000) -> socket.socket:
+    # Created with an explicit IPPROTO_TCP: asyncio only sets TCP_NODELAY on accepted
+    # connections when the listener's proto is TCP, and uvicorn's own workers= socket
+    # (proto 0) leaves Nagle on, adding ~40 ms per keep-alive response.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_multi_worker():
+    # Shared by the engine and every worker through the environment
+    os.environ.setdefault("QUOTE_TABLE", f"agt_quotes_{os.getpid()}")
+    os.environ.setdefault("ENGINE_IPC", "127.0.0.1:8765")
+    os.environ["ENGINE_AUTHKEY"] = os.urandom(16).hex()
+    os.environ["SNAPSHOT_BOOT_ID"] = f"{int(time.time()):x}{os.getpid():x}"
+
+    engine = multiprocessing.Process(target=run_engine, name="engine")
+    engine.start()
+    if not wait_for_engine(engine):
+        engine.terminate()
+        sys.exit("Engine process failed to start")
+
+    sock = bind_api_socket()
+    workers = []
+    print(f"Engine ready; starting {API_WORKERS} API workers")
+    try:
+        while engine.is_alive():
+            # Replace workers that died (crash or kill); the engine keeps all state
+            workers = [w for w in workers if w.is_alive()]
+            while len(workers) < API_WORKERS:
+                w = multiprocessing.Process(target=run_api_worker, args=(sock,), name="api-worker")
+                w.start()
+                workers.append(w)
+            time.sleep(1.0)
+        print("Engine process exited; stopping API workers")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for w in workers:
+            w.terminate()
+        engine.terminate()
+        for p in workers + [engine]:
+            p.join(10)
+        sock.close()
+
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     print("Starting Antigravity Trader Backend...")
     print("Server running on http://127.0.0.1:8000")
-    
-    uvicorn.run(
-        app, 
-        host="127.0.0.1", 
-        port=8000, 
-        log_level="info",
-        access_log=False  # Disable access logs for cleaner output
-    )
 
+    if API_WORKERS > 1:
+        run_multi_worker()
+    else:
+        from main import app
+        uvicorn.run(
+            app,
+            host="127.0.0.1",
+            port=8000,
+            log_level="info",
+            access_log=False  # Disable access logs for cleaner output
+        )
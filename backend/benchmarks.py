@@ -0,0 +1,411 @@
+"""
+Micro-benchmarks for backend hot paths
+
+Usage:
+  python benchmarks.py                              # run everything, print a table
+  python benchmarks.py --filter engine              # only cases whose name contains 'engine'
+  python benchmarks.py --save bench/baseline.json   # store a machine-readable baseline
+  python benchmarks.py --compare bench/baseline.json --fail-on-regression
+
+Cases cover quote parsing in get_tokens/_get_latest_ticks, NotifyAutoBuyEngine.step()
+at several universe sizes, StrategyPool batch round trips, OrderTracker inserts and
+daily counts, CredentialStore round-trips, bulk_export CSV writing, ExitMonitor quote
+checks, screener scans and option-chain analytics.
+The broker is replaced by a fixed response so only our own code is timed;
+databases and files go to a temp dir.
+
+Each case reports the median time per operation over several repeats. Baselines
+are JSON: {"meta": {...}, "results": {name: {"median_us", "min_us", "ops_per_sec"}}}.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+# Isolate every store the backend touches before importing it
+_TMP = tempfile.mkdtemp(prefix="agt-bench-")
+os.environ["LOCALAPPDATA"] = _TMP
+os.environ.setdefault("MSTOCK_BROKER", "mock")
+os.environ["TICK_RECORDER"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ENGINE_SIZES = (10, 100, 1000, 2500)
+QUOTE_SIZES = (32, 2500)
+
+Case = Tuple[str, Callable[[], object], int]
+_registry: List[Callable[[], List[Case]]] = []
+
+
+def benchmark(fn: Callable[[], List[Case]]):
+    """Register a case factory. Factories do their setup and return (name, op, number) tuples."""
+    _registry.append(fn)
+    return fn
+
+
+def _universe(n: int) -> List[str]:
+    from mock_broker import mock_universe
+    return mock_universe(n)
+
+
+def _ltp_response(symbols: List[str]) -> Dict[str, Dict]:
+    resp = {}
+    for i, s in enumerate(symbols):
+        ltp = 100.0 + i % 50
+        resp[s] = {"ltp": ltp, "open": ltp - 1, "high": ltp + 0.2, "low": ltp - 2,
+                   "volume": 1000 + i, "previousClose": ltp - 0.5}
+    return resp
+
+
+class _FixedBroker:
+    """Returns a prebuilt LTP response so parsing is measured without network or mock latency."""
+    is_connected = True
+    api_key = "bench"
+
+    def __init__(self, resp):
+        self.resp = resp
+
+    def get_data_smart(self, symbols, mode="full"):
+        return self.resp, "exchange_symbol"
+
+
+# -----------------------------
+# Cases
+# -----------------------------
+
+@benchmark
+def quote_parsing() -> List[Case]:
+    import main
+    from market_data import normalize_quotes
+    from snapshot_cache import SnapshotCache
+    from starlette.requests import Request
+
+    cases: List[Case] = []
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    for n in QUOTE_SIZES:
+        symbols = _universe(n)
+        resp = _ltp_response(symbols)
+        as_list = [{"symbol": s.split(":", 1)[1], **v} for s, v in resp.items()]
+        number = max(1, 20_000 // n)
+
+        name = f"bench{n}"
+        main.watchlists.save(name, symbols)
+
+        def use(symbols=symbols, resp=resp, name=name):
+            main.mstock = _FixedBroker(resp)
+            main.live_enabled = True
+            # Only this case's watchlist is subscribed, so the poll fetches exactly n symbols
+            if len(main.subscriptions.symbols()) != len(symbols):
+                for owner in list(main.subscriptions.to_dict()["owners"]):
+                    main.subscriptions.unsubscribe(owner)
+                main._ui_revisions.clear()
+                main.subscriptions.subscribe(f"ui:{name}", symbols)
+
+        def get_tokens(symbols=symbols, resp=resp, headers=(), name=name):
+            use(symbols, resp, name)
+            request = Request({"type": "http", "headers": list(headers)})
+            return loop.run_until_complete(main.get_tokens(request, watchlist=name))
+
+        def get_tokens_cold(symbols=symbols, resp=resp, name=name):
+            # Fresh cache every call: fetch, parse and serialize like a poll cycle
+            main.token_snapshot = SnapshotCache(main.token_snapshot.build)
+            return get_tokens(symbols, resp, name=name)
+
+        def get_tokens_304(symbols=symbols, resp=resp, name=name):
+            use(symbols, resp, name)
+            etag = main.token_snapshot.encoded((name, main.watchlists.revision(name))).etag
+            return get_tokens(symbols, resp, [(b"if-none-match", etag.encode())], name)
+
+        def latest_ticks(symbols=symbols, resp=resp, name=name):
+            use(symbols, resp, name)
+            main.token_snapshot.updated = 0.0  # force the inline fetch path
+            return main._get_latest_ticks()
+
+        cases += [
+            (f"normalize_quotes.dict[{n}]", lambda r=resp, s=symbols: normalize_quotes(r, s), number),
+            (f"normalize_quotes.list[{n}]", lambda r=as_list, s=symbols: normalize_quotes(r, s), number),
+            (f"get_tokens.cold[{n}]", get_tokens_cold, number),
+            (f"get_tokens[{n}]", get_tokens, number),
+            (f"get_tokens.304[{n}]", get_tokens_304, number),
+            (f"_get_latest_ticks[{n}]", latest_ticks, number),
+        ]
+    return cases
+
+
+@benchmark
+def engine_step() -> List[Case]:
+    from auto_trade import NotifyAutoBuyEngine, TokenAutoBuyConfig, MarketTick, TickBatch, MarginSnapshot
+
+    cases: List[Case] = []
+    for n in ENGINE_SIZES:
+        now = time.time()
+        symbols = _universe(n)
+        # Every third tick sits near its high so the notify/auto-buy paths are exercised
+        quotes = {s: {"ltp": 100.0 if i % 3 else 100.9, "open": 99.0, "high": 101.0, "low": 98.0,
+                      "volume": 1000} for i, s in enumerate(symbols)}
+        ticks = [MarketTick(token=s, timestamp=now, **q) for s, q in quotes.items()]
+        batch = TickBatch.from_quotes(quotes, now)
+        selection = [TokenAutoBuyConfig(token=s, autobuy=(i % 10 == 0), quantity=1) for i, s in enumerate(symbols)]
+
+        for label, source in (("", ticks), (".batch", batch)):
+            engine = NotifyAutoBuyEngine(
+                token_config=selection,
+                get_latest_ticks=lambda t=source: t,
+                get_margin=lambda: MarginSnapshot(available=1e12),
+                send_notification=lambda kind, payload: None,
+                place_buy_order=lambda token, qty: (True, "BENCH"),
+            )
+
+            def step(engine=engine):
+                engine.step()
+                engine.log.entries.clear()
+
+            cases.append((f"engine.step{label}[{n}]", step, max(1, 5_000 // n)))
+        cases.append((f"TickBatch.from_quotes[{n}]", lambda q=quotes: TickBatch.from_quotes(q, now),
+                      max(1, 20_000 // n)))
+    return cases
+
+
+@benchmark
+def strategy_pool() -> List[Case]:
+    from auto_trade import TickBatch, simple_breakout_strategy
+    from strategy_pool import StrategyPool
+
+    pool = StrategyPool(simple_breakout_strategy, workers=2)
+    cases: List[Case] = []
+    for n in ENGINE_SIZES:
+        quotes = {s: {"ltp": 100.0 if i % 3 else 100.9, "open": 99.0, "high": 101.0, "low": 98.0,
+                      "volume": 1000} for i, s in enumerate(_universe(n))}
+        batch = TickBatch.from_quotes(quotes, time.time())
+        pool.batch(batch)  # workers learn the symbol names once
+        cases.append((f"strategy_pool.batch[{n}]", lambda b=batch: pool.batch(b), max(1, 2_000 // n)))
+    return cases
+
+
+@benchmark
+def order_tracker() -> List[Case]:
+    from order_tracker import OrderTracker
+
+    tracker = OrderTracker(db_path="bench_orders.db")
+    seq = iter(range(10**9))
+
+    def insert():
+        i = next(seq)
+        tracker.add_order(order_id=f"B-{i}", symbol="NSE:INFY", quantity=1,
+                          order_type="BUY", strategy="bench", price=100.0)
+
+    # Seed a realistic day's worth of rows so the count query has something to scan
+    for _ in range(500):
+        insert()
+    return [
+        ("order_tracker.add_order", insert, 200),
+        ("order_tracker.get_today_count", tracker.get_today_count, 200),
+    ]
+
+
+@benchmark
+def credential_store() -> List[Case]:
+    from credential_store import credential_store as store
+
+    def round_trip():
+        store.save_mstock_credentials("api-key", "user", "secret")
+        return store.get_mstock_credentials()
+
+    return [
+        ("credential_store.round_trip", round_trip, 100),
+        ("credential_store.get", store.get_mstock_credentials, 200),
+    ]
+
+
+@benchmark
+def bulk_export_rows() -> List[Case]:
+    import bulk_export
+
+    rows = [{'symbol': f"NSE:MOCK{i % 2500:04d}", 'interval': '1d', 'ts': 1_700_000_000_000 + i,
+             'open': 100.0, 'high': 101.0, 'low': 99.0, 'close': 100.5, 'volume': 1000}
+            for i in range(100_000)]
+    path = os.path.join(_TMP, "exports", "bench.csv")
+
+    def write():
+        # write_csv prints a summary line per call; keep the table readable
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            bulk_export.write_csv(path, rows)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    return [("bulk_export.write_csv[100k rows]", write, 1)]
+
+
+@benchmark
+def exit_monitor() -> List[Case]:
+    from exit_monitor import ExitMonitor, ExitRule
+
+    # 5000 protections over 500 symbols, none triggering: the steady-state tick cost
+    symbols = _universe(500)
+    monitor = ExitMonitor(lambda p, reason, ltp: None)
+    for i in range(5000):
+        monitor.arm(symbols[i % 500], 1, 100.0, ExitRule(stop_pct=2 + i % 5, target_pct=5 + i % 7,
+                                                         trailing=bool(i % 2)))
+    quotes = [{s: {"ltp": 100.0 + ((i + j) % 3) * 0.1} for j, s in enumerate(symbols)} for i in range(3)]
+    seq = iter(range(10**9))
+
+    def tick():
+        monitor.on_quotes(quotes[next(seq) % 3])
+
+    return [("exit_monitor.on_quotes[5000 levels]", tick, 200)]
+
+
+@benchmark
+def screener_scan() -> List[Case]:
+    from screener import Screener
+
+    symbols = _universe(2500)
+    screener = Screener()
+    snapshots = []
+    for k in range(8):
+        snapshots.append({s: {"ltp": 100.0 + (i * 7 + k) % 40 - 20, "open": 99.0 + i % 5, "high": 121.0,
+                              "low": 79.0, "volume": 1000 * (k + 1) + (i % 13) * k * 50,
+                              "prev_close": 100.0} for i, s in enumerate(symbols)})
+    for snap in snapshots:
+        screener.update(snap)
+    seq = iter(range(10**9))
+
+    def update():
+        screener.update(snapshots[next(seq) % len(snapshots)])
+
+    def scan(name):
+        screener._results = {}  # measure the ranking, not the per-version cache
+        return screener.scan(name, limit=20, min_volume=1)
+
+    return [
+        ("screener.update[2500]", update, 20),
+        ("screener.scan.gainers[2500]", lambda: scan("gainers"), 200),
+        ("screener.scan.volume_spike[2500]", lambda: scan("volume_spike"), 200),
+    ]
+
+
+@benchmark
+def option_chain() -> List[Case]:
+    import numpy as np
+    from options import bs_price, chain_analytics
+
+    # 101 strikes x call/put around spot 24,600 with a month to expiry, priced off a smile
+    spot, r = 24600.0, 0.065
+    strikes = np.repeat(np.arange(22100.0, 27150.0, 50.0), 2)
+    call = np.tile([True, False], len(strikes) // 2)
+    T = np.full(len(strikes), 30 / 365)
+    sigma = 0.12 + 0.5 * (np.log(strikes / spot)) ** 2
+    price = bs_price(spot, strikes, T, r, sigma, call)
+
+    return [(f"options.chain_analytics[{len(strikes)}]",
+             lambda: chain_analytics(spot, strikes, T, r, call, price), 200)]
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+
+def measure(op: Callable[[], object], number: int, repeat: int) -> Dict[str, float]:
+    op()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        samples.append((time.perf_counter() - start) / number)
+    median = statistics.median(samples)
+    return {
+        "median_us": round(median * 1e6, 3),
+        "min_us": round(min(samples) * 1e6, 3),
+        "ops_per_sec": round(1.0 / median, 1) if median > 0 else 0.0,
+    }
+
+
+def run(filter_: str = "", repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for factory in _registry:
+        # Silence import-time and per-call prints from the backend modules
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            cases = factory()
+            for name, op, number in cases:
+                if filter_ and filter_ not in name:
+                    continue
+                results[name] = measure(op, number, repeat)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        for name, _, _ in cases:
+            if name in results:
+                r = results[name]
+                print(f"{name:<40} {r['median_us']:>14.1f} us {r['ops_per_sec']:>14.1f} ops/s")
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str, threshold: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f).get("results", {})
+    regressions = []
+    print(f"\nComparison against {baseline_path} (regression threshold {threshold:.0f}%)")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<40} {'new':>14}")
+            continue
+        delta = (r["median_us"] - base["median_us"]) / base["median_us"] * 100.0
+        flag = ""
+        if delta > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif delta < -threshold:
+            flag = "  faster"
+        print(f"{name:<40} {delta:>+13.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filter', default='', help='Only run cases whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help='Write results as a JSON baseline')
+    parser.add_argument('--compare', help='Compare against a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Regression threshold in percent')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{'case':<40} {'median':>17} {'throughput':>20}")
+    results = run(args.filter, args.repeat)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "created": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "machine": platform.machine(),
+                    "cpu_count": os.cpu_count(),
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"✓ Baseline saved to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
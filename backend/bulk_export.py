@@ -8,6 +8,8 @@ Usage:
 Runs only when market is closed (local time 16:00–09:00 by default), unless --force is supplied.
 Fetches historical data for 2500+ NSE-listed stocks using mStock SDK when available,
 and writes CSV with per-stock OHLC series and basic metadata.
+Candle requests are paced by the 'bulk' rate class (BROKER_BULK_RATE calls/second), so
+a run leaves most of the account's API quota to the live server.
 """
 import argparse
 import csv
@@ -41,7 +43,7 @@ def fetch_historical(client: MStockClient, symbol: str, interval: str, points: i
     """
     rows: List[Dict[str, Any]] = []
     try:
-        resp = client.get_candles(symbol=symbol, interval=interval, count=points)
+        resp = client.get_candles(symbol=symbol, interval=interval, count=points, rate_class='bulk')
         if isinstance(resp, list):
             for c in resp:
                 rows.append({
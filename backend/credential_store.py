@@ -9,6 +9,16 @@ from cryptography.fernet import Fernet
 import base64
 from hashlib import sha256
 
+# The first account keeps the original 'mstock' row; extra accounts are 'mstock:<name>'
+PRIMARY_ACCOUNT = 'primary'
+
+
+def _service(account=None):
+    if not account or account == PRIMARY_ACCOUNT:
+        return 'mstock'
+    return f'mstock:{account}'
+
+
 class CredentialStore:
     def __init__(self):
         # Store database in user's AppData folder (Windows)
@@ -59,8 +69,8 @@ class CredentialStore:
         conn.commit()
         conn.close()
     
-    def save_mstock_credentials(self, api_key: str, user_id: str, password: str):
-        """Save mStock credentials encrypted"""
+    def save_mstock_credentials(self, api_key: str, user_id: str, password: str, account: str = None):
+        """Save mStock credentials encrypted (account=None is the primary account)"""
         credentials = f"{api_key}|||{user_id}|||{password}"
         encrypted = self.cipher.encrypt(credentials.encode())
         
@@ -70,21 +80,21 @@ class CredentialStore:
         cursor.execute('''
             INSERT OR REPLACE INTO credentials (service, encrypted_data)
             VALUES (?, ?)
-        ''', ('mstock', encrypted.decode()))
+        ''', (_service(account), encrypted.decode()))
         
         conn.commit()
         conn.close()
         
         print(f"✓ Credentials saved securely to: {self.db_path}")
     
-    def get_mstock_credentials(self):
+    def get_mstock_credentials(self, account: str = None):
         """Retrieve and decrypt mStock credentials"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
             SELECT encrypted_data FROM credentials WHERE service = ?
-        ''', ('mstock',))
+        ''', (_service(account),))
         
         result = cursor.fetchone()
         conn.close()
@@ -92,8 +102,11 @@ class CredentialStore:
         if not result:
             return None
         
+        return self._decrypt(result[0])
+    
+    def _decrypt(self, encrypted_data):
         try:
-            decrypted = self.cipher.decrypt(result[0].encode())
+            decrypted = self.cipher.decrypt(encrypted_data.encode())
             api_key, user_id, password = decrypted.decode().split('|||')
             return {
                 'api_key': api_key,
@@ -104,6 +117,28 @@ class CredentialStore:
             print(f"Error decrypting credentials: {e}")
             return None
     
+    def list_mstock_accounts(self):
+        """All stored mStock accounts, primary first: [{'account', 'api_key', 'user_id', 'password'}]"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT service, encrypted_data FROM credentials
+            WHERE service = 'mstock' OR service LIKE 'mstock:%'
+            ORDER BY service != 'mstock', service
+        ''')
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        accounts = []
+        for service, encrypted_data in rows:
+            creds = self._decrypt(encrypted_data)
+            if creds:
+                creds['account'] = service.split(':', 1)[1] if ':' in service else PRIMARY_ACCOUNT
+                accounts.append(creds)
+        return accounts
+    
     def credentials_exist(self):
         """Check if credentials are already saved"""
         conn = sqlite3.connect(self.db_path)
@@ -118,14 +153,19 @@ class CredentialStore:
         
         return count > 0
     
-    def delete_credentials(self):
-        """Delete saved credentials (for logout/reset)"""
+    def delete_credentials(self, account: str = None):
+        """Delete saved credentials (for logout/reset); without an account, every mStock account"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute('''
-            DELETE FROM credentials WHERE service = ?
-        ''', ('mstock',))
+        if account:
+            cursor.execute('''
+                DELETE FROM credentials WHERE service = ?
+            ''', (_service(account),))
+        else:
+            cursor.execute('''
+                DELETE FROM credentials WHERE service = 'mstock' OR service LIKE 'mstock:%'
+            ''')
         
         conn.commit()
         conn.close()
@@ -0,0 +1,321 @@
+"""
+Indexed stop-loss / target / trailing-stop monitor.
+
+Each filled entry order may arm a Protection built from its StrategyConfig
+(stopLoss and target are percentages, trailingStop turns the stop into a
+trailing stop of stopLoss %). Levels live in per-symbol heaps so a quote only
+touches levels that actually trigger:
+
+- stops:   max-heap of stop prices   -> pop while top >= price
+- targets: min-heap of target prices -> pop while top <= price
+- trailing stops are kept in groups that share one running peak, each group a
+  min-heap of trail %. A trail triggers when the drawdown from the group's peak
+  reaches its %, so only the heap top is compared. A new trailing stop starts
+  its own group at the entry price; when the price makes a new high every group
+  whose peak is at or below it is merged into one, so the number of groups
+  stays small and raising the peak is O(1) for all members.
+
+Short positions use the same books with prices negated, so "stop above" and
+"target below" need no separate code path.
+
+Triggered protections are handed to place_exit(protection, reason, price);
+heap entries of protections that exited through another leg are dropped
+lazily and compacted once they outnumber the live ones.
+"""
+import heapq
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+ARMED = "ARMED"
+TRIGGERED = "TRIGGERED"
+CANCELLED = "CANCELLED"
+
+
+@dataclass
+class ExitRule:
+    stop_pct: float = 0.0
+    target_pct: float = 0.0
+    trailing: bool = False
+
+    @classmethod
+    def from_config(cls, config) -> "ExitRule":
+        """From a StrategyConfig (pydantic model or dict)."""
+        get = config.get if isinstance(config, dict) else lambda k, d=None: getattr(config, k, d)
+        return cls(stop_pct=float(get("stopLoss", 0) or 0), target_pct=float(get("target", 0) or 0),
+                   trailing=bool(get("trailingStop", False)))
+
+    @property
+    def active(self) -> bool:
+        return self.stop_pct > 0 or self.target_pct > 0
+
+
+@dataclass
+class Protection:
+    id: str
+    symbol: str
+    quantity: int
+    direction: int  # +1 long (exit SELL), -1 short (exit BUY)
+    entry: float
+    stop: Optional[float] = None
+    target: Optional[float] = None
+    trail_pct: Optional[float] = None
+    strategy: str = ""
+    account: str = ""
+    status: str = ARMED
+    reason: str = ""
+    trigger_price: Optional[float] = None
+    created: float = field(default_factory=time.time)
+
+    @property
+    def exit_side(self) -> str:
+        return "SELL" if self.direction > 0 else "BUY"
+
+    def to_dict(self) -> Dict:
+        d = asdict(self)
+        d["exit_side"] = self.exit_side
+        return d
+
+
+class _Book:
+    """Levels for one (symbol, direction). Prices are direction-adjusted (x = direction * ltp)."""
+    __slots__ = ("stops", "targets", "groups", "stale")
+
+    def __init__(self):
+        self.stops: List[Tuple[float, str]] = []    # (-stop_x, id)
+        self.targets: List[Tuple[float, str]] = []  # (target_x, id)
+        self.groups: List[list] = []                # [peak_x, heap of (trail_pct, id)]
+        self.stale = 0
+
+    def size(self) -> int:
+        return len(self.stops) + len(self.targets) + sum(len(g[1]) for g in self.groups)
+
+
+class ExitMonitor:
+    def __init__(self, place_exit: Callable[[Protection, str, float], None]):
+        self.place_exit = place_exit
+        self._lock = threading.Lock()
+        self._last_id = 0  # ids never repeat, across restarts too (see restore)
+        self.books: Dict[str, Dict[int, _Book]] = {}
+        self.active: Dict[str, Protection] = {}
+        self.closed: List[Protection] = []
+        self.max_closed = 500
+
+    def arm(self, symbol: str, quantity: int, entry: float, rule: ExitRule,
+            direction: int = 1, strategy: str = "", account: str = "") -> Optional[Protection]:
+        """Register protective levels for a filled entry; None if the rule has no levels."""
+        if not rule.active or entry <= 0 or quantity <= 0:
+            return None
+        with self._lock:
+            self._last_id += 1
+            p = Protection(id=f"P{self._last_id:06d}", symbol=symbol, quantity=int(quantity),
+                           direction=1 if direction > 0 else -1, entry=float(entry), strategy=strategy,
+                           account=account)
+            d = p.direction
+            book = self.books.setdefault(symbol, {}).setdefault(d, _Book())
+            if rule.stop_pct > 0:
+                if rule.trailing:
+                    p.trail_pct = rule.stop_pct
+                    book.groups.append([d * entry, [(rule.stop_pct / 100.0, p.id)]])
+                else:
+                    p.stop = round(entry * (1 - d * rule.stop_pct / 100.0), 4)
+                    heapq.heappush(book.stops, (-(d * p.stop), p.id))
+            if rule.target_pct > 0:
+                p.target = round(entry * (1 + d * rule.target_pct / 100.0), 4)
+                heapq.heappush(book.targets, (d * p.target, p.id))
+            self.active[p.id] = p
+        return p
+
+    def cancel(self, protection_id: str) -> bool:
+        with self._lock:
+            p = self.active.pop(protection_id, None)
+            if p is None:
+                return False
+            p.status = CANCELLED
+            self._close(p)
+            self._mark_stale(p, popped=0)
+            return True
+
+    def cancel_symbol(self, symbol: str, direction: int = 1) -> int:
+        """Cancel every armed protection on symbol (e.g. once the position is flat)."""
+        with self._lock:
+            ids = [p.id for p in self.active.values() if p.symbol == symbol and p.direction == direction]
+        return sum(self.cancel(i) for i in ids)
+
+    def symbols(self) -> List[str]:
+        """Symbols that currently have armed levels."""
+        with self._lock:
+            return list({p.symbol for p in self.active.values()})
+
+    def _close(self, p: Protection) -> None:
+        self.closed.append(p)
+        if len(self.closed) > self.max_closed:
+            del self.closed[:len(self.closed) - self.max_closed]
+
+    def _mark_stale(self, p: Protection, popped: int) -> None:
+        """Count p's remaining heap entries as stale; compact when they dominate."""
+        book = self.books.get(p.symbol, {}).get(p.direction)
+        if book is None:
+            return
+        book.stale += (p.stop is not None) + (p.target is not None) + (p.trail_pct is not None) - popped
+        if book.stale > 64 and book.stale * 2 > book.size():
+            self._compact(book)
+
+    def _compact(self, book: _Book) -> None:
+        live = self.active
+        book.stops = [e for e in book.stops if e[1] in live]
+        book.targets = [e for e in book.targets if e[1] in live]
+        heapq.heapify(book.stops)
+        heapq.heapify(book.targets)
+        for g in book.groups:
+            g[1] = [e for e in g[1] if e[1] in live]
+            heapq.heapify(g[1])
+        book.groups = [g for g in book.groups if g[1]]
+        book.stale = 0
+
+    def _scan(self, book: _Book, x: float) -> List[Tuple[str, str]]:
+        hits: List[Tuple[str, str]] = []
+        stops, targets = book.stops, book.targets
+        while stops and -stops[0][0] >= x:
+            hits.append((heapq.heappop(stops)[1], "stop_loss"))
+        while targets and targets[0][0] <= x:
+            hits.append((heapq.heappop(targets)[1], "target"))
+        if book.groups:
+            # New high: fold every group whose peak it reaches into one group at x
+            rising = [g for g in book.groups if g[0] <= x]
+            if rising:
+                if len(rising) == 1:
+                    rising[0][0] = x
+                else:
+                    merged: List[Tuple[float, str]] = []
+                    for g in rising:
+                        merged.extend(g[1])
+                    heapq.heapify(merged)
+                    book.groups = [g for g in book.groups if g[0] > x]
+                    book.groups.append([x, merged])
+            for g in book.groups:
+                peak, heap = g
+                drawdown = (peak - x) / abs(peak) if peak else 0.0
+                while heap and heap[0][0] <= drawdown:
+                    hits.append((heapq.heappop(heap)[1], "trailing_stop"))
+            if any(not g[1] for g in book.groups):
+                book.groups = [g for g in book.groups if g[1]]
+        return hits
+
+    def on_quotes(self, quotes: Dict[str, Dict]) -> List[Protection]:
+        """Check a quote snapshot; only symbols with armed levels are looked at."""
+        if not self.books or not quotes:
+            return []
+        fired: List[Tuple[Protection, str, float]] = []
+        with self._lock:
+            for symbol, books in self.books.items():
+                q = quotes.get(symbol)
+                if not q or not q.get("ltp"):
+                    continue
+                ltp = float(q["ltp"])
+                for d, book in books.items():
+                    for pid, reason in self._scan(book, d * ltp):
+                        p = self.active.pop(pid, None)
+                        if p is None:
+                            book.stale = max(0, book.stale - 1)
+                            continue
+                        p.status = TRIGGERED
+                        p.reason = reason
+                        p.trigger_price = ltp
+                        self._close(p)
+                        self._mark_stale(p, popped=1)
+                        fired.append((p, reason, ltp))
+        for p, reason, ltp in fired:
+            try:
+                self.place_exit(p, reason, ltp)
+            except Exception as e:
+                print(f"Exit placement error for {p.symbol}: {e}")
+        return [p for p, _, _ in fired]
+
+    def _trail_levels(self) -> Dict[str, float]:
+        levels: Dict[str, float] = {}
+        for books in self.books.values():
+            for d, book in books.items():
+                for peak, heap in book.groups:
+                    for pct, pid in heap:
+                        levels[pid] = round(d * (peak - pct * abs(peak)), 4)
+        return levels
+
+    def levels(self) -> Dict[str, List[float]]:
+        """symbol -> every armed stop, target and current trailing-stop price."""
+        with self._lock:
+            trail = self._trail_levels()
+            out: Dict[str, List[float]] = {}
+            for p in self.active.values():
+                for level in (p.stop, p.target, trail.get(p.id)):
+                    if level is not None:
+                        out.setdefault(p.symbol, []).append(level)
+            return out
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            trail = self._trail_levels()
+            active = []
+            for p in self.active.values():
+                item = p.to_dict()
+                if p.trail_pct is not None:
+                    item["stop"] = trail.get(p.id)
+                active.append(item)
+            return {
+                "active": active,
+                "recent_exits": [p.to_dict() for p in self.closed[-50:]],
+            }
+
+    def state(self) -> Dict:
+        """Armed protections with their trailing peaks, for a warm restart."""
+        with self._lock:
+            peaks = {pid: peak for books in self.books.values() for book in books.values()
+                     for peak, heap in book.groups for _, pid in heap}
+            active = []
+            for p in self.active.values():
+                item = asdict(p)
+                if p.id in peaks:
+                    item["peak"] = p.direction * peaks[p.id]
+                active.append(item)
+            return {"active": active, "closed": [asdict(p) for p in self.closed[-50:]],
+                    "last_id": self._last_id}
+
+    @staticmethod
+    def _id_number(pid: str) -> int:
+        try:
+            return int(pid.lstrip("P"))
+        except ValueError:
+            return 0
+
+    def restore(self, state: Dict, used_ids: Iterable[str] = ()) -> int:
+        """Re-arm protections saved by state(). New ids continue after every id seen
+        before the restart: saved, armed, recently closed and used_ids (ids still
+        referenced elsewhere, e.g. by exit order keys), so none is reissued."""
+        restored = 0
+        with self._lock:
+            for item in state.get("closed", []):
+                try:
+                    self._close(Protection(**item))
+                except TypeError:
+                    continue
+            for item in state.get("active", []):
+                item = dict(item)
+                peak = item.pop("peak", None)
+                p = Protection(**item)
+                if p.id in self.active:
+                    continue
+                d = p.direction
+                book = self.books.setdefault(p.symbol, {}).setdefault(d, _Book())
+                if p.trail_pct is not None:
+                    book.groups.append([d * (peak if peak is not None else p.entry), [(p.trail_pct / 100.0, p.id)]])
+                elif p.stop is not None:
+                    heapq.heappush(book.stops, (-(d * p.stop), p.id))
+                if p.target is not None:
+                    heapq.heappush(book.targets, (d * p.target, p.id))
+                self.active[p.id] = p
+                restored += 1
+            seen = [*self.active, *(p.id for p in self.closed), *used_ids]
+            self._last_id = max([self._last_id, int(state.get("last_id") or 0),
+                                 *(self._id_number(pid) for pid in seen)])
+        return restored
@@ -0,0 +1,129 @@
+"""
+Command channel from API workers to the engine process.
+
+Workers hold a small pool of multiprocessing.connection clients (authkey
+protected) to the engine's IpcServer and send
+
+    ("http", method, path, query_string, headers, body) -> (status, headers, body)
+
+The engine runs the request through its own FastAPI app in-process, so every
+endpoint a worker does not serve itself (orders, config, positions, ...)
+behaves exactly as in single-process mode.
+
+Each accepted connection gets a thread; requests are scheduled onto the
+engine's event loop with run_coroutine_threadsafe.
+"""
+import asyncio
+import queue
+import threading
+from multiprocessing.connection import Client, Listener
+from typing import Any, List, Tuple
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+def parse_address(value: str):
+    """'127.0.0.1:8765' -> ('127.0.0.1', 8765); anything else is a Unix socket / pipe path."""
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit() and "/" not in value and "\\" not in value:
+        return host or "127.0.0.1", int(port)
+    return value
+
+
+async def call_asgi(app, method: str, path: str, query_string: bytes, headers: Headers,
+                    body: bytes) -> Tuple[int, Headers, bytes]:
+    """Run one HTTP request through an ASGI app and collect the whole response."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query_string, "root_path": "", "headers": headers,
+        "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 0),
+    }
+    pending = [{"type": "http.request", "body": body, "more_body": False}]
+    status, out_headers, chunks = 500, [], []
+
+    async def receive():
+        return pending.pop() if pending else {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, out_headers
+        if message["type"] == "http.response.start":
+            status, out_headers = message["status"], list(message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, out_headers, b"".join(chunks)
+
+
+class IpcServer:
+    def __init__(self, address, authkey: bytes, app, loop: asyncio.AbstractEventLoop, timeout: float = 30.0):
+        self.listener = Listener(address, authkey=authkey)
+        self.app = app
+        self.loop = loop
+        self.timeout = timeout
+        self._stop = threading.Event()
+        threading.Thread(target=self._accept, name="ipc-accept", daemon=True).start()
+
+    def _accept(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn = self.listener.accept()
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"IPC accept error: {e}")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), name="ipc-conn", daemon=True).start()
+
+    def _serve(self, conn) -> None:
+        with conn:
+            while True:
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = self._handle(msg)
+                except Exception as e:
+                    reply = (500, [(b"content-type", b"text/plain")], f"IPC handler error: {e}".encode())
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def _handle(self, msg: tuple) -> Any:
+        if msg[0] != "http":
+            raise ValueError(f"unknown IPC message {msg[0]!r}")
+        _, method, path, query, headers, body = msg
+        future = asyncio.run_coroutine_threadsafe(
+            call_asgi(self.app, method, path, query, headers, body), self.loop)
+        return future.result(self.timeout)
+
+    def close(self) -> None:
+        self._stop.set()
+        self.listener.close()
+
+
+class IpcClient:
+    """Thread-safe pool of connections to the engine; one request per connection at a time."""
+
+    def __init__(self, address, authkey: bytes, size: int = 8):
+        self.address = address
+        self.authkey = authkey
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.Semaphore(size)
+
+    def request(self, *msg) -> Any:
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = Client(self.address, authkey=self.authkey)
+            try:
+                conn.send(msg)
+                reply = conn.recv()
+            except Exception:
+                conn.close()
+                raise
+            self._idle.put(conn)
+            return reply
@@ -0,0 +1,330 @@
+"""
+HTTP Load Test for the FastAPI backend
+
+Usage:
+  python loadtest.py --rate 200 --duration 30
+  python loadtest.py --rate 500 --mix tokens=60,candles=10,execute=5,notifications=20,orders=5 --json ../bench/load.json
+  python loadtest.py --url http://127.0.0.1:8000 --rate 50      # against an already running backend
+
+By default the app from main.py is started in-process on a free port with the
+broker replaced by the local mock (MSTOCK_BROKER=mock), so runs are offline and
+repeatable; MOCK_BROKER_* variables tune its latency and error rate.
+
+Requests are issued open-loop at the target rate: each one has a scheduled start
+time and latency is measured from that time, so a stalled server shows up as
+latency instead of silently lowering the offered load. The report lists
+throughput and p50/p95/p99 latency per endpoint, plus event-loop lag sampled
+inside the server process (in-process mode only).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = "tokens=50,candles=15,execute=5,notifications=20,orders=10"
+LAG_INTERVAL = 0.01  # seconds between event-loop lag probes
+
+
+def _order_body() -> bytes:
+    return json.dumps({"symbol": "NSE:INFY", "quantity": 1, "order_type": "BUY",
+                       "strategy": "loadtest", "price": 0.0}).encode()
+
+
+# name -> list of (method, path, body factory); one is picked per request
+ENDPOINTS = {
+    "tokens": [("GET", "/api/tokens", None)],
+    "candles": [("GET", "/api/candles?symbol=NSE:INFY&interval=1m&count=12", None)],
+    "execute": [("POST", "/api/execute-trade", _order_body)],
+    "notifications": [("GET", "/api/notifications", None)],
+    "orders": [("GET", "/api/orders/today", None), ("GET", "/api/orders/recent", None)],
+}
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint '{name}', expected one of {sorted(ENDPOINTS)}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+# -----------------------------
+# Minimal keep-alive HTTP/1.1 client
+# -----------------------------
+
+class _Connection:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def _ensure(self):
+        if self.writer is None or self.writer.is_closing():
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: Optional[bytes]) -> int:
+        await self._ensure()
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        if body is not None:
+            head += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + (body or b""))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("server closed connection")
+        status = int(status_line.split()[1])
+        length, chunked, close = 0, False, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            value = value.strip()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding" and "chunked" in value.lower():
+                chunked = True
+            elif name == "connection" and value.lower() == "close":
+                close = True
+        if chunked:
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif length:
+            await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status
+
+
+class LoadGenerator:
+    def __init__(self, base_url: str, rate: float, duration: float, mix: List[Tuple[str, float]],
+                 connections: int, seed: int = 1):
+        u = urlparse(base_url)
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or 80
+        self.rate = rate
+        self.duration = duration
+        self.mix = mix
+        self.connections = connections
+        self.rng = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = {name: [] for name, _ in mix}
+        self.errors: Dict[str, int] = {name: 0 for name, _ in mix}
+        self.statuses: Dict[str, Dict[int, int]] = {name: {} for name, _ in mix}
+        self.dropped = 0
+
+    async def _one(self, pool: asyncio.Queue, name: str, scheduled: float):
+        method, path, body = self.rng.choice(ENDPOINTS[name])
+        conn = await pool.get()
+        try:
+            status = await conn.request(method, path, body() if body else None)
+            self.statuses[name][status] = self.statuses[name].get(status, 0) + 1
+            if status >= 500:
+                self.errors[name] += 1
+        except Exception:
+            conn.close()
+            self.errors[name] += 1
+        finally:
+            pool.put_nowait(conn)
+        self.latencies[name].append(time.perf_counter() - scheduled)
+
+    async def run(self) -> float:
+        pool: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.connections):
+            pool.put_nowait(_Connection(self.host, self.port))
+        names = [n for n, _ in self.mix]
+        weights = [w for _, w in self.mix]
+        interval = 1.0 / self.rate
+        tasks = set()
+        start = time.perf_counter()
+        n = 0
+        while True:
+            scheduled = start + n * interval
+            if scheduled - start >= self.duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Bound outstanding requests so a dead server cannot exhaust memory
+            if len(tasks) >= self.connections * 50:
+                self.dropped += 1
+            else:
+                t = asyncio.create_task(self._one(pool, self.rng.choices(names, weights)[0], scheduled))
+                tasks.add(t)
+                t.add_done_callback(tasks.discard)
+            n += 1
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        while not pool.empty():
+            pool.get_nowait().close()
+        return elapsed
+
+
+# -----------------------------
+# In-process server with event-loop lag probe
+# -----------------------------
+
+class LagProbe:
+    """Samples how late asyncio.sleep() wakes up on the server's event loop."""
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self.active = False
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            if self.active:
+                self.samples.append(max(0.0, loop.time() - t0 - LAG_INTERVAL))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_in_process_server(probe: LagProbe):
+    os.environ.setdefault("MSTOCK_BROKER", "mock")
+    os.environ.setdefault("TICK_RECORDER", "0")
+    os.environ["LOCALAPPDATA"] = tempfile.mkdtemp(prefix="agt-load-")
+    import uvicorn
+    import main
+
+    @main.app.on_event("startup")
+    async def _start_lag_probe():
+        asyncio.create_task(probe.run())
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port,
+                                           log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline or not thread.is_alive():
+            raise RuntimeError("in-process server failed to start")
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def report(gen: LoadGenerator, elapsed: float, probe: Optional[LagProbe]) -> Dict:
+    out: Dict = {"duration_s": round(elapsed, 3), "target_rps": gen.rate, "dropped": gen.dropped, "endpoints": {}}
+    print(f"\n{'endpoint':<15}{'count':>8}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    total = 0
+    for name, lat in gen.latencies.items():
+        lat.sort()
+        total += len(lat)
+        row = {
+            "count": len(lat),
+            "errors": gen.errors[name],
+            "rps": round(len(lat) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(lat, 50) * 1000, 2),
+            "p95_ms": round(percentile(lat, 95) * 1000, 2),
+            "p99_ms": round(percentile(lat, 99) * 1000, 2),
+            "max_ms": round((lat[-1] if lat else 0.0) * 1000, 2),
+            "status": gen.statuses[name],
+        }
+        out["endpoints"][name] = row
+        print(f"{name:<15}{row['count']:>8}{row['errors']:>8}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+    out["achieved_rps"] = round(total / elapsed, 2) if elapsed else 0.0
+    print(f"\nTotal {total} requests in {elapsed:.1f}s = {out['achieved_rps']:.1f} req/s "
+          f"(target {gen.rate:.1f}, dropped {gen.dropped})")
+    if probe is not None:
+        lag = sorted(probe.samples)
+        out["event_loop_lag_ms"] = {
+            "samples": len(lag),
+            "p50": round(percentile(lag, 50) * 1000, 2),
+            "p99": round(percentile(lag, 99) * 1000, 2),
+            "max": round((lag[-1] if lag else 0.0) * 1000, 2),
+        }
+        l = out["event_loop_lag_ms"]
+        print(f"Event-loop lag: p50={l['p50']:.1f}ms p99={l['p99']:.1f}ms max={l['max']:.1f}ms ({l['samples']} samples)")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='Target a running backend instead of starting one in-process')
+    parser.add_argument('--rate', type=float, default=100.0, help='Target requests per second')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds of load')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Endpoint weights, e.g. tokens=50,orders=10')
+    parser.add_argument('--connections', type=int, default=16, help='Concurrent keep-alive connections')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='Write the report as JSON')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    probe = None
+    server = None
+    base_url = args.url
+    if not base_url:
+        probe = LagProbe()
+        print("Starting backend in-process with the mock broker...")
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            server, thread, base_url = start_in_process_server(probe)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    print(f"Driving {base_url} at {args.rate:.0f} req/s for {args.duration:.0f}s over {args.connections} connections")
+    gen = LoadGenerator(base_url, args.rate, args.duration, mix, args.connections, args.seed)
+    if probe:
+        probe.active = True
+    # Backend prints per request; keep the report readable
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        elapsed = asyncio.run(gen.run())
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    if probe:
+        probe.active = False
+
+    result = report(gen, elapsed, probe)
+    if server:
+        server.should_exit = True
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"✓ Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,54 @@
 import os
+import threading
+import time
+import uuid
 import asyncio
 import random
-from typing import List
-from fastapi import FastAPI, HTTPException
+from datetime import date
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Header, Depends, Request
+from fastapi.responses import PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 # Use absolute imports for PyInstaller compatibility
-from models import TokenData, StrategyUpdate, OrderRequest, CandleResponse, Candle
+from models import TokenData, StrategyUpdate, OrderRequest, CandleResponse, Candle, WatchlistUpdate
 from mstock_client import MStockClient
-from credential_store import credential_store
+from credential_store import credential_store, PRIMARY_ACCOUNT
+from session_pool import SessionPool, login_client
 from order_tracker import order_tracker
+from market_data import normalize_quotes, merge_ltp, merge_quotes, token_rows
+from snapshot_cache import SnapshotCache
+from quote_table import SharedQuoteTable
+from ipc import IpcServer, parse_address
+from watchlists import WatchlistStore, SubscriptionRegistry
+from poll_scheduler import PollScheduler
+from screener import Screener, SCANS
+from reference_data import ReferenceData, HISTORY_POINTS
+from options import (OptionContract, parse_option_symbol, parse_expiry, expiry_code,
+                     spot_symbol, chain_contracts, build_chain, is_expired, upcoming_expiries)
+from tick_recorder import tick_recorder, TickReplayer, replay_paths
+import metrics
+import profiler
+from order_pipeline import OrderPipeline, OrderTicket, SignalLatch, pipeline_settings, PLACED, FINAL_STATES
+from margin_ledger import MarginLedger
+from positions import PositionBook
+from warm_state import WarmState
+from exit_monitor import ExitMonitor, ExitRule, Protection
 from auto_trade import (
     NotifyAutoBuyEngine,
     TokenAutoBuyConfig,
-    MarketTick,
+    TickBatch,
     MarginSnapshot,
     ExecutionLog,
+    estimate_order_cost,
+    simple_breakout_strategy,
+    BREAKOUT_THRESHOLD,
+    ORDER_PLACED,
+    ORDER_DUPLICATE,
+    ORDER_NO_MARGIN,
+    ORDER_FAILED,
 )
+from strategy_pool import StrategyPool
 
 app = FastAPI(title="Antigravity Trader API")
 
@@ -28,38 +60,81 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(profiler.ServerTimingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Initialize mStock Client with stored credentials
 mstock = None
+live_enabled = False  # Gate live calls to avoid noisy auth failures when API key/IP not ready
+
+def _connect_broker():
+    """Create and log in the primary client; also used to reconnect after a reset."""
+    global mstock, live_enabled
+    try:
+        # Prefer encrypted credentials if present
+        stored_creds = credential_store.get_mstock_credentials()
+        mstock = MStockClient()
+        if stored_creds:
+            print("Found stored credentials, attempting mStock login...")
+            # Override with stored credentials
+            mstock.api_key = stored_creds['api_key']
+            mstock.client_code = stored_creds['user_id']
+            mstock.password = stored_creds['password']
+        else:
+            print("No stored credentials found. Trying .env variables for mStock login...")
+            # MStockClient already loaded .env; if present, login will use them
+        login_success = mstock.login()
+        # Some SDKs return None/non-boolean on success; rely on client flag
+        print(f"mStock Login Status: {login_success}")
+        if hasattr(mstock, 'is_connected'):
+            print(f"DEBUG: mStock is_connected: {mstock.is_connected}")
+        # Do NOT discard the client solely on falsy login_success. Keep for diagnostics.
+        if not login_success and not (mstock and getattr(mstock, 'is_connected', False)):
+            print("Login failed or SDK missing; keeping client for diagnostics and mock mode")
+        # Enable live mode only when API key is present and connection is up
+        if mstock and mstock.api_key and getattr(mstock, "is_connected", False):
+            live_enabled = True
+        else:
+            live_enabled = False
+            print("Live mStock disabled: missing API key or not connected; mock data will be used")
+    except Exception as e:
+        print(f"Error initializing mStock client: {e}")
+        mstock = None
+
+_connect_broker()
+
+# One session per stored account: quotes are sharded across them, orders go to their account
+session_pool = SessionPool(max_failures=int(os.getenv("SESSION_MAX_FAILURES", "3")),
+                           cooldown=float(os.getenv("SESSION_COOLDOWN_SECONDS", "30")))
 try:
-    # Prefer encrypted credentials if present
-    stored_creds = credential_store.get_mstock_credentials()
-    mstock = MStockClient()
-    if stored_creds:
-        print("Found stored credentials, attempting mStock login...")
-        # Override with stored credentials
-        mstock.api_key = stored_creds['api_key']
-        mstock.client_code = stored_creds['user_id']
-        mstock.password = stored_creds['password']
-    else:
-        print("No stored credentials found. Trying .env variables for mStock login...")
-        # MStockClient already loaded .env; if present, login will use them
-    login_success = mstock.login()
-    # Some SDKs return None/non-boolean on success; rely on client flag
-    print(f"mStock Login Status: {login_success}")
-    if hasattr(mstock, 'is_connected'):
-        print(f"DEBUG: mStock is_connected: {mstock.is_connected}")
-    # Do NOT discard the client solely on falsy login_success. Keep for diagnostics.
-    if not login_success and not (mstock and getattr(mstock, 'is_connected', False)):
-        print("Login failed or SDK missing; keeping client for diagnostics and mock mode")
-    # Enable live mode only when API key is present and connection is up
-    if os.getenv("MSTOCK_API_KEY") and mstock and getattr(mstock, "is_connected", False):
-        live_enabled = True
-    else:
-        print("Live mStock disabled: missing API key or not connected; mock data will be used")
+    session_pool.load_accounts(credential_store, primary_client=mstock)
 except Exception as e:
-    print(f"Error initializing mStock client: {e}")
-    mstock = None
+    print(f"Error loading session pool: {e}")
+
+BROKER_PROBE_SECONDS = float(os.getenv("BROKER_PROBE_SECONDS", "5"))
+metrics.broker_circuit_state.set_function(lambda: mstock.breaker.state_code() if mstock else 0)
+metrics.broker_rate_limit.set_function(lambda: mstock.governor.rate if mstock else 0)
+
+def _reconnect_primary():
+    """Log the primary account in again (new credentials or manual reconnect)."""
+    _connect_broker()
+    if mstock is not None:
+        session_pool.add(PRIMARY_ACCOUNT, mstock)
+    return bool(mstock and mstock.is_connected)
+
+async def _broker_supervisor_loop():
+    """Probe idle sessions and re-login dropped ones with backoff, off the event loop."""
+    global live_enabled
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            for session in list(session_pool.sessions.values()):
+                if hasattr(session.client, 'check_health'):
+                    await loop.run_in_executor(None, session.client.check_health)
+            live_enabled = bool(mstock and mstock.api_key and mstock.is_connected)
+        except Exception as e:
+            print(f"Broker supervisor error: {e}")
+        await asyncio.sleep(BROKER_PROBE_SECONDS)
 
 # -----------------------------
 # Auto-Buy engine wiring
@@ -68,98 +143,618 @@ auto_buy_engine = None
 auto_buy_selection: list[TokenAutoBuyConfig] = []
 auto_buy_log = ExecutionLog()
 notifications_buffer: list[dict] = []
-live_enabled = False  # Gate live calls to avoid noisy auth failures when API key/IP not ready
+# Appended from the loop, order-dispatch threads and the quote poller (exits)
+_notifications_lock = threading.Lock()
+
+# STRATEGY_WORKERS > 0 evaluates the strategy in that many processes (sharded by symbol);
+# the engine step then waits on them from an executor thread instead of the event loop
+STRATEGY_WORKERS = int(os.getenv("STRATEGY_WORKERS", "0"))
+strategy_pool = None
+
+# Replay mode: TICK_REPLAY=<glob of recorded segments> feeds logs instead of the broker
+replay_source = None
+if os.getenv("TICK_REPLAY"):
+    replay_source = TickReplayer(
+        replay_paths(os.getenv("TICK_REPLAY")),
+        speed=TickReplayer.parse_speed(os.getenv("TICK_REPLAY_SPEED", "1")),
+    )
+    print(f"Tick replay enabled: {len(replay_source.paths)} segment(s)")
+replay_quotes: dict = {}
+latest_quotes: dict = {}  # last non-empty normalized snapshot, for cost estimates
+last_quote_time = 0.0  # wall clock of the last non-empty snapshot
+# The poller and request executors both fetch; a fetch updates latest_quotes, the snapshot
+# cache, screener, positions and exits together, so fetches run one at a time
+_fetch_lock = threading.Lock()
+
+# A background poller refreshes quotes; /api/tokens serves the pre-serialized
+# snapshot and only fetches inline when the poller's data is older than this
+QUOTE_POLL_SECONDS = float(os.getenv("QUOTE_POLL_SECONDS", "1"))
+QUOTE_MAX_AGE_SECONDS = float(os.getenv("QUOTE_MAX_AGE_SECONDS", "3"))
+# Full quotes (OHLC, volume, prev close) are fetched every QUOTE_FULL_SECONDS, and whenever
+# a symbol without a quote is due; polls in between are LTP-only and merged into the snapshot
+QUOTE_FULL_SECONDS = float(os.getenv("QUOTE_FULL_SECONDS", "5"))
+last_full_time = 0.0
+token_snapshot = SnapshotCache(lambda quotes, view: _build_token_data(quotes, view),
+                               gzip_min_bytes=int(os.getenv("TOKENS_GZIP_MIN_BYTES", "2048")))
+
+# The poller fetches only the union of subscribed symbols: watchlists open in the UI
+# (leased, renewed by each /api/tokens poll), the auto-buy selection, symbols with
+# armed exits and PINNED_WATCHLISTS
+subscriptions = SubscriptionRegistry()
+WATCH_LEASE_SECONDS = float(os.getenv("WATCH_LEASE_SECONDS", "30"))
+_ui_revisions: dict[str, int] = {}  # watchlist -> revision its ui: subscription was built from
+
+# Each poll fetches at most POLL_BATCH_SYMBOLS per session; when the union is larger,
+# symbols share that budget by priority (auto-buy, positions, exits, volatility, triggers)
+poll_scheduler = PollScheduler()
+POLL_BATCH_SYMBOLS = int(os.getenv("POLL_BATCH_SYMBOLS", "500"))
+
+def _update_poll_priorities() -> None:
+    classes: dict[str, str] = {}
+    triggers: dict[str, list] = exit_monitor.levels()
+    for name in PINNED_WATCHLISTS:
+        for sym in watchlists.get(name) or []:
+            classes[sym] = "normal"
+    for sym in position_book.open_symbols() + list(triggers):
+        classes[sym] = "high"
+    for c in auto_buy_selection:
+        if c.token and c.autobuy:
+            classes[c.token] = "critical"
+            q = latest_quotes.get(c.token)
+            if q:
+                triggers.setdefault(c.token, []).append(q["high"] * BREAKOUT_THRESHOLD)
+        elif c.token and c.token not in classes:
+            classes[c.token] = "normal"
+    poll_scheduler.set_priorities(classes, triggers)
+
+# Every changed snapshot is also loaded into the screener's columns
+screener = Screener()
+
+# Prior close, 52-week range and market cap are built once a day from daily candles
+# and merged into snapshots when they are encoded, never per request
+reference_data = ReferenceData(shares_file=os.getenv("REFERENCE_SHARES_FILE"))
+REFERENCE_CHECK_SECONDS = float(os.getenv("REFERENCE_CHECK_SECONDS", "300"))
+screener.set_reference(reference_data.symbols)
+
+# Margin is synced from the broker periodically; orders reserve against it locally
+margin_ledger = MarginLedger(available=float(os.getenv("MARGIN_DEFAULT_AVAILABLE", "100000")))
+MARGIN_SYNC_SECONDS = float(os.getenv("MARGIN_SYNC_SECONDS", "30"))
+
+# Net positions fold in fills as they happen and are marked on every snapshot
+position_book = PositionBook()
+
+# Multi-worker mode (backend_runner.py with API_WORKERS > 1): this process is the engine.
+# Snapshots are mirrored into the shared-memory table QUOTE_TABLE for the API workers,
+# which forward every other request over ENGINE_IPC
+QUOTE_TABLE = os.getenv("QUOTE_TABLE")
+quote_table = None
+ipc_server = None
+
+def _publish_quotes(quotes: dict) -> None:
+    if quote_table is None:
+        return
+    if quote_table.version() != token_snapshot.version:
+        quote_table.publish(quotes, token_snapshot.version, last_quote_time or time.time())
+    else:
+        quote_table.heartbeat(last_quote_time or time.time())
+
+metrics.quote_staleness.set_function(lambda: time.time() - last_quote_time if last_quote_time else -1)
+metrics.notifications_depth.set_function(lambda: len(notifications_buffer))
+metrics.margin_available.set_function(margin_ledger.available)
+metrics.subscribed_symbols.set_function(lambda: len(subscriptions.symbols()))
+
+def _quotes_available() -> bool:
+    if replay_source:
+        return True
+    return bool(live_enabled and mstock and getattr(mstock, 'is_connected', False))
+
+def _fetch_quotes() -> tuple[dict, str]:
+    """Fetch and normalize quotes for the subscribed symbols; every live snapshot is recorded."""
+    with _fetch_lock:
+        return _poll_quotes()
+
+def _poll_quotes() -> tuple[dict, str]:
+    global last_quote_time, latest_quotes
+    if replay_source:
+        latest_quotes = replay_quotes
+        if token_snapshot.update(replay_quotes):
+            screener.update(replay_quotes)
+            _publish_quotes(replay_quotes)
+        position_book.mark(replay_quotes)
+        _arm_unpriced_entries(replay_quotes)
+        exit_monitor.on_quotes(replay_quotes)
+        return replay_quotes, "replay"
+    global last_full_time
+    symbols = list(subscriptions.symbols())
+    if not symbols:
+        return {}, "idle"
+    now = time.time()
+    _update_poll_priorities()
+    batch = poll_scheduler.select(symbols, POLL_BATCH_SYMBOLS * max(1, len(session_pool)), quoted=latest_quotes)
+    full = (any(s not in latest_quotes for s in batch) or now - last_full_time >= QUOTE_FULL_SECONDS
+            or token_snapshot.age() > QUOTE_MAX_AGE_SECONDS)
+    mode = "full" if full else "ltp"
+    metrics.quote_polls.inc(mode)
+    metrics.quote_poll_symbols.observe(len(batch))
+    if len(session_pool) > 1:
+        resp, fmt = session_pool.get_quotes(batch, mode=mode)
+    else:
+        resp, fmt = mstock.get_data_smart(batch, mode=mode)
+    with profiler.span("parse"):
+        quotes = normalize_quotes(resp, batch)
+        poll_scheduler.observe(quotes, now)
+        if quotes and not full:
+            quotes = merge_ltp(latest_quotes, quotes, symbols)
+        elif quotes and len(batch) < len(symbols):
+            quotes = merge_quotes(latest_quotes, quotes, symbols)
+    if quotes and full:
+        last_full_time = now
+    if quotes:
+        latest_quotes = quotes
+        last_quote_time = time.time()
+        tick_recorder.record(quotes, last_quote_time)
+        if token_snapshot.update(quotes):
+            screener.update(quotes)
+        _publish_quotes(quotes)
+        position_book.mark(quotes)
+        _arm_unpriced_entries(quotes)
+        exit_monitor.on_quotes(quotes)
+    return quotes, fmt
 
-def _get_latest_ticks() -> list[MarketTick]:
-    """Convert current token snapshot into MarketTick list."""
-    ticks: list[MarketTick] = []
+def _current_quotes() -> dict:
+    """The poller's latest snapshot; fetched inline only when it is stale."""
+    if not replay_source and token_snapshot.age() <= QUOTE_MAX_AGE_SECONDS:
+        return latest_quotes
+    return _fetch_quotes()[0]
+
+async def _quote_poll_loop():
+    """Refresh the quote snapshot off the event loop; requests and the engine read it."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            for owner in subscriptions.expire():
+                _ui_revisions.pop(owner.split(":", 1)[1], None)
+            if _quotes_available() and (replay_source or subscriptions.symbols()):
+                await loop.run_in_executor(None, _fetch_quotes)
+        except Exception as e:
+            print(f"Quote poll error: {e}")
+        await asyncio.sleep(QUOTE_POLL_SECONDS)
+
+def _get_latest_ticks() -> TickBatch:
+    """Convert current token snapshot into a column-oriented TickBatch."""
     try:
-        if live_enabled and mstock and mstock.is_connected:
-            resp, fmt = mstock.get_data_smart(TOKENS)
-            # Expect a dict mapping token->fields or list; normalize
-            now = asyncio.get_event_loop().time()
-            for s in TOKENS:
-                ex, sym = s.split(":", 1)
-                entry = None
-                if isinstance(resp, dict):
-                    entry = resp.get(s) or resp.get(sym)
-                elif isinstance(resp, list) and resp:
-                    # Attempt to find matching symbol in list entries
-                    for e in resp:
-                        if (e.get("symbol") == sym) or (e.get("token") == sym):
-                            entry = e
-                            break
-                if entry:
-                    ticks.append(MarketTick(
-                        token=s,
-                        ltp=float(entry.get("ltp", entry.get("price", 0.0)) or 0.0),
-                        open=float(entry.get("open", 0.0) or 0.0),
-                        high=float(entry.get("high", 0.0) or 0.0),
-                        low=float(entry.get("low", 0.0) or 0.0),
-                        volume=int(entry.get("volume", 0) or 0),
-                        timestamp=now,
-                    ))
+        if _quotes_available():
+            return TickBatch.from_quotes(_current_quotes(), last_quote_time or time.time())
         else:
             print("Live data disabled or not connected; returning empty tick list (no mock)")
     except Exception as e:
         print(f"Auto engine tick fetch error: {e}")
-    return ticks
+    return TickBatch()
 
 def _get_margin() -> MarginSnapshot:
-    # TODO: Integrate with real margin API when available
-    return MarginSnapshot(available=100000.0, utilized=0.0)
+    # Local ledger view: last broker sync minus fills and open reservations (no round-trip)
+    return margin_ledger.snapshot()
+
+def _estimate_cost(symbol: str, quantity: int, price: float = 0.0) -> float:
+    ltp = price or (latest_quotes.get(symbol) or {}).get("ltp", 0.0)
+    return estimate_order_cost(symbol, ltp, quantity)
+
+async def _margin_sync_loop():
+    """Refresh the ledger from the broker's funds API when it is available."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            if mstock and mstock.is_connected:
+                as_of = time.time()
+                res = await loop.run_in_executor(None, mstock.get_margin)
+                if res:
+                    margin_ledger.sync(res[0], res[1], as_of=as_of)
+        except Exception as e:
+            print(f"Margin sync error: {e}")
+        await asyncio.sleep(MARGIN_SYNC_SECONDS)
+
+def _refresh_reference() -> int:
+    """Build reference rows for watched and subscribed symbols not yet built today."""
+    symbols = set(subscriptions.symbols())
+    for w in watchlists.list():
+        symbols.update(w["symbols"])
+    added = reference_data.build(
+        sorted(symbols),
+        lambda s: mstock.get_candles(symbol=s, interval="1d", count=HISTORY_POINTS, rate_class="bulk"))
+    if added:
+        # Same state a quote fetch updates: do it between fetches
+        with _fetch_lock:
+            screener.set_reference(reference_data.symbols)
+            token_snapshot.touch()
+            if quote_table is not None:
+                quote_table.bump("ref_version")
+                _publish_quotes(latest_quotes)
+    return added
+
+async def _reference_loop():
+    """Daily rebuild (and fill-in for newly watched symbols) off the event loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            if not replay_source and mstock and mstock.is_connected and hasattr(mstock, "get_candles"):
+                await loop.run_in_executor(None, _refresh_reference)
+        except Exception as e:
+            print(f"Reference data refresh error: {e}")
+        await asyncio.sleep(REFERENCE_CHECK_SECONDS)
 
 def _send_notification(kind: str, payload: dict) -> None:
     # Store in buffer for retrieval; never execute trades here
-    notifications_buffer.append({"kind": kind, "payload": payload})
-    # Cap buffer size
-    if len(notifications_buffer) > 500:
-        del notifications_buffer[:len(notifications_buffer) - 500]
+    with _notifications_lock:
+        notifications_buffer.append({"kind": kind, "payload": payload})
+        # Cap buffer size
+        if len(notifications_buffer) > 500:
+            del notifications_buffer[:len(notifications_buffer) - 500]
+
+def _recent_notifications(limit: int) -> list[dict]:
+    with _notifications_lock:
+        return notifications_buffer[-limit:]
+
+def _dispatch_order(ticket: OrderTicket) -> dict:
+    """Runs on an order-pipeline worker thread: place via SDK if connected, else simulate."""
+    client = session_pool.client_for(ticket.account)
+    if ticket.account and ticket.account != PRIMARY_ACCOUNT and client is None:
+        # Orders never move to another account's funds
+        state = "out of rotation" if ticket.account in session_pool.sessions else "not configured"
+        return {"success": False, "message": f"Account '{ticket.account}' is {state}"}
+    if client is None and mstock and mstock.is_connected:
+        client = mstock
+    if client is None and mstock and mstock.client is not None:
+        # A session existed but is down: fail fast rather than simulate a live order
+        return {"success": False, "message": "Broker unavailable; reconnecting", "error": True}
+    if client is not None:
+        result = client.place_order(
+            symbol=ticket.symbol,
+            quantity=ticket.quantity,
+            order_type=ticket.side,
+            product=ticket.product,
+        )
+    else:
+        # Simulated order for testing (when not connected to mStock): fills at the last LTP
+        result = {
+            "success": True,
+            "order_id": f"SIM-{uuid.uuid4().hex[:8]}",
+            "message": f"SIMULATED: {ticket.side} {ticket.quantity} {ticket.symbol}",
+            "price": (latest_quotes.get(ticket.symbol) or {}).get("ltp"),
+        }
+    if result.get('success'):
+        # Only a broker-reported price is a fill price; None leaves the fill unpriced
+        result['price'] = result.get('price') or None
+        order_tracker.add_order(
+            order_id=result['order_id'],
+            symbol=ticket.symbol,
+            quantity=ticket.quantity,
+            order_type=ticket.side,
+            strategy=ticket.strategy,
+            price=result['price'],
+        )
+    return result
 
-def _place_buy_order(token: str, qty: int) -> tuple[bool, str]:
-    # Safe order placement: use SDK if connected, else simulate
+def _settle_margin(ticket: OrderTicket) -> None:
+    """Settle a fill at its actual cost; selling out of a long position frees its proceeds.
+    Without a broker-reported price nothing is guessed: a buy keeps its reservation and a
+    sale credits nothing until the next margin sync brings the broker's figures."""
+    price = ticket.fill_price or 0.0
+    if ticket.side == 'BUY':
+        if price > 0:
+            margin_ledger.settle(ticket.key, amount=price * ticket.quantity)
+        else:
+            margin_ledger.filled_unpriced(ticket.key)
+        return
+    # Call before the fill reaches the position book: only the part that closes a long is credited
+    closing = min(ticket.quantity, max(0, position_book.net_qty(ticket.symbol)))
+    margin_ledger.release(ticket.key)
+    if closing and price > 0:
+        margin_ledger.settle(ticket.key, amount=-price * closing)
+
+def _on_order_update(ticket: OrderTicket) -> None:
+    if ticket.status in FINAL_STATES:
+        # Market orders are treated as filled once the broker accepts them
+        if ticket.status == PLACED:
+            _settle_margin(ticket)
+            position_book.apply_fill(ticket.symbol, ticket.side, ticket.quantity, ticket.fill_price or 0.0)
+            _update_protections(ticket)
+        else:
+            margin_ledger.release(ticket.key)
+        _send_notification("order_status", ticket.to_dict())
+
+order_pipeline = OrderPipeline(_dispatch_order, **pipeline_settings())
+signal_latch = SignalLatch()
+order_pipeline.subscribe(_on_order_update)
+
+# Stop-loss / target / trailing levels from /api/config, keyed by strategy id.
+# Orders whose strategy has no config of its own use the last active config.
+exit_rules: dict[str, ExitRule] = {}
+default_exit_rule = ExitRule()
+
+def _place_exit(p: Protection, reason: str, ltp: float) -> None:
+    """Send a triggered protection out as a market exit through the order pipeline."""
+    # Never exit more than is still held (the position may have been reduced by hand)
+    qty = min(p.quantity, int(position_book.net_qty(p.symbol) * p.direction))
+    if qty <= 0:
+        return
+    # Exits reduce exposure, so they skip margin reservation
+    ticket, duplicate = order_pipeline.submit(
+        symbol=p.symbol,
+        quantity=qty,
+        side=p.exit_side,
+        product='DELIVERY',
+        strategy=f"exit:{reason}",
+        price=ltp,
+        source='exit',
+        key=f"exit:{p.id}",
+        account=p.account,
+    )
+    if duplicate:
+        # The key already belongs to another order: this exit was not sent
+        print(f"Exit {p.id} for {p.symbol} not sent: key held by {ticket.symbol} ({ticket.status})")
+        _send_notification("exit_not_sent", {**p.to_dict(), "quantity": qty,
+                                             "message": f"order key {ticket.key} already used ({ticket.status})"})
+        return
+    _send_notification("exit_triggered", {**p.to_dict(), "quantity": qty})
+    _sync_exit_subscription()
+
+exit_monitor = ExitMonitor(_place_exit)
+# Entries filled without a price: armed at the first quote for their symbol
+_unpriced_entries: list[OrderTicket] = []
+_unpriced_lock = threading.Lock()
+
+def _sync_exit_subscription() -> None:
+    """Keep quotes flowing for every symbol with armed levels (or waiting to arm), watched or not."""
+    with _unpriced_lock:
+        waiting = [t.symbol for t in _unpriced_entries]
+    if subscriptions.subscribe("exits", list(dict.fromkeys(exit_monitor.symbols() + waiting))):
+        token_snapshot.invalidate()
+
+def _arm_unpriced_entries(quotes: dict) -> None:
+    """Arm protections for price-less entry fills once their symbol has a quote."""
+    if not _unpriced_entries:
+        return
+    with _unpriced_lock:
+        ready = [t for t in _unpriced_entries if (quotes.get(t.symbol) or {}).get("ltp")]
+        _unpriced_entries[:] = [t for t in _unpriced_entries if t not in ready]
+    for t in ready:
+        direction = 1 if t.side == 'BUY' else -1
+        if position_book.net_qty(t.symbol) * direction > 0:
+            exit_monitor.arm(t.symbol, t.quantity, float(quotes[t.symbol]["ltp"]),
+                             exit_rules.get(t.strategy, default_exit_rule),
+                             direction=direction, strategy=t.strategy, account=t.account)
+    if ready:
+        _sync_exit_subscription()
+
+def _update_protections(ticket: OrderTicket) -> None:
+    """Arm levels for fills that open or add to a position; drop them once it is flat."""
+    direction = 1 if ticket.side == 'BUY' else -1
+    held = position_book.net_qty(ticket.symbol)
+    if held * direction >= 0:
+        exit_monitor.cancel_symbol(ticket.symbol, -direction)
+    if ticket.source != 'exit' and held * direction > 0:
+        rule = exit_rules.get(ticket.strategy, default_exit_rule)
+        if ticket.fill_price and ticket.fill_price > 0:
+            exit_monitor.arm(ticket.symbol, ticket.quantity, ticket.fill_price, rule,
+                             direction=direction, strategy=ticket.strategy, account=ticket.account)
+        elif rule.active:
+            print(f"Entry {ticket.key} filled without a price; arming its exits at the next quote")
+            with _unpriced_lock:
+                _unpriced_entries.append(ticket)
+    _sync_exit_subscription()
+
+def _place_buy_order(token: str, qty: int) -> tuple[str, str]:
+    # Queue through the order pipeline; one order per signal episode, however long it stays on
+    key = signal_latch.hold(token, 'BUY')
+    existing = order_pipeline.get(key)
+    if existing:
+        return ORDER_DUPLICATE, f"{existing.key} ({existing.status})"
+    if not margin_ledger.try_reserve(key, _estimate_cost(token, qty)):
+        return ORDER_NO_MARGIN, "insufficient margin after open reservations"
     try:
-        if mstock and mstock.is_connected:
-            res = mstock.place_order(symbol=token, quantity=qty, order_type='BUY', product='DELIVERY')
-            return bool(res.get('success', False)), res.get('order_id', 'UNKNOWN') if isinstance(res, dict) else str(res)
-        # Simulate and also track in order history
-        oid = random.randint(10000, 99999)
-        order_tracker.record_order({
-            "order_id": oid,
-            "symbol": token,
-            "side": "BUY",
-            "quantity": qty,
-            "timestamp": asyncio.get_event_loop().time(),
-        })
-        return True, str(oid)
+        ticket, duplicate = order_pipeline.submit(
+            symbol=token,
+            quantity=qty,
+            side='BUY',
+            product='DELIVERY',
+            strategy='autobuy',
+            source='autobuy',
+            key=key,
+        )
+        return (ORDER_DUPLICATE if duplicate else ORDER_PLACED), ticket.key
     except Exception as e:
+        margin_ledger.release(key)
         print(f"Auto-Buy order error: {e}")
-        return False, str(e)
+        return ORDER_FAILED, str(e)
+
+def _release_signals() -> None:
+    """Close signal episodes for symbols the last step evaluated that no longer signal."""
+    signalled = list(auto_buy_engine.signals.items())
+    for token, side in signalled:
+        signal_latch.hold(token, side)
+    signal_latch.release(auto_buy_engine.evaluated, signalled)
+
+async def _step_engine() -> ExecutionLog:
+    loop = asyncio.get_running_loop()
+    # A stale snapshot is refetched inside _get_latest_ticks: keep that broker call off the loop
+    ticks = await loop.run_in_executor(None, _get_latest_ticks)
+    if strategy_pool is not None:
+        # Only strategy evaluation waits on the pool workers off the loop
+        results = await loop.run_in_executor(None, auto_buy_engine.evaluate, ticks)
+    else:
+        results = auto_buy_engine.evaluate(ticks)
+    # Notifications, margin reservations and orders stay on the loop
+    log = auto_buy_engine.act(ticks, results)
+    _release_signals()
+    return log
 
 async def _auto_engine_loop():
     global auto_buy_engine
     while True:
+        # During replay the replay loop steps the engine once per recorded snapshot
+        if replay_source:
+            return
         try:
             if auto_buy_engine:
-                log = auto_buy_engine.step()
+                with metrics.engine_step_seconds.time():
+                    log = await _step_engine()
                 auto_buy_log.entries = log.entries  # keep reference updated
         except Exception as e:
             print(f"Auto engine step error: {e}")
         await asyncio.sleep(2)
 
+async def _replay_loop():
+    """Feed recorded snapshots to the API and the engine at the configured speed."""
+    global replay_quotes
+    prev_ts = None
+    count = 0
+    for ts, quotes in replay_source.snapshots():
+        await asyncio.sleep(replay_source.delay(prev_ts, ts))
+        replay_quotes = quotes
+        try:
+            if auto_buy_engine:
+                with metrics.engine_step_seconds.time():
+                    log = await _step_engine()
+                auto_buy_log.entries = log.entries
+        except Exception as e:
+            print(f"Auto engine step error: {e}")
+        prev_ts = ts
+        count += 1
+    print(f"Tick replay finished: {count} snapshots")
+
+# Warm start: quotes, volume baselines, leases, auto-buy selection, armed exits and
+# recent order keys are snapshotted every WARM_STATE_SECONDS and restored at startup
+warm_state = WarmState()
+WARM_STATE_SECONDS = float(os.getenv("WARM_STATE_SECONDS", "5"))
+WARM_STATE_MAX_AGE_SECONDS = float(os.getenv("WARM_STATE_MAX_AGE_SECONDS", "900"))
+
+def _warm_state_sections() -> dict:
+    """Collected on the event loop, where engine notifications and orders are made; exits
+    fired on the poller thread go through the order pipeline's lock."""
+    return {
+        "quotes": {"time": last_quote_time, "quotes": latest_quotes},
+        "screener": screener.volume_state(),
+        "subscriptions": {o: lease for o, lease in subscriptions.leased().items() if o.startswith("ui:")},
+        "autobuy": [{"token": c.token, "autobuy": c.autobuy, "quantity": c.quantity} for c in auto_buy_selection],
+        "exits": exit_monitor.state(),
+        "orders": [t.to_dict() for t in order_pipeline.recent(500)],
+        "signals": signal_latch.state(),
+        "notifications": _recent_notifications(500),
+    }
+
+def _restore_warm_state() -> None:
+    global auto_buy_selection, latest_quotes, last_quote_time
+    sections = warm_state.load(WARM_STATE_MAX_AGE_SECONDS)
+    if not sections:
+        return
+    try:
+        auto_buy_selection = [TokenAutoBuyConfig(**c) for c in sections.get("autobuy", [])]
+        subscriptions.subscribe("autobuy", [c.token for c in auto_buy_selection if c.token])
+        now = time.time()
+        for owner, lease in sections.get("subscriptions", {}).items():
+            if lease["expires"] > now:
+                subscriptions.subscribe(owner, lease["symbols"], ttl=lease["expires"] - now)
+        order_pipeline.restore(sections.get("orders", []))
+        signal_latch.restore(sections.get("signals", []))
+        # Exit orders are keyed by protection id: never reissue an id an old ticket still holds
+        exit_keys = [k.split(":", 1)[1] for k in order_pipeline.keys() if k.startswith("exit:")]
+        exit_monitor.restore(sections.get("exits", {}), used_ids=exit_keys)
+        _sync_exit_subscription()
+        with _notifications_lock:
+            notifications_buffer[:] = sections.get("notifications", [])[-500:]
+        screener.restore_volume_state(sections.get("screener", {}))
+        saved = sections.get("quotes") or {}
+        quotes = saved.get("quotes") or {}
+        if quotes and not replay_source:
+            latest_quotes = quotes
+            last_quote_time = float(saved.get("time") or 0.0)
+            # Served as current until the first poll replaces it (within QUOTE_MAX_AGE_SECONDS);
+            # exits are not checked against it, only live quotes can trigger them
+            token_snapshot.update(quotes)
+            screener.update(quotes)
+            position_book.mark(quotes)
+            _publish_quotes(quotes)
+        print(f"Warm state: {len(quotes)} quotes, {len(auto_buy_selection)} auto-buy tokens, "
+              f"{len(exit_monitor.active)} armed exits")
+    except Exception as e:
+        print(f"Warm state restore error: {e}")
+
+def _save_warm_state(sections: dict) -> None:
+    try:
+        warm_state.save(sections)
+    except Exception as e:
+        print(f"Warm state save error: {e}")
+
+async def _warm_state_loop():
+    """Snapshot engine state off the event loop; nothing is written while it is unchanged."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(WARM_STATE_SECONDS)
+        await loop.run_in_executor(None, _save_warm_state, _warm_state_sections())
+
+def _load_today_positions():
+    """Rebuild positions from today's recorded orders once; fills then arrive incrementally."""
+    try:
+        for o in reversed(order_tracker.get_today_orders()):
+            position_book.apply_fill(o['symbol'], o['order_type'] or 'BUY', o['quantity'] or 0, o['price'] or 0.0)
+    except Exception as e:
+        print(f"Position bootstrap error: {e}")
+
 @app.on_event("startup")
 async def start_auto_engine():
-    global auto_buy_engine
-    # Initialize engine with empty selection; UI can update via endpoint
+    global auto_buy_engine, strategy_pool
+    _start_engine_ipc()
+    if not replay_source:
+        _restore_warm_state()
+    if STRATEGY_WORKERS > 0:
+        strategy_pool = StrategyPool(simple_breakout_strategy, workers=STRATEGY_WORKERS,
+                                     timeout=float(os.getenv("STRATEGY_TIMEOUT_SECONDS", "5")))
+        print(f"Strategy pool: {STRATEGY_WORKERS} worker processes")
+    # Initialize engine with the restored (or empty) selection; UI can update via endpoint
     auto_buy_engine = NotifyAutoBuyEngine(
         token_config=auto_buy_selection,
         get_latest_ticks=_get_latest_ticks,
         get_margin=_get_margin,
         send_notification=_send_notification,
         place_buy_order=_place_buy_order,
+        strategy_fn=strategy_pool or simple_breakout_strategy,
         log=auto_buy_log,
     )
+    _load_today_positions()
+    _pin_watchlists()
+    await order_pipeline.start()
+    asyncio.create_task(_margin_sync_loop())
+    asyncio.create_task(_quote_poll_loop())
+    asyncio.create_task(_broker_supervisor_loop())
+    asyncio.create_task(_reference_loop())
     asyncio.create_task(_auto_engine_loop())
+    if replay_source:
+        asyncio.create_task(_replay_loop())
+    else:
+        asyncio.create_task(_warm_state_loop())
+        tick_recorder.start()
+
+def _start_engine_ipc():
+    global quote_table, ipc_server
+    if not QUOTE_TABLE:
+        return
+    quote_table = SharedQuoteTable(QUOTE_TABLE, capacity=int(os.getenv("QUOTE_TABLE_CAPACITY", "8192")), create=True)
+    ipc_server = IpcServer(parse_address(os.environ["ENGINE_IPC"]), bytes.fromhex(os.environ["ENGINE_AUTHKEY"]),
+                           app, asyncio.get_running_loop())
+    print(f"Engine: quote table '{QUOTE_TABLE}' and IPC on {os.environ['ENGINE_IPC']}")
+
+@app.on_event("shutdown")
+async def stop_tick_recorder():
+    tick_recorder.stop()
+    if not replay_source:
+        _save_warm_state(_warm_state_sections())
+    await order_pipeline.stop()
+    if strategy_pool is not None:
+        strategy_pool.close()
+    if ipc_server is not None:
+        ipc_server.close()
+    if quote_table is not None:
+        quote_table.close()
 
 # Mock Data Store (fallback if mStock fails)
 TOKENS = [
@@ -181,6 +776,28 @@ TOKENS = [
     "NFO:NIFTY14AUG25C24600", "NFO:BANKNIFTY14AUG25P50000"
 ]
 
+# Named watchlists; the built-in list above seeds 'default' on first run
+watchlists = WatchlistStore(seed=TOKENS)
+PINNED_WATCHLISTS = [n.strip() for n in os.getenv("PINNED_WATCHLISTS", "").split(",") if n.strip()]
+
+def _pin_watchlists() -> None:
+    for name in PINNED_WATCHLISTS:
+        symbols = watchlists.get(name)
+        if symbols is None:
+            print(f"Pinned watchlist '{name}' not found")
+            continue
+        subscriptions.subscribe(f"pinned:{name}", symbols)
+
+def _watch(name: str, symbols: List[str]) -> None:
+    """Lease the ui: subscription for a watchlist; re-diffed only when the list changed."""
+    rev = watchlists.revision(name)
+    owner = f"ui:{name}"
+    if _ui_revisions.get(name) == rev and subscriptions.renew(owner, WATCH_LEASE_SECONDS):
+        return
+    _ui_revisions[name] = rev
+    if subscriptions.subscribe(owner, symbols, ttl=WATCH_LEASE_SECONDS):
+        token_snapshot.invalidate()
+
 @app.get("/")
 def read_root():
     return {
@@ -190,14 +807,50 @@ def read_root():
         "mode": "live" if (mstock and mstock.is_connected and live_enabled) else "offline"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition of latency histograms and counters."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+def _require_admin(x_admin_token: str = Header(None)):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set and sent as X-Admin-Token."""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected or x_admin_token != expected:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.post("/api/admin/profile", dependencies=[Depends(_require_admin)])
+async def run_profile(seconds: float = 10.0, hz: int = 100, save: bool = True, include_stacks: bool = True):
+    """Sample every thread (event loop and executors) for a time box; returns folded stacks."""
+    if profiler.sampling_profiler.running:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    # Sample from a worker thread so the event loop keeps serving (and shows up in the profile)
+    result = await asyncio.get_running_loop().run_in_executor(
+        None, profiler.sampling_profiler.run, seconds, hz)
+    if save:
+        result["path"] = profiler.sampling_profiler.save(result["folded"])
+    if not include_stacks:
+        result.pop("folded")
+    return result
+
+@app.post("/api/admin/timing", dependencies=[Depends(_require_admin)])
+def set_server_timing(enabled: bool):
+    """Toggle Server-Timing breakdowns (broker, parse, other) on API responses."""
+    profiler.set_timing(enabled)
+    return {"server_timing": profiler.timing_enabled}
+
 @app.get("/api/notifications")
 def get_notifications():
-    return {"count": len(notifications_buffer), "items": notifications_buffer[-50:]}
+    with _notifications_lock:
+        return {"count": len(notifications_buffer), "items": notifications_buffer[-50:]}
 
 @app.get("/api/autobuy/log")
 def get_autobuy_log():
     return {"lines": auto_buy_log.entries[-100:]}
 
+@app.get("/api/autobuy/pool")
+def get_strategy_pool():
+    return strategy_pool.to_dict() if strategy_pool is not None else {"workers": 0}
+
 @app.get("/api/autobuy/selection")
 def get_autobuy_selection():
     return {"selection": [{"token": c.token, "autobuy": c.autobuy, "quantity": c.quantity} for c in auto_buy_selection]}
@@ -212,82 +865,156 @@ def set_autobuy_selection(items: list[dict]):
         auto_buy_selection = [TokenAutoBuyConfig(token=i.get("token"), autobuy=bool(i.get("autobuy", False)), quantity=int(i.get("quantity", 1))) for i in items]
         if auto_buy_engine:
             auto_buy_engine.update_token_config(auto_buy_selection)
+        if subscriptions.subscribe("autobuy", [c.token for c in auto_buy_selection if c.token]):
+            token_snapshot.invalidate()
         return {"status": "updated", "count": len(auto_buy_selection)}
     except Exception as e:
         print(f"Auto-buy selection update error: {e}")
         return {"status": "error", "message": str(e)}
 
+def _build_token_data(quotes: dict, view=None) -> List[dict]:
+    """TokenData-shaped rows, in watchlist order for a (name, revision) view."""
+    symbols = quotes if view is None else (watchlists.get(view[0]) or [])
+    return token_rows(quotes, symbols, reference_data.symbols)
+
 @app.get("/api/tokens", response_model=List[TokenData])
-async def get_tokens():
-    if not (live_enabled and mstock and getattr(mstock, 'is_connected', False)):
+async def get_tokens(request: Request, watchlist: str = "default"):
+    """Current snapshot of a watchlist as pre-serialized JSON; ETag/If-None-Match gives 304 when unchanged."""
+    if not _quotes_available():
         raise HTTPException(status_code=503, detail="Live data unavailable (connection or API key missing)")
+    symbols = watchlists.get(watchlist)
+    if symbols is None:
+        raise HTTPException(status_code=404, detail=f"Unknown watchlist '{watchlist}'")
+    _watch(watchlist, symbols)
+    if not symbols:
+        return Response(content=b"[]", media_type="application/json")
 
     try:
-        live_response, fmt = mstock.get_data_smart(TOKENS)
-        print(f"DEBUG: /api/tokens live format used: {fmt}")
-        if isinstance(live_response, dict) and live_response:
-            data: List[TokenData] = []
-            for s in TOKENS:
-                parts = s.split(":")
-                key_candidates = [s, parts[-1]]
-                payload = {}
-                for k in key_candidates:
-                    if k in live_response:
-                        payload = live_response.get(k, {})
-                        break
-                # Some SDKs return list; handle that too
-                if not payload and isinstance(live_response, list):
-                    for item in live_response:
-                        if isinstance(item, dict) and (item.get("symbol") == parts[-1] or item.get("token") == parts[-1]):
-                            payload = item
-                            break
-                ltp = None
-                if isinstance(payload, dict):
-                    ltp = payload.get("ltp") or payload.get("price") or payload.get("LTP")
-                if ltp is not None:
-                    prev_close_val = None
-                    # Prefer previous close from live payload when available
-                    for key in ("previousClose", "prevClose", "prev_close", "yesterdayClose"):
-                        if isinstance(payload, dict) and payload.get(key) is not None:
-                            try:
-                                prev_close_val = float(payload.get(key))
-                            except Exception:
-                                pass
-                            break
-                    change_pct = 0.0
-                    if prev_close_val is not None:
-                        try:
-                            change_pct = round(((float(ltp) - prev_close_val) / prev_close_val) * 100, 2)
-                        except Exception:
-                            change_pct = 0.0
-                    else:
-                        # Fallback change based on open if previous close missing
-                        change_pct = round(((float(ltp) - float(payload.get("open", ltp))) / float(payload.get("open", ltp))) * 100, 2) if payload.get("open") else 0.0
-
-                    data.append(TokenData(
-                        symbol=s,
-                        ltp=round(float(ltp), 2),
-                        change=change_pct,
-                        open=round(float(payload.get("open", ltp)), 2),
-                        high=round(float(payload.get("high", ltp)), 2),
-                        low=round(float(payload.get("low", ltp)), 2),
-                        volume=int(payload.get("volume", 0)),
-                        signal="NONE",
-                        strategy="-",
-                        prev_close=prev_close_val,
-                        week52_high=None,
-                        week52_low=None,
-                        market_cap=None,
-                    ))
-            if data:
-                print("Returning Live Data")
-                return data
-        raise HTTPException(status_code=502, detail="Live data response empty or unparsable")
+        if replay_source or token_snapshot.age() > QUOTE_MAX_AGE_SECONDS:
+            # Poller not started yet, failing or the watch set just grew: fetch now, off the loop
+            quotes, fmt = await profiler.run_in_executor(_fetch_quotes)
+            if not quotes:
+                raise HTTPException(status_code=502, detail="Live data response empty or unparsable")
+        with profiler.span("parse"):
+            enc = token_snapshot.encoded((watchlist, watchlists.revision(watchlist)))
+        if enc is None or enc.body == b"[]":
+            raise HTTPException(status_code=502, detail="Live data response empty or unparsable")
+        status, body, headers = token_snapshot.negotiate(
+            enc, request.headers.get("if-none-match"), request.headers.get("accept-encoding"))
+        return Response(content=body, status_code=status, media_type="application/json", headers=headers)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Live data fetch failed: {e}")
 
+@app.get("/api/screener")
+async def get_screener(scan: str = "gainers", limit: int = 20, min_price: float = 0.0,
+                       max_price: Optional[float] = None, min_volume: float = 0.0,
+                       watchlist: Optional[str] = None):
+    """Top-N of the polled universe for one scan (gainers, losers, volume_spike, relative_volume,
+    near_52w_high, near_52w_low, gap_up, gap_down), ranked server-side; watchlist restricts the universe."""
+    if scan not in SCANS:
+        raise HTTPException(status_code=400, detail=f"scan must be one of: {', '.join(SCANS)}")
+    symbols = None
+    if watchlist is not None:
+        symbols = watchlists.get(watchlist)
+        if symbols is None:
+            raise HTTPException(status_code=404, detail=f"Unknown watchlist '{watchlist}'")
+    limit = max(1, min(limit, 200))
+    rows = screener.scan(scan, limit=limit, min_price=min_price, max_price=max_price,
+                         min_volume=min_volume, symbols=symbols)
+    return {"scan": scan, "version": screener.version, "universe": screener.count, "rows": rows}
+
+# Option chains: contracts are subscribed like a watchlist (leased) and analytics are
+# recomputed at most once per snapshot version
+OPTION_RISK_FREE_RATE = float(os.getenv("OPTION_RISK_FREE_RATE", "0.065"))
+_chain_cache: dict[tuple, tuple[int, List[str], dict]] = {}  # key -> (version, symbols, chain)
+
+def _known_option_contracts(underlying: str) -> List[OptionContract]:
+    symbols = set(TOKENS)
+    for w in watchlists.list():
+        symbols.update(w["symbols"])
+    contracts = (parse_option_symbol(s) for s in symbols)
+    return [c for c in contracts if c and c.underlying == underlying]
+
+@app.get("/api/options/expiries")
+async def get_option_expiries(underlying: str):
+    """Upcoming expiries of an underlying's known contracts, nearest first"""
+    underlying = underlying.upper()
+    return {"underlying": underlying,
+            "expiries": [expiry_code(e) for e in upcoming_expiries(_known_option_contracts(underlying))]}
+
+@app.get("/api/options/chain")
+async def get_option_chain(underlying: str, expiry: Optional[str] = None, strikes: int = 10,
+                           spot: Optional[str] = None):
+    """Every strike of one expiry (known contracts plus `strikes` steps either side of ATM)
+    with quotes, implied volatility and Greeks solved for the whole chain at once."""
+    if not _quotes_available():
+        raise HTTPException(status_code=503, detail="Live data unavailable (connection or API key missing)")
+    underlying = underlying.upper()
+    known = _known_option_contracts(underlying)
+    upcoming = upcoming_expiries(known)
+    if expiry:
+        exp = parse_expiry(expiry)
+        if exp is None:
+            raise HTTPException(status_code=400, detail="expiry must look like 14AUG25")
+        if is_expired(exp):
+            raise HTTPException(status_code=400, detail=f"{expiry_code(exp)} has expired")
+    else:
+        if not upcoming:
+            raise HTTPException(status_code=400, detail=f"expiry required: no upcoming {underlying} contracts are listed")
+        exp = upcoming[0]
+    strikes = max(1, min(strikes, 50))
+    spot_sym = spot or spot_symbol(underlying)
+    owner = f"chain:{underlying}:{expiry_code(exp)}"
+    key = (underlying, exp, strikes, spot_sym)
+
+    async def subscribed_quotes(symbols: List[str]) -> dict:
+        if subscriptions.subscribe(owner, symbols, ttl=WATCH_LEASE_SECONDS):
+            token_snapshot.invalidate()
+        return await profiler.run_in_executor(_current_quotes)
+
+    cached = _chain_cache.get(key)
+    if cached and cached[0] == token_snapshot.version:
+        subscriptions.subscribe(owner, cached[1], ttl=WATCH_LEASE_SECONDS)
+        return cached[2]
+
+    # The ladder is centred on spot, so spot (and listed contracts) come first
+    quotes = await subscribed_quotes(cached[1] if cached else
+                                     [spot_sym] + [c.symbol for c in known if c.expiry == exp])
+    spot_ltp = (quotes.get(spot_sym) or {}).get("ltp")
+    contracts = chain_contracts(underlying, exp, spot_ltp, strikes, known)
+    if not contracts:
+        raise HTTPException(status_code=502, detail=f"No spot price for {spot_sym} and no listed contracts")
+    symbols = [spot_sym] + [c.symbol for c in contracts]
+    quotes = await subscribed_quotes(symbols)
+    version = token_snapshot.version
+    chain = build_chain(underlying, exp, spot_ltp, contracts, quotes, OPTION_RISK_FREE_RATE)
+    chain["version"] = version
+    chain["expiries"] = [expiry_code(e) for e in upcoming]
+    if len(_chain_cache) > 64:
+        _chain_cache.clear()
+    _chain_cache[key] = (version, symbols, chain)
+    return chain
+
+@app.get("/api/reference")
+async def get_reference(symbol: Optional[str] = None):
+    """Reference-data status, or one symbol's row"""
+    if symbol is None:
+        return reference_data.to_dict()
+    row = reference_data.get(symbol)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"No reference data for {symbol}")
+    return {"symbol": symbol, **row}
+
+@app.post("/api/reference/refresh")
+async def refresh_reference():
+    """Build reference rows now for any watched symbol missing today's data"""
+    if not (mstock and mstock.is_connected):
+        raise HTTPException(status_code=503, detail="Broker not connected")
+    added = await profiler.run_in_executor(_refresh_reference)
+    return {"added": added, **reference_data.to_dict()}
+
 @app.get("/api/candles", response_model=CandleResponse)
 async def get_candles(symbol: str, interval: str = "1m", count: int = 12):
     """Return exactly 12 candles for the requested interval with validation.
@@ -304,19 +1031,22 @@ async def get_candles(symbol: str, interval: str = "1m", count: int = 12):
     candles: List[Candle] = []
     try:
         if mstock and mstock.is_connected and hasattr(mstock, "get_candles"):
-            resp = mstock.get_candles(symbol=symbol, interval=interval, count=count)
+            # May queue behind orders and quotes for a rate-limit token: keep it off the event loop
+            resp = await profiler.run_in_executor(
+                lambda: mstock.get_candles(symbol=symbol, interval=interval, count=count))
             # Expect list of dicts with o/h/l/c/v and timestamp
             if isinstance(resp, list) and len(resp) >= 12:
                 resp = resp[-12:]
-                for c in resp:
-                    candles.append(Candle(
-                        ts=int(c.get("ts") or c.get("time") or c.get("timestamp", 0)),
-                        open=float(c.get("open")),
-                        high=float(c.get("high")),
-                        low=float(c.get("low")),
-                        close=float(c.get("close")),
-                        volume=int(c.get("volume", 0)),
-                    ))
+                with profiler.span("parse"):
+                    for c in resp:
+                        candles.append(Candle(
+                            ts=int(c.get("ts") or c.get("time") or c.get("timestamp", 0)),
+                            open=float(c.get("open")),
+                            high=float(c.get("high")),
+                            low=float(c.get("low")),
+                            close=float(c.get("close")),
+                            volume=int(c.get("volume", 0)),
+                        ))
     except Exception as e:
         print(f"Live candle fetch failed: {e}")
 
@@ -327,7 +1057,12 @@ async def get_candles(symbol: str, interval: str = "1m", count: int = 12):
 
 @app.post("/api/config")
 async def update_config(update: StrategyUpdate):
+    global default_exit_rule
     print(f"Received config update for {update.id}: {update.active}")
+    rule = ExitRule.from_config(update.config)
+    exit_rules[update.id] = rule
+    if update.active:
+        default_exit_rule = rule
     return {"status": "updated", "id": update.id}
 
 @app.post("/api/execute-trade")
@@ -338,62 +1073,153 @@ async def execute_trade(order: OrderRequest):
     This endpoint is called from frontend when:
     - User has Auto-Buy enabled on a strategy card
     - That strategy detects a signal (BUY/SELL)
+
+    The order is queued and acknowledged immediately; follow its progress via
+    /api/orders/status or the order_status notifications. Repeating an
+    idempotency_key returns the original order instead of placing another.
     """
     try:
-        # Check daily order limit
+        if order.idempotency_key == f"signal:{order.symbol}:{order.order_type.upper()}":
+            # A strategy signal: one order per episode, shared with the auto-buy engine
+            order.idempotency_key = signal_latch.hold(order.symbol, order.order_type)
+        existing = order_pipeline.get(order.idempotency_key) if order.idempotency_key else None
+        if existing:
+            metrics.orders_total.inc("execute_trade", "duplicate")
+            return {
+                "success": True,
+                "duplicate": True,
+                "idempotency_key": existing.key,
+                "status": existing.status,
+                "order_id": existing.order_id,
+                "message": f"Duplicate of existing order ({existing.status})",
+            }
+
+        # Check daily order limit, counting orders still in the queue
         daily_limit = 10  # Default limit
-        today_count = order_tracker.get_today_count()
+        today_count = order_tracker.get_today_count() + order_pipeline.pending_count()
         
         if today_count >= daily_limit:
+            metrics.orders_total.inc("execute_trade", "limit_reached")
             return {
                 "success": False,
                 "message": f"Daily order limit ({daily_limit}) reached. Orders today: {today_count}"
             }
-        
-        # If mStock is connected, place real order
-        if mstock and mstock.is_connected:
-            result = mstock.place_order(
-                symbol=order.symbol,
-                quantity=order.quantity,
-                order_type=order.order_type,
-                product='INTRADAY'  # Use intraday for now
-            )
-            
-            if result['success']:
-                # Log the order
-                order_tracker.add_order(
-                    order_id=result['order_id'],
-                    symbol=order.symbol,
-                    quantity=order.quantity,
-                    order_type=order.order_type,
-                    strategy=order.strategy,
-                    price=order.price
-                )
-                return result
-            else:
-                return result
-        else:
-            # Simulated order for testing (when not connected to mStock)
-            import uuid
-            order_id = f"SIM-{uuid.uuid4().hex[:8]}"
-            order_tracker.add_order(
-                order_id=order_id,
+
+        key = order.idempotency_key or f"order:{uuid.uuid4().hex}"
+        if order.order_type.upper() == 'BUY':
+            cost = _estimate_cost(order.symbol, order.quantity, order.price)
+            if not margin_ledger.try_reserve(key, cost):
+                metrics.orders_total.inc("execute_trade", "insufficient_margin")
+                return {
+                    "success": False,
+                    "message": f"Insufficient margin. Needed={cost:.2f}, Available={margin_ledger.available():.2f}"
+                }
+        try:
+            ticket, duplicate = order_pipeline.submit(
                 symbol=order.symbol,
                 quantity=order.quantity,
-                order_type=order.order_type,
+                side=order.order_type,
+                product='INTRADAY',  # Use intraday for now
                 strategy=order.strategy,
-                price=order.price
+                price=order.price,
+                source='execute_trade',
+                key=key,
+                account=order.account or "",
             )
-            return {
-                "success": True,
-                "order_id": order_id,
-                "message": f"SIMULATED: {order.order_type} {order.quantity} {order.symbol}"
-            }
+        except Exception:
+            margin_ledger.release(key)
+            raise
+        return {
+            "success": True,
+            "duplicate": duplicate,
+            "idempotency_key": ticket.key,
+            "status": ticket.status,
+            "order_id": ticket.order_id,
+            "message": f"{ticket.side} {ticket.quantity} {ticket.symbol} queued",
+        }
             
     except Exception as e:
         print(f"Trade execution error: {e}")
         return {"success": False, "message": str(e)}
 
+@app.get("/api/orders/status")
+async def get_order_status(key: str):
+    """Current state of a queued order by idempotency key"""
+    ticket = order_pipeline.get(key)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Unknown order key")
+    return ticket.to_dict()
+
+@app.get("/api/orders/pipeline")
+async def get_pipeline_orders():
+    """Recent orders handled by the dispatch pipeline, newest last"""
+    return {
+        "pending": order_pipeline.pending_count(),
+        "orders": [t.to_dict() for t in order_pipeline.recent(50)],
+    }
+
+@app.get("/api/margin")
+async def get_margin():
+    """Ledger view of margin: last broker sync, open reservations and what is free now"""
+    return margin_ledger.to_dict()
+
+@app.get("/api/positions")
+async def get_positions(include_flat: bool = False):
+    """Net positions with average price and realized/unrealized P&L, marked to the last snapshot"""
+    return position_book.to_dict(include_flat=include_flat)
+
+@app.get("/api/exits")
+async def get_exits():
+    """Armed stop-loss/target/trailing levels and recently triggered exits"""
+    return exit_monitor.to_dict()
+
+@app.get("/api/sessions")
+async def get_sessions():
+    """Broker sessions in the pool with health, rotation and circuit-breaker state"""
+    return session_pool.to_dict()
+
+@app.get("/api/watchlists")
+async def get_watchlists():
+    return {"watchlists": watchlists.list(), "pinned": PINNED_WATCHLISTS}
+
+@app.put("/api/watchlists/{name}")
+async def save_watchlist(name: str, update: WatchlistUpdate):
+    """Create or replace a watchlist; live subscriptions to it pick up the new symbols"""
+    symbols = watchlists.save(name, update.symbols)
+    added = False
+    if name in PINNED_WATCHLISTS:
+        added |= subscriptions.subscribe(f"pinned:{name}", symbols)
+    if subscriptions.has(f"ui:{name}"):
+        _ui_revisions[name] = watchlists.revision(name)
+        added |= subscriptions.subscribe(f"ui:{name}", symbols, ttl=WATCH_LEASE_SECONDS)
+    if added:
+        token_snapshot.invalidate()
+    if quote_table is not None:
+        quote_table.bump("watch_version")
+    return {"name": name, "symbols": symbols, "revision": watchlists.revision(name)}
+
+@app.delete("/api/watchlists/{name}")
+async def delete_watchlist(name: str):
+    if not watchlists.delete(name):
+        raise HTTPException(status_code=404, detail=f"Unknown watchlist '{name}'")
+    subscriptions.unsubscribe(f"ui:{name}")
+    subscriptions.unsubscribe(f"pinned:{name}")
+    _ui_revisions.pop(name, None)
+    if quote_table is not None:
+        quote_table.bump("watch_version")
+    return {"status": "deleted", "name": name}
+
+@app.get("/api/subscriptions")
+async def get_subscriptions():
+    """Symbols the poller fetches, with the owners that keep them subscribed and their poll priorities"""
+    return {**subscriptions.to_dict(), "batch_symbols": POLL_BATCH_SYMBOLS, "scheduler": poll_scheduler.to_dict()}
+
+@app.post("/api/broker/reconnect")
+async def reconnect_broker():
+    """Log the primary account in again now, e.g. after a reset or a long outage"""
+    connected = await profiler.run_in_executor(_reconnect_primary)
+    return {"connected": connected, "live": live_enabled, **session_pool.to_dict()}
+
 @app.get("/api/orders/today")
 async def get_today_orders():
     """Get orders placed today"""
@@ -417,11 +1243,19 @@ async def configure_credentials(credentials: dict):
     api_key = credentials.get('apiKey')
     user_id = credentials.get('userId')
     password = credentials.get('password')
+    account = credentials.get('account')  # optional: extra account for the session pool
     
     if api_key and user_id and password:
         try:
             # Save to encrypted database
-            credential_store.save_mstock_credentials(api_key, user_id, password)
+            credential_store.save_mstock_credentials(api_key, user_id, password, account=account)
+            if account and account != PRIMARY_ACCOUNT:
+                creds = {'api_key': api_key, 'user_id': user_id, 'password': password}
+                client = await profiler.run_in_executor(login_client, creds)
+                session_pool.add(account, client)
+            else:
+                # Log in with the new credentials right away; no restart needed
+                await profiler.run_in_executor(_reconnect_primary)
             return {"status": "success", "message": "Credentials saved securely"}
         except Exception as e:
             print(f"Error saving credentials: {e}")
@@ -461,6 +1295,7 @@ async def delete_credentials():
                 print(f"Warning: SDK logout failed: {sdk_err}")
         credential_store.delete_credentials()
         # Also drop any in-memory mStock client/session so backend switches to mock mode
+        session_pool.close_all()
         mstock = None
         return {"status": "success", "message": "Credentials deleted and session cleared"}
     except Exception as e:
@@ -490,7 +1325,7 @@ async def live_raw():
     """Return raw live response from SDK for debugging token format issues."""
     if mstock and mstock.is_connected:
         try:
-            resp, fmt = mstock.get_data_smart(TOKENS)
+            resp, fmt = mstock.get_data_smart(list(subscriptions.symbols()) or TOKENS)
             return {"format": fmt, "response": resp}
         except Exception as e:
             return {"format": "error", "message": str(e)}
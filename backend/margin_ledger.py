@@ -0,0 +1,110 @@
+"""
+Local margin ledger with reservations.
+
+The broker's margin figure is fetched periodically (sync) rather than before
+every order. Between syncs the ledger tracks what we have committed ourselves:
+
+- try_reserve(key, cost) atomically checks free margin and earmarks the
+  estimated cost when an order is queued; it fails instead of overcommitting.
+- release(key) returns the reservation when the order is rejected or fails.
+- settle(key, amount) turns a reservation into spent margin when the order
+  fills, at the actual fill cost when known; the amount stays deducted until a
+  broker sync newer than the fill reflects it. Sales settle a negative amount
+  (their proceeds), which frees margin the same way.
+- filled_unpriced(key) is for fills the broker reported no price for: the
+  reservation stays in place until settle() brings the actual cost or a broker
+  sync newer than the fill replaces it.
+
+available = broker available - settled since that sync - open reservations, so
+pre-trade checks are a local lock + arithmetic and stay correct under bursts.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from auto_trade import MarginSnapshot
+
+
+class MarginLedger:
+    def __init__(self, available: float = 0.0, utilized: float = 0.0):
+        self._lock = threading.Lock()
+        self.broker_available = float(available)
+        self.broker_utilized = float(utilized)
+        self.synced_at = 0.0
+        self.reservations: Dict[str, float] = {}
+        # (settled at, amount) not yet reflected in a broker sync
+        self._settled: List[Tuple[float, float]] = []
+        self._unpriced: Dict[str, float] = {}  # reservation key -> fill time, cost not known yet
+
+    def sync(self, available: float, utilized: float = 0.0, as_of: Optional[float] = None) -> None:
+        """Adopt the broker's figures; fills settled before as_of are assumed included."""
+        as_of = as_of if as_of is not None else time.time()
+        with self._lock:
+            self.broker_available = float(available)
+            self.broker_utilized = float(utilized)
+            self.synced_at = as_of
+            self._settled = [(ts, amt) for ts, amt in self._settled if ts > as_of]
+            for key in [k for k, ts in self._unpriced.items() if ts <= as_of]:
+                del self._unpriced[key]
+                self.reservations.pop(key, None)
+
+    def _available(self) -> float:
+        return self.broker_available - sum(a for _, a in self._settled) - sum(self.reservations.values())
+
+    def available(self) -> float:
+        with self._lock:
+            return self._available()
+
+    def snapshot(self) -> MarginSnapshot:
+        with self._lock:
+            committed = sum(a for _, a in self._settled) + sum(self.reservations.values())
+            return MarginSnapshot(available=self.broker_available - committed,
+                                  utilized=self.broker_utilized + committed)
+
+    def try_reserve(self, key: str, amount: float) -> bool:
+        """Reserve amount under key if free margin allows; idempotent per key."""
+        with self._lock:
+            if key in self.reservations:
+                return True
+            if self._available() < amount:
+                return False
+            self.reservations[key] = float(amount)
+            return True
+
+    def release(self, key: str) -> float:
+        with self._lock:
+            self._unpriced.pop(key, None)
+            return self.reservations.pop(key, 0.0)
+
+    def filled_unpriced(self, key: str) -> None:
+        """Keep key's reservation for a fill of unknown cost until a newer sync covers it."""
+        with self._lock:
+            if key in self.reservations:
+                self._unpriced[key] = time.time()
+
+    def settle(self, key: str, amount: Optional[float] = None) -> float:
+        """Convert a reservation into spent margin, optionally at the actual fill cost
+        (negative for sale proceeds, which need no reservation)."""
+        with self._lock:
+            self._unpriced.pop(key, None)
+            reserved = self.reservations.pop(key, None)
+            if reserved is None and amount is None:
+                return 0.0
+            spent = float(amount if amount is not None else reserved)
+            self._settled.append((time.time(), spent))
+            return spent
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            settled = sum(a for _, a in self._settled)
+            reserved = sum(self.reservations.values())
+            return {
+                "broker_available": self.broker_available,
+                "broker_utilized": self.broker_utilized,
+                "synced_at": self.synced_at,
+                "reserved": reserved,
+                "open_reservations": len(self.reservations),
+                "unpriced_fills": len(self._unpriced),
+                "settled_since_sync": settled,
+                "available": self.broker_available - settled - reserved,
+            }
@@ -0,0 +1,165 @@
+"""
+Quote normalization shared by the API and the auto-buy engine.
+
+The SDK may answer get_ltp with a dict keyed by "NSE:INFY" or "INFY", or with a
+list of entries carrying 'symbol'/'token'. Everything downstream (TokenData,
+MarketTick, the tick recorder) works from one normalized shape instead:
+
+    {"NSE:INFY": {"ltp": 1440.0, "open": 1430.0, "high": 1441.0,
+                  "low": 1420.0, "volume": 1000000, "prev_close": 1428.5}, ...}
+
+Quotes are polled in two tiers: full quotes (OHLC, volume, previous close)
+now and then, and LTP-only requests in between. merge_ltp() folds an LTP-tier
+response into the previous snapshot so consumers always see the full shape;
+merge_quotes() does the same for full quotes of part of the universe (see
+poll_scheduler.py).
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+PREV_CLOSE_KEYS = ("previousClose", "prevClose", "prev_close", "yesterdayClose")
+QUOTE_FIELDS = ("ltp", "open", "high", "low", "volume", "prev_close")
+
+
+def split_symbol(s: str):
+    """'NSE:INFY' -> ('NSE', 'INFY'); bare symbols default to NSE."""
+    parts = s.split(":", 1)
+    if len(parts) == 2:
+        return parts[0], parts[1]
+    return "NSE", s
+
+
+def _to_float(v) -> Optional[float]:
+    try:
+        return float(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_entry(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Normalize one SDK quote payload; returns None when it carries no LTP."""
+    if not isinstance(payload, dict):
+        return None
+    ltp = _to_float(payload.get("ltp") or payload.get("price") or payload.get("LTP"))
+    if ltp is None:
+        return None
+    prev_close = None
+    for key in PREV_CLOSE_KEYS:
+        if payload.get(key) is not None:
+            prev_close = _to_float(payload.get(key))
+            break
+    try:
+        volume = int(payload.get("volume", 0) or 0)
+    except (TypeError, ValueError):
+        volume = 0
+    return {
+        "ltp": ltp,
+        "open": _to_float(payload.get("open")) or ltp,
+        "high": _to_float(payload.get("high")) or ltp,
+        "low": _to_float(payload.get("low")) or ltp,
+        "volume": volume,
+        "prev_close": prev_close,
+    }
+
+
+def normalize_quotes(resp: Any, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Map an SDK LTP response onto the requested symbols."""
+    if not resp:
+        return {}
+    if isinstance(resp, list):
+        # Index list entries once instead of scanning the list per symbol
+        by_key: Dict[str, Any] = {}
+        for e in resp:
+            if isinstance(e, dict):
+                for k in (e.get("symbol"), e.get("token")):
+                    if k is not None and k not in by_key:
+                        by_key[k] = e
+        resp = by_key
+    if not isinstance(resp, dict):
+        return {}
+
+    quotes: Dict[str, Dict[str, Any]] = {}
+    for s in symbols:
+        payload = resp.get(s)
+        if payload is None:
+            payload = resp.get(split_symbol(s)[1])
+        q = normalize_entry(payload) if payload is not None else None
+        if q is not None:
+            quotes[s] = q
+    return quotes
+
+
+def merge_quotes(base: Dict[str, Dict[str, Any]], fresh: Dict[str, Dict[str, Any]],
+                 symbols: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Snapshot of symbols from fresh full quotes, keeping base quotes for symbols not fetched this time."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for s in symbols:
+        q = fresh.get(s) or base.get(s)
+        if q is not None:
+            merged[s] = q
+    return merged
+
+
+def merge_ltp(base: Dict[str, Dict[str, Any]], fresh: Dict[str, Dict[str, Any]],
+              symbols: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Snapshot of symbols with LTP (and volume, when the LTP tier carries it) from fresh
+    and everything else from base. High/low widen to take in the new LTP. Symbols missing
+    from fresh keep their base quote; symbols missing from base are left out until a full
+    quote arrives."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for s in symbols:
+        b = base.get(s)
+        if b is None:
+            continue
+        f = fresh.get(s)
+        if f is None:
+            merged[s] = b
+            continue
+        ltp = f["ltp"]
+        merged[s] = {
+            "ltp": ltp,
+            "open": b["open"],
+            "high": max(b["high"], ltp),
+            "low": min(b["low"], ltp),
+            # Cumulative for the session; an LTP payload without volume normalizes to 0
+            "volume": max(b["volume"], f["volume"]),
+            "prev_close": b["prev_close"],
+        }
+    return merged
+
+
+def token_rows(quotes: Dict[str, Dict[str, Any]], symbols: Iterable[str],
+               reference: Optional[Dict[str, Dict]] = None) -> List[Dict[str, Any]]:
+    """TokenData-shaped rows for symbols present in quotes, in the given order.
+    Reference data supplies the prior close (the feed's is the fallback), 52-week range and market cap."""
+    reference = reference or {}
+    data: List[Dict[str, Any]] = []
+    for s in symbols:
+        q = quotes.get(s)
+        if not q:
+            continue
+        ref = reference.get(s) or {}
+        ltp = q["ltp"]
+        prev_close_val = ref.get("prev_close") or q["prev_close"]
+        change_pct = 0.0
+        if prev_close_val:
+            change_pct = round(((ltp - prev_close_val) / prev_close_val) * 100, 2)
+        elif q["open"]:
+            # Fallback change based on open if previous close missing
+            change_pct = round(((ltp - q["open"]) / q["open"]) * 100, 2)
+
+        data.append({
+            "symbol": s,
+            "ltp": round(ltp, 2),
+            "change": change_pct,
+            "open": round(q["open"], 2),
+            "high": round(q["high"], 2),
+            "low": round(q["low"], 2),
+            "volume": q["volume"],
+            "signal": "NONE",
+            "strategy": "-",
+            "prev_close": prev_close_val,
+            "week52_high": ref.get("week52_high"),
+            "week52_low": ref.get("week52_low"),
+            "market_cap": ref.get("market_cap"),
+        })
+    return data
@@ -0,0 +1,272 @@
+"""
+Lightweight Prometheus-style metrics.
+
+Counters, gauges and histograms keep plain Python numbers behind a per-metric
+lock; observing a value is a dict lookup, a bisect and an increment, cheap
+enough to leave on in production. render() produces the Prometheus text
+exposition format served by GET /metrics.
+
+Gauges can also be backed by a callback (set_function) so values such as buffer
+depth or quote staleness are computed only when scraped, never on the hot path.
+"""
+import abc
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond parsing to slow broker calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _label_str(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines for this metric, without HELP/TYPE."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._label_str(k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._fn: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, *label_values) -> None:
+        self._values[label_values] = float(value)
+
+    def inc(self, *label_values, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def dec(self, *label_values, amount: float = 1.0) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        """Compute the (unlabelled) value lazily at scrape time."""
+        self._fn = fn
+
+    def value(self, *label_values) -> float:
+        if self._fn is not None and not label_values:
+            return float(self._fn())
+        return self._values.get(label_values, 0.0)
+
+    def samples(self):
+        if self._fn is not None:
+            try:
+                return [f"{self.name} {_fmt(float(self._fn()))}"]
+            except Exception:
+                return []
+        items = list(self._values.items())
+        return [f"{self.name}{self._label_str(k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                s = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][idx] += 1
+            s[1] += value
+            s[2] += 1
+
+    def time(self, *label_values) -> "_Timer":
+        return _Timer(self, label_values)
+
+    def count(self, *label_values) -> int:
+        s = self._series.get(label_values)
+        return s[2] if s else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        out = []
+        for labels, counts, total, n in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="' + _fmt(bound) + '"'
+                out.append(f"{self.name}_bucket{self._label_str(labels, le)} {cumulative}")
+            out.append(f"{self.name}_sum{self._label_str(labels)} {repr(total)}")
+            out.append(f"{self.name}_count{self._label_str(labels)} {n}")
+        return out
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "start")
+
+    def __init__(self, hist: Histogram, labels: Tuple[str, ...]):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get_or_create(self, cls, name, help, labels, **kwargs):
+        m = self._metrics.get(name)
+        if m is None:
+            m = self._metrics[name] = cls(name, help, labels, **kwargs)
+        return m
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labels)
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request by route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            http_request_seconds.observe(time.perf_counter() - start, method, path)
+            http_requests_total.inc(method, path, str(status[0]))
+
+
+# Global registry and the backend's metrics
+registry = Registry()
+
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "path"))
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "path", "status"))
+sdk_call_seconds = registry.histogram(
+    "mstock_call_duration_seconds", "Latency of mStock SDK calls", ("method",))
+sdk_call_errors = registry.counter(
+    "mstock_call_errors_total", "mStock SDK calls that raised", ("method",))
+sdk_ltp_format = registry.counter(
+    "mstock_ltp_format_total", "Instrument format that answered get_data_smart", ("format",))
+engine_step_seconds = registry.histogram(
+    "autobuy_engine_step_duration_seconds", "NotifyAutoBuyEngine.step() duration")
+quote_staleness = registry.gauge(
+    "quote_staleness_seconds", "Seconds since the last non-empty quote snapshot")
+notifications_depth = registry.gauge(
+    "notifications_buffer_depth", "Entries held in the notifications buffer")
+orders_total = registry.counter(
+    "orders_total", "Orders submitted by source and outcome", ("source", "result"))
+order_queue_depth = registry.gauge(
+    "order_queue_depth", "Orders waiting for a dispatcher")
+order_dispatch_seconds = registry.histogram(
+    "order_dispatch_duration_seconds", "Broker round-trip per dispatched order")
+margin_available = registry.gauge(
+    "margin_available", "Free margin after settled fills and open reservations")
+sdk_circuit_rejections = registry.counter(
+    "mstock_circuit_rejections_total", "mStock calls refused while the circuit breaker was open", ("method",))
+sdk_relogins = registry.counter(
+    "mstock_relogins_total", "Supervisor re-login attempts by outcome", ("result",))
+sdk_rate_wait_seconds = registry.histogram(
+    "mstock_rate_wait_seconds", "Time SDK calls queued for a rate-limit token", ("class",))
+sdk_rate_queue = registry.gauge(
+    "mstock_rate_queue_depth", "SDK calls waiting for a rate-limit token", ("class",))
+sdk_rate_events = registry.counter(
+    "mstock_rate_events_total", "Broker rate-limit answers (throttled) and calls that gave up waiting (timeout)",
+    ("class", "event"))
+broker_rate_limit = registry.gauge(
+    "mstock_rate_limit", "Primary session's current broker call rate limit (calls/second, adapts to 429s)")
+broker_circuit_state = registry.gauge(
+    "mstock_circuit_state", "Primary session circuit breaker: 0 closed, 1 half-open, 2 open")
+quote_polls = registry.counter(
+    "quote_polls_total", "Quote polls by tier (full quotes or LTP only)", ("tier",))
+quote_poll_symbols = registry.histogram(
+    "quote_poll_symbols", "Symbols fetched per quote poll", buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000))
+subscribed_symbols = registry.gauge(
+    "subscribed_symbols", "Symbols in the union of market-data subscriptions")
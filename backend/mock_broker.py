@@ -0,0 +1,233 @@
+"""
+Local stand-in for the mStock SDK's MConnect.
+
+Select it with MSTOCK_BROKER=mock (in the environment or .env). MStockClient then
+talks to MockMConnect instead of tradingapi_a, so the backend, benchmarks and
+load tests run offline without credentials.
+
+Every symbol follows its own random walk, seeded from the symbol name so runs
+are reproducible, and advances lazily by the wall-clock time since it was last
+quoted. Unknown symbols are created on first request, so any universe size works.
+
+Tunables (environment):
+  MOCK_BROKER_LATENCY_MS   mean latency per call (default 20)
+  MOCK_BROKER_JITTER_MS    latency standard deviation (default 5)
+  MOCK_BROKER_ERROR_RATE   probability a call raises (default 0)
+  MOCK_BROKER_RATE_LIMIT   max calls per second before 429 errors (default 0 = unlimited)
+  MOCK_BROKER_VOLATILITY   annualised volatility of the walk (default 0.25)
+  MOCK_BROKER_SEED         seed for latency/error draws (default 7)
+  MOCK_BROKER_CASH         starting cash for get_fund_summary (default 100000)
+"""
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Dict, List
+
+# Seconds in an NSE trading year (252 days x 6.25 h), used to scale volatility
+TRADING_SECONDS_PER_YEAR = 252 * 6.25 * 3600
+
+INTERVAL_SECONDS = {
+    '1m': 60, '5m': 300, '15m': 900, '1h': 3600, '1d': 86400, '1w': 7 * 86400,
+}
+
+
+class MockBrokerError(Exception):
+    """Raised for injected failures and rate-limit rejections."""
+
+
+def mock_universe(count: int, exchange: str = "NSE") -> List[str]:
+    """Synthetic symbol list for load tests and benchmarks, e.g. NSE:MOCK0001."""
+    return [f"{exchange}:MOCK{i:04d}" for i in range(1, count + 1)]
+
+
+class _SymbolState:
+    __slots__ = ("price", "open", "high", "low", "prev_close", "volume", "updated")
+
+    def __init__(self, base: float, now: float):
+        self.price = base
+        self.open = base
+        self.high = base
+        self.low = base
+        self.prev_close = base
+        self.volume = 0
+        self.updated = now
+
+
+class MockMConnect:
+    """Mimics the subset of MConnect used by MStockClient."""
+
+    def __init__(self, api_key: str = None, **kwargs):
+        self.api_key = api_key
+        self.vendor_key = None
+        self.app_key = None
+        self.latency_ms = float(os.getenv("MOCK_BROKER_LATENCY_MS", "20"))
+        self.jitter_ms = float(os.getenv("MOCK_BROKER_JITTER_MS", "5"))
+        self.error_rate = float(os.getenv("MOCK_BROKER_ERROR_RATE", "0"))
+        self.rate_limit = int(os.getenv("MOCK_BROKER_RATE_LIMIT", "0"))
+        self.volatility = float(os.getenv("MOCK_BROKER_VOLATILITY", "0.25"))
+        self._rng = random.Random(int(os.getenv("MOCK_BROKER_SEED", "7")))
+        self._lock = threading.Lock()
+        self._symbols: Dict[str, _SymbolState] = {}
+        self._calls: deque = deque()
+        self._order_seq = 0
+        self.cash = float(os.getenv("MOCK_BROKER_CASH", "100000"))
+        self.utilized = 0.0
+        self._holdings: Dict[str, List[float]] = {}  # symbol -> [quantity, cost basis] of longs
+        self.logged_in = False
+
+    # -- simulated broker behaviour ---------------------------------------
+
+    def _simulate_call(self):
+        """Apply rate limiting, injected errors and latency, like a remote call would."""
+        now = time.monotonic()
+        with self._lock:
+            if self.rate_limit > 0:
+                while self._calls and now - self._calls[0] > 1.0:
+                    self._calls.popleft()
+                if len(self._calls) >= self.rate_limit:
+                    raise MockBrokerError("429 Too Many Requests: rate limit exceeded")
+                self._calls.append(now)
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            delay = max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000.0
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise MockBrokerError("503 Service Unavailable: injected mock failure")
+
+    def _state(self, key: str, now: float) -> _SymbolState:
+        st = self._symbols.get(key)
+        if st is None:
+            seed = zlib.crc32(key.encode())
+            base = round(50 + (seed % 500_000) / 100.0, 2)  # 50 .. 5050
+            st = self._symbols[key] = _SymbolState(base, now)
+        return st
+
+    def _advance(self, st: _SymbolState, now: float, rng: random.Random):
+        dt = now - st.updated
+        if dt <= 0:
+            return
+        sigma = self.volatility * math.sqrt(dt / TRADING_SECONDS_PER_YEAR)
+        st.price = round(max(0.05, st.price * math.exp(sigma * rng.gauss(0.0, 1.0) - 0.5 * sigma * sigma)), 2)
+        st.high = max(st.high, st.price)
+        st.low = min(st.low, st.price)
+        st.volume += int(rng.expovariate(1.0) * 500 * dt) + 1
+        st.updated = now
+
+    @staticmethod
+    def _key(instrument: Any) -> str:
+        if isinstance(instrument, dict):
+            ex = instrument.get("exchange", "NSE")
+            sym = instrument.get("symbol") or instrument.get("token")
+            return f"{ex}:{sym}"
+        s = str(instrument)
+        return s if ":" in s else f"NSE:{s}"
+
+    # -- MConnect surface --------------------------------------------------
+
+    def login(self, user_id: str = None, password: str = None, **kwargs):
+        self._simulate_call()
+        self.logged_in = True
+        return {"status": "success", "message": "mock session", "user_id": user_id}
+
+    def logout(self):
+        self.logged_in = False
+        return {"status": "success"}
+
+    def _quotes(self, instruments: List[Any], full: bool) -> Dict[str, Dict[str, Any]]:
+        self._simulate_call()
+        now = time.time()
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for inst in instruments:
+                key = self._key(inst)
+                st = self._state(key, now)
+                self._advance(st, now, self._rng)
+                if not full:
+                    out[key] = {"ltp": st.price, "volume": st.volume}
+                    continue
+                out[key] = {
+                    "ltp": st.price,
+                    "open": st.open,
+                    "high": st.high,
+                    "low": st.low,
+                    "volume": st.volume,
+                    "previousClose": st.prev_close,
+                }
+        return out
+
+    def get_ltp(self, instruments: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """Last price and volume only (the fast polling tier)."""
+        return self._quotes(instruments, full=False)
+
+    def get_quote(self, instruments: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """Full quote: OHLC, volume and previous close."""
+        return self._quotes(instruments, full=True)
+
+    def get_historical(self, symbol: str, interval: str = "1m", count: int = 12) -> List[Dict[str, Any]]:
+        self._simulate_call()
+        step = INTERVAL_SECONDS.get(interval, 60)
+        now = time.time()
+        with self._lock:
+            last = self._state(self._key(symbol), now).price
+        # Walk backwards from the current price, deterministic per symbol/interval
+        rng = random.Random(zlib.crc32(f"{symbol}|{interval}".encode()))
+        sigma = self.volatility * math.sqrt(min(step, 6.25 * 3600) / TRADING_SECONDS_PER_YEAR)
+        end_ts = int(now // step * step)
+        candles: List[Dict[str, Any]] = []
+        close = last
+        for i in range(count):
+            open_ = round(close / math.exp(sigma * rng.gauss(0.0, 1.0)), 2)
+            high = round(max(open_, close) * (1 + abs(rng.gauss(0.0, sigma / 2))), 2)
+            low = round(min(open_, close) * (1 - abs(rng.gauss(0.0, sigma / 2))), 2)
+            candles.append({
+                "ts": (end_ts - i * step) * 1000,
+                "open": open_, "high": high, "low": low, "close": round(close, 2),
+                "volume": int(rng.expovariate(1.0) * 500 * step) + 1,
+            })
+            close = open_
+        candles.reverse()
+        return candles
+
+    def get_fund_summary(self) -> Dict[str, float]:
+        self._simulate_call()
+        with self._lock:
+            return {"available": round(self.cash, 2), "utilized": round(self.utilized, 2)}
+
+    def place_order(self, exchange: str, symbol: str, quantity: int, order_type: str = "MARKET",
+                    side: str = "BUY", product: str = "DELIVERY", price: float = None, **kwargs) -> Dict[str, Any]:
+        self._simulate_call()
+        if int(quantity) <= 0:
+            raise MockBrokerError("400 Bad Request: quantity must be positive")
+        with self._lock:
+            self._order_seq += 1
+            order_id = f"MOCK-{self._order_seq:08d}"
+            key = f"{exchange}:{symbol}"
+            st = self._state(key, time.time())
+            fill = st.price
+            notional = fill * int(quantity)
+            if side.upper() == "BUY":
+                if notional > self.cash:
+                    raise MockBrokerError("400 Bad Request: insufficient funds")
+                self.cash -= notional
+                self.utilized += notional
+                held = self._holdings.setdefault(key, [0, 0.0])
+                held[0] += int(quantity)
+                held[1] += notional
+            else:
+                self.cash += notional
+                # Selling out of a long frees the capital it tied up, at its cost basis
+                held = self._holdings.get(key)
+                if held:
+                    closing = min(int(quantity), held[0])
+                    released = held[1] * closing / held[0]
+                    self.utilized = max(0.0, self.utilized - released)
+                    held[0] -= closing
+                    held[1] -= released
+                    if not held[0]:
+                        del self._holdings[key]
+        return {"order_id": order_id, "status": "COMPLETE", "average_price": fill,
+                "side": side, "quantity": int(quantity)}
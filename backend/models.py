@@ -48,3 +48,8 @@ class OrderRequest(BaseModel):
     order_type: str  # 'BUY' | 'SELL'
     strategy: str  # Which strategy triggered this
     price: float = 0.0  # Current price for logging
+    idempotency_key: Optional[str] = None  # Duplicate submissions with the same key collapse into one order
+    account: Optional[str] = None  # Stored mStock account to place with; primary when omitted
+
+class WatchlistUpdate(BaseModel):
+    symbols: List[str]  # 'NSE:INFY', 'infy' (NSE assumed), 'NFO:...'
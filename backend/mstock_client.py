@@ -1,21 +1,291 @@
 import os
+import re
+import threading
+import time
 from dotenv import load_dotenv
+from typing import Dict, Optional
+from metrics import (sdk_call_seconds, sdk_call_errors, sdk_ltp_format, sdk_circuit_rejections, sdk_relogins,
+                     sdk_rate_wait_seconds, sdk_rate_queue, sdk_rate_events)
+from profiler import span
 # Note: Import might vary based on actual package structure. 
 # Assuming 'mStock_TradingApi_A' or similar. 
 # If the package name is 'mStock-TradingApi-A', the import is likely 'mStock_TradingApi_A' or just 'mStock'.
 # I will use a try-except block to handle potential import naming issues or mock it if not found.
 
-try:
-    from tradingapi_a.mconnect import MConnect
-except ImportError:
-    print("mStock SDK not found. Using Mock Client.")
-    MConnect = None
-
 # Load .env from project root (one level up from backend/)
 env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
 load_dotenv(dotenv_path=env_path)
 print(f"DEBUG: Loading .env from: {env_path}")
 
+# MSTOCK_BROKER=mock swaps the SDK for the local random-walk broker (offline testing)
+BROKER = os.getenv("MSTOCK_BROKER", "live").lower()
+
+if BROKER == "mock":
+    from mock_broker import MockMConnect as MConnect
+    print("Using local mock broker (MSTOCK_BROKER=mock).")
+else:
+    try:
+        from tradingapi_a.mconnect import MConnect
+    except ImportError:
+        print("mStock SDK not found. Using Mock Client.")
+        MConnect = None
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+# Errors that say nothing about broker health (bad order, throttling) never trip the breaker.
+# Status codes are matched as codes (see _status_code), never as substrings of the message.
+NON_OUTAGE_STATUS = (400, 429)
+NON_OUTAGE_MARKERS = ("bad request", "rate limit", "too many requests", "insufficient")
+RATE_LIMIT_STATUS = 429
+RATE_LIMIT_MARKERS = ("rate limit", "too many requests")
+# "429 Too Many Requests", "HTTP 400", "status: 429", "status code=400"
+_STATUS_RE = re.compile(r"^\s*(?:http\s*)?(\d{3})\b|\b(?:status(?:\s*code)?|http)\s*[:=]?\s*(\d{3})\b", re.I)
+
+
+def _status_code(e: Exception) -> Optional[int]:
+    """HTTP status of an SDK error: from a status attribute, else a status-shaped prefix or field."""
+    for holder in (e, getattr(e, "response", None)):
+        for attr in ("status_code", "status"):
+            code = getattr(holder, attr, None)
+            if isinstance(code, int):
+                return code
+    m = _STATUS_RE.search(str(e))
+    return int(m.group(1) or m.group(2)) if m else None
+
+
+def _is_rate_limited(e: Exception) -> bool:
+    message = str(e).lower()
+    return _status_code(e) == RATE_LIMIT_STATUS or any(m in message for m in RATE_LIMIT_MARKERS)
+
+
+def _is_outage(e: Exception) -> bool:
+    message = str(e).lower()
+    return _status_code(e) not in NON_OUTAGE_STATUS and not any(m in message for m in NON_OUTAGE_MARKERS)
+
+# Endpoint classes sharing a session's API quota, highest priority first
+RATE_CLASSES = ("order", "quote", "candle", "account", "bulk")
+# Methods not listed here are paced as "bulk", so nothing unmapped spends the quote budget
+METHOD_CLASSES = {
+    "place_order": "order",
+    "get_quote": "quote", "get_ltp": "quote",
+    "get_historical": "candle", "get_ohlc": "candle",
+    "get_fund_summary": "account", "get_funds": "account", "get_margin": "account",
+}
+# Longest a call queues for its token before giving up (None = wait as long as it takes)
+MAX_WAIT = {"order": 5.0, "quote": 2.0, "candle": 10.0, "account": 10.0, "bulk": None}
+
+
+class BrokerUnavailable(Exception):
+    """Raised instead of calling the SDK while the circuit breaker is open."""
+
+
+class RateLimited(BrokerUnavailable):
+    """Raised when a call could not get a rate-limit token within its class's MAX_WAIT."""
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the broker is down. After failure_threshold consecutive
+    outage errors the circuit opens and calls are refused without touching the
+    SDK. Once reset_timeout has passed, one trial call is let through (half-open):
+    success closes the circuit, failure re-opens it with the timeout doubled (up
+    to max_timeout).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 5.0, max_timeout: float = 120.0):
+        self.failure_threshold = failure_threshold
+        self.base_timeout = reset_timeout
+        self.max_timeout = max_timeout
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_timeout
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """The half-open trial call was never made (e.g. no rate token); let another try."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Count an outage error; returns True when this call opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_timeout)
+            elif self.failures < self.failure_threshold or self.state == OPEN:
+                return False
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+            return True
+
+    def state_code(self) -> int:
+        return {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[self.state]
+
+    def to_dict(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "reset_timeout": self.reset_timeout}
+
+
+class _Bucket:
+    """Token bucket; rate <= 0 means unlimited. Callers hold RateGovernor's lock."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def ready(self) -> bool:
+        return self.rate <= 0 or self.tokens >= 1.0
+
+    def take(self) -> None:
+        if self.rate > 0:
+            self.tokens -= 1.0
+
+    def delay(self) -> float:
+        """Seconds until the next token."""
+        return 0.0 if self.ready() else (1.0 - self.tokens) / self.rate
+
+
+class RateGovernor:
+    """
+    One session's API quota, shared by every SDK call. A call takes a token from
+    the session bucket (rate) and from its endpoint class's bucket (class_rates).
+    Classes are served in strict priority (RATE_CLASSES order): while a
+    higher-priority call waits only on the session bucket, lower classes do not
+    take session tokens, so bulk and candle traffic cannot delay orders or quotes.
+
+    A rate-limit answer from the broker (429) halves the session rate, at most
+    once per second and down to min_fraction of the configured rate, and empties
+    the bucket. The rate then recovers linearly to the configured value over
+    recovery seconds.
+    """
+
+    def __init__(self, rate: float, class_rates: Dict[str, float], burst: Optional[float] = None,
+                 min_fraction: float = 0.1, recovery: float = 30.0):
+        self.max_rate = float(rate)
+        self.session = _Bucket(rate, burst)
+        self.classes = {c: _Bucket(class_rates.get(c, 0.0)) for c in RATE_CLASSES}
+        self.min_rate = self.max_rate * min_fraction
+        self.recovery = recovery
+        self.waiting = {c: 0 for c in RATE_CLASSES}
+        self.throttles = 0
+        self._cut_at = 0.0
+        self._recovered_at = 0.0
+        self._cond = threading.Condition()
+
+    def _recover(self, now: float) -> None:
+        bucket = self.session
+        if 0 < bucket.rate < self.max_rate:
+            step = self.max_rate * (now - self._recovered_at) / self.recovery
+            bucket.rate = min(self.max_rate, bucket.rate + step)
+        self._recovered_at = now
+
+    def acquire(self, cls: str, max_wait: Optional[float] = None) -> float:
+        """Block until cls may call the broker; returns seconds waited. Raises RateLimited."""
+        own = self.classes[cls]
+        higher = RATE_CLASSES[:RATE_CLASSES.index(cls)]
+        start = time.monotonic()
+        with self._cond:
+            self.waiting[cls] += 1
+            sdk_rate_queue.inc(cls)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._recover(now)
+                    self.session.refill(now)
+                    own.refill(now)
+                    # A higher class that only lacks a session token goes first
+                    yield_to = any(self.waiting[c] and self.classes[c].ready() for c in higher)
+                    if not yield_to and self.session.ready() and own.ready():
+                        self.session.take()
+                        own.take()
+                        break
+                    delay = max(self.session.delay(), own.delay(), 0.001)
+                    if max_wait is not None:
+                        remaining = max_wait - (now - start)
+                        if remaining <= 0:
+                            sdk_rate_events.inc(cls, "timeout")
+                            raise RateLimited(f"mStock {cls} rate limit: no token within {max_wait:g}s")
+                        delay = min(delay, remaining)
+                    self._cond.wait(delay)
+            finally:
+                self.waiting[cls] -= 1
+                sdk_rate_queue.dec(cls)
+                self._cond.notify_all()
+        waited = time.monotonic() - start
+        sdk_rate_wait_seconds.observe(waited, cls)
+        return waited
+
+    def throttled(self, cls: str) -> None:
+        """The broker answered a cls call with a rate-limit error: back off."""
+        sdk_rate_events.inc(cls, "throttled")
+        with self._cond:
+            now = time.monotonic()
+            self.throttles += 1
+            bucket = self.session
+            if bucket.rate <= 0 or now - self._cut_at < 1.0:
+                return  # unlimited, or the same burst already cut the rate
+            self._cut_at = self._recovered_at = now
+            bucket.rate = max(self.min_rate, bucket.rate / 2)
+            bucket.tokens = 0.0
+        print(f"mStock rate limit hit ({cls}); session rate cut to {bucket.rate:.1f}/s")
+
+    @property
+    def rate(self) -> float:
+        return self.session.rate
+
+    def to_dict(self) -> Dict:
+        with self._cond:
+            return {
+                "rate": round(self.session.rate, 2),
+                "max_rate": self.max_rate,
+                "throttles": self.throttles,
+                "classes": {c: {"rate": b.rate, "waiting": self.waiting[c]} for c, b in self.classes.items()},
+            }
+
+
+def rate_governor_from_env() -> RateGovernor:
+    """Session and per-class broker rates from the environment (calls/second, 0 = unlimited)."""
+    return RateGovernor(
+        rate=float(os.getenv("BROKER_RATE_PER_SEC", "10")),
+        class_rates={
+            "order": float(os.getenv("BROKER_ORDER_RATE", "10")),
+            "quote": float(os.getenv("BROKER_QUOTE_RATE", "5")),
+            "candle": float(os.getenv("BROKER_CANDLE_RATE", "3")),
+            "account": float(os.getenv("BROKER_ACCOUNT_RATE", "1")),
+            "bulk": float(os.getenv("BROKER_BULK_RATE", "2")),
+        },
+        recovery=float(os.getenv("BROKER_RATE_RECOVERY_SECONDS", "30")),
+    )
+
+
 class MStockClient:
     def __init__(self):
         self.api_key = os.getenv("MSTOCK_API_KEY")
@@ -25,9 +295,25 @@ class MStockClient:
         # TOTP not required for this account; ignore any env
         self.totp = None
         self.vendor_key = os.getenv("MSTOCK_VENDOR_KEY")
+        if BROKER == "mock":
+            # The mock accepts any credentials; fill gaps so login() takes the full path
+            self.api_key = self.api_key or "mock-api-key"
+            self.client_code = self.client_code or "mock-user"
+            self.password = self.password or "mock-password"
         self.client = None
         # Connection flag is managed defensively after attempting login
         self.is_connected = False
+        # Supervision: breaker around SDK calls, periodic probes and re-login backoff
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("BROKER_FAILURE_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("BROKER_RESET_SECONDS", "5")),
+        )
+        self.governor = rate_governor_from_env()
+        self.last_ok = 0.0
+        self.login_backoff_base = float(os.getenv("BROKER_RELOGIN_BACKOFF", "2"))
+        self.login_backoff = self.login_backoff_base
+        self.next_login_at = 0.0
+        self.probe_symbol = os.getenv("BROKER_PROBE_SYMBOL", "NSE:INFY")
         
         # Debug: Log what was loaded
         print(f"DEBUG: API Key present: {bool(self.api_key)}")
@@ -46,6 +332,77 @@ class MStockClient:
         if self.api_key and self.vendor_key and self.api_key == self.vendor_key:
             print("DEBUG: API and Vendor keys are identical; unified key will be used for auth")
 
+    def _sdk(self, method: str, *args, rate_class: Optional[str] = None, **kwargs):
+        """Invoke an SDK method through the rate governor and circuit breaker, recording
+        latency and errors. rate_class overrides the method's class in METHOD_CLASSES."""
+        fn = getattr(self.client, method)
+        guarded = method not in ('login', 'logout')
+        cls = rate_class or METHOD_CLASSES.get(method, "bulk")
+        if guarded:
+            # Breaker first: during an outage calls fail at once instead of queueing for quota
+            if not self.breaker.allow():
+                sdk_circuit_rejections.inc(method)
+                raise BrokerUnavailable(f"mStock circuit open; {method} not attempted")
+            try:
+                self.governor.acquire(cls, MAX_WAIT.get(cls))
+            except RateLimited:
+                self.breaker.release_trial()
+                raise
+        start = time.perf_counter()
+        try:
+            with span("broker"):
+                result = fn(*args, **kwargs)
+        except Exception as e:
+            sdk_call_errors.inc(method)
+            if guarded:
+                if _is_rate_limited(e):
+                    self.governor.throttled(cls)
+                if not _is_outage(e):
+                    self.breaker.record_success()  # the broker answered
+                elif self.breaker.record_failure():
+                    print(f"mStock circuit opened after {self.breaker.failures} failures: {e}")
+                    # Stale sessions are the usual cause; let the supervisor re-login
+                    self.is_connected = False
+            raise
+        finally:
+            sdk_call_seconds.observe(time.perf_counter() - start, method)
+        if guarded:
+            self.breaker.record_success()
+            self.last_ok = time.time()
+        return result
+
+    def check_health(self, idle_seconds: float = 15.0) -> bool:
+        """
+        Supervisor hook: probe an idle session with a one-symbol LTP call, and
+        re-login with exponential backoff while it is down. Returns True if up.
+        """
+        now = time.time()
+        if self.is_connected and self.client is not None:
+            if now - self.last_ok < idle_seconds:
+                return True
+            # Same format fallbacks as real fetches; failures feed the breaker via _sdk
+            resp, _ = self.get_data_smart([self.probe_symbol], mode="ltp")
+            if resp:
+                return True
+            if self.is_connected and self.breaker.state == CLOSED:
+                return True  # one failed probe is not an outage yet
+        if not (self.api_key and self.client_code and self.password):
+            return False  # nothing to log in with
+        if now < self.next_login_at:
+            return False
+        print(f"mStock session down; re-login attempt (backoff {self.login_backoff:.0f}s)")
+        if self.login() and self.is_connected:
+            sdk_relogins.inc("success")
+            self.breaker.record_success()
+            self.login_backoff = self.login_backoff_base
+            self.next_login_at = 0.0
+            self.last_ok = time.time()
+            return True
+        sdk_relogins.inc("failure")
+        self.next_login_at = time.time() + self.login_backoff
+        self.login_backoff = min(self.login_backoff * 2, 300.0)
+        return False
+
     def login(self):
         if not MConnect:
             print("SDK not installed.")
@@ -82,7 +439,7 @@ class MStockClient:
                 # Some SDKs return None or a non-boolean on success.
                 # Treat absence of exception and presence of client as success.
                 try:
-                    response = self.client.login(**login_kwargs)
+                    response = self._sdk('login', **login_kwargs)
                     print(f"mStock Login Response: {response}")
                     self.is_connected = True
                     # Return True regardless of response truthiness on success path
@@ -102,6 +459,7 @@ class MStockClient:
 
         except Exception as e:
             print(f"mStock Login Exception: {e}")
+            self.is_connected = False
             return False
 
     def get_data(self, tokens):
@@ -115,7 +473,7 @@ class MStockClient:
         try:
             # Try to fetch LTP
             # Note: get_ltp expects a list of instruments
-            response = self.client.get_ltp(tokens)
+            response = self._sdk('get_ltp', tokens)
             return response
         except Exception as e:
             print(f"Error fetching data: {e}")
@@ -130,14 +488,17 @@ class MStockClient:
         except Exception:
             return "NSE", s
 
-    def get_data_smart(self, symbols):
+    def get_data_smart(self, symbols, mode: str = "full"):
         """
-        Try multiple input formats to fetch LTP to avoid token-format mismatch.
+        Try multiple input formats to fetch quotes to avoid token-format mismatch.
+        mode 'full' asks for full quotes (OHLC, volume, previous close) via get_quote when
+        the SDK has it, else get_ltp; mode 'ltp' asks get_ltp for last prices only.
         Returns a tuple: (response, format_used)
         format_used: one of 'exchange_symbol', 'exchange_token', 'plain_strings', 'error'
         """
         if not self.client:
             return {}, "error"
+        method = "get_quote" if mode == "full" and hasattr(self.client, "get_quote") else "get_ltp"
 
         # Variant A: [{'exchange': 'NSE', 'symbol': 'INFY'}]
         ex_sym = []
@@ -145,10 +506,12 @@ class MStockClient:
             ex, sym = self._split_symbol(s)
             ex_sym.append({"exchange": ex, "symbol": sym})
         try:
-            resp = self.client.get_ltp(ex_sym)
+            resp = self._sdk(method, ex_sym)
             if resp:
-                print("DEBUG: Live fetch succeeded with exchange+symbol format")
+                sdk_ltp_format.inc("exchange_symbol")
                 return resp, "exchange_symbol"
+        except BrokerUnavailable:
+            return {}, "error"  # circuit open: fail fast, skip the other formats
         except Exception as e:
             print(f"DEBUG: exchange+symbol format failed: {e}")
 
@@ -158,23 +521,28 @@ class MStockClient:
             ex, sym = self._split_symbol(s)
             ex_tok.append({"exchange": ex, "token": sym})
         try:
-            resp = self.client.get_ltp(ex_tok)
+            resp = self._sdk(method, ex_tok)
             if resp:
-                print("DEBUG: Live fetch succeeded with exchange+token format")
+                sdk_ltp_format.inc("exchange_token")
                 return resp, "exchange_token"
+        except BrokerUnavailable:
+            return {}, "error"
         except Exception as e:
             print(f"DEBUG: exchange+token format failed: {e}")
 
         # Variant C: plain strings ["NSE:INFY", ...]
         try:
-            resp = self.client.get_ltp(symbols)
+            resp = self._sdk(method, symbols)
             if resp:
-                print("DEBUG: Live fetch succeeded with plain strings format")
+                sdk_ltp_format.inc("plain_strings")
                 return resp, "plain_strings"
+        except BrokerUnavailable:
+            return {}, "error"
         except Exception as e:
             print(f"DEBUG: plain strings format failed: {e}")
 
         print("DEBUG: Live fetch returned empty for all formats; falling back")
+        sdk_ltp_format.inc("error")
         return {}, "error"
 
     def place_order(self, symbol, quantity, order_type='BUY', product='DELIVERY'):
@@ -188,7 +556,8 @@ class MStockClient:
             product: 'DELIVERY' or 'INTRADAY'
             
         Returns:
-            dict: {'success': bool, 'order_id': str, 'message': str}
+            dict: {'success': bool, 'order_id': str, 'message': str}; 'error': True when
+            the order was never sent (circuit open or rate limited)
         """
         if not self.client or not self.is_connected:
             return {'success': False, 'message': 'Not connected to mStock'}
@@ -202,7 +571,8 @@ class MStockClient:
             exchange, stock_symbol = parts
             
             # Place market order
-            response = self.client.place_order(
+            response = self._sdk(
+                'place_order',
                 exchange=exchange,
                 symbol=stock_symbol,
                 quantity=quantity,
@@ -220,18 +590,53 @@ class MStockClient:
             return {
                 'success': True,
                 'order_id': order_id,
+                'price': response.get('average_price'),  # fill price when the API reports it
                 'message': f'{order_type} order placed for {quantity} {stock_symbol}'
             }
             
+        except BrokerUnavailable as e:
+            # Refused locally (circuit open or no rate token): never sent, so not a broker rejection
+            print(f"Order not sent: {e}")
+            return {'success': False, 'message': f"Order not sent: {e}", 'error': True}
         except Exception as e:
             error_msg = f"Order placement failed: {str(e)}"
             print(error_msg)
             return {'success': False, 'message': error_msg}
 
-    def get_candles(self, symbol: str, interval: str, count: int):
+    def get_margin(self):
+        """
+        Fetch available/utilized margin via the SDK if it exposes a funds API.
+        Returns (available, utilized) or None when unavailable.
+        """
+        if not self.client:
+            return None
+        for method in ('get_fund_summary', 'get_funds', 'get_margin'):
+            if not hasattr(self.client, method):
+                continue
+            try:
+                resp = self._sdk(method)
+            except Exception as e:
+                print(f"Error fetching margin via {method}: {e}")
+                continue
+            if isinstance(resp, list) and resp:
+                resp = resp[0]
+            if isinstance(resp, dict) and isinstance(resp.get('data'), (dict, list)):
+                resp = resp['data'][0] if isinstance(resp['data'], list) and resp['data'] else resp['data']
+            if not isinstance(resp, dict):
+                continue
+            available = next((resp[k] for k in ('available', 'availablecash', 'available_cash', 'net', 'AVAILABLE_BALANCE') if resp.get(k) is not None), None)
+            utilized = next((resp[k] for k in ('utilized', 'utilised', 'utilized_margin', 'UTILIZED_MARGIN') if resp.get(k) is not None), 0.0)
+            try:
+                return float(available), float(utilized or 0.0)
+            except (TypeError, ValueError):
+                continue
+        return None
+
+    def get_candles(self, symbol: str, interval: str, count: int, rate_class: str = "candle"):
         """
         Attempt to fetch historical candles via SDK if available.
         Returns a list of dicts with keys: open, high, low, close, volume, timestamp
+        rate_class 'bulk' queues behind interactive candle requests (backfills, exports).
         """
         if not self.client:
             return []
@@ -239,9 +644,11 @@ class MStockClient:
             # Many SDKs expose a historical API like get_historical or get_ohlc
             # Since exact name is unknown, try common variants.
             if hasattr(self.client, 'get_historical'):
-                return self.client.get_historical(symbol=symbol, interval=interval, count=count)
+                return self._sdk('get_historical', symbol=symbol, interval=interval, count=count,
+                                 rate_class=rate_class)
             if hasattr(self.client, 'get_ohlc'):
-                return self.client.get_ohlc(symbol=symbol, interval=interval, count=count)
+                return self._sdk('get_ohlc', symbol=symbol, interval=interval, count=count,
+                                 rate_class=rate_class)
         except Exception as e:
             print(f"Error fetching candles: {e}")
         return []
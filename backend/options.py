@@ -0,0 +1,265 @@
+"""
+NFO option contracts, chains and vectorized Black-Scholes analytics.
+
+Contract symbols follow the broker's compact form, e.g. NFO:NIFTY14AUG25C24600
+(underlying NIFTY, expiry 14-Aug-2025, call, strike 24600).
+
+There is no instrument master in this backend, so a chain is the union of
+  - option contracts already known from watchlists for that underlying/expiry, and
+  - a strike ladder of `strikes` steps either side of the ATM strike
+    (STRIKE_STEPS per underlying, otherwise derived from the spot price).
+
+chain_analytics() takes every contract of a chain at once and solves implied
+volatility and the Greeks as NumPy arrays: a safeguarded Newton iteration (each
+row keeps a [lo, hi] bracket and bisects whenever Newton leaves it), with the
+normal CDF built on the Abramowitz-Stegun 7.1.26 erf approximation
+(|error| < 1.5e-7) so SciPy is not needed.
+"""
+import math
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time as dtime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+OPTION_RE = re.compile(r"^(?P<und>[A-Z&-]+?)(?P<day>\d{2})(?P<mon>[A-Z]{3})(?P<yr>\d{2})(?P<right>[CP])(?P<strike>\d+(?:\.\d+)?)$")
+MONTHS = {m: i for i, m in enumerate(
+    ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"), 1)}
+
+# Listed strike intervals for the common index underlyings
+STRIKE_STEPS = {"NIFTY": 50, "BANKNIFTY": 100, "FINNIFTY": 50, "MIDCPNIFTY": 25, "SENSEX": 100}
+# Spot symbols of index underlyings (equity underlyings use NSE:<name>)
+INDEX_SPOT = {"NIFTY": "NSE:NIFTY 50", "BANKNIFTY": "NSE:NIFTY BANK",
+              "FINNIFTY": "NSE:NIFTY FIN SERVICE", "MIDCPNIFTY": "NSE:NIFTY MID SELECT"}
+EXPIRY_CLOSE = dtime(15, 30)
+YEAR_SECONDS = 365.0 * 86400
+
+IV_LOW, IV_HIGH = 1e-4, 5.0
+# Below this much time value (a fraction of the 0.05 tick) IV is not identifiable
+MIN_TIME_VALUE = 0.01
+
+
+@dataclass(frozen=True)
+class OptionContract:
+    symbol: str
+    underlying: str
+    expiry: date
+    right: str  # 'C' | 'P'
+    strike: float
+
+    @property
+    def expiry_code(self) -> str:
+        return expiry_code(self.expiry)
+
+
+def expiry_code(d: date) -> str:
+    return d.strftime("%d%b%y").upper()
+
+
+def parse_expiry(code: str) -> Optional[date]:
+    """'14AUG25' -> date(2025, 8, 14)."""
+    m = re.fullmatch(r"(\d{2})([A-Z]{3})(\d{2})", code.strip().upper())
+    if not m or m.group(2) not in MONTHS:
+        return None
+    try:
+        return date(2000 + int(m.group(3)), MONTHS[m.group(2)], int(m.group(1)))
+    except ValueError:
+        return None
+
+
+def parse_option_symbol(symbol: str) -> Optional[OptionContract]:
+    """OptionContract for an NFO option symbol, None for anything else."""
+    ex, _, name = symbol.partition(":")
+    if not name:
+        ex, name = "NFO", ex
+    if ex.upper() != "NFO":
+        return None
+    m = OPTION_RE.match(name.upper())
+    if not m:
+        return None
+    expiry = parse_expiry(m.group("day") + m.group("mon") + m.group("yr"))
+    if expiry is None:
+        return None
+    return OptionContract(symbol=f"NFO:{name.upper()}", underlying=m.group("und"), expiry=expiry,
+                          right=m.group("right"), strike=float(m.group("strike")))
+
+
+def option_symbol(underlying: str, expiry: date, right: str, strike: float) -> str:
+    k = int(strike) if float(strike).is_integer() else strike
+    return f"NFO:{underlying}{expiry_code(expiry)}{right}{k}"
+
+
+def spot_symbol(underlying: str) -> str:
+    return INDEX_SPOT.get(underlying, f"NSE:{underlying}")
+
+
+def strike_step(underlying: str, spot: float) -> float:
+    if underlying in STRIKE_STEPS:
+        return STRIKE_STEPS[underlying]
+    # Roughly 1% of spot, rounded to 1/2.5/5 x 10^n
+    raw = max(spot * 0.01, 0.5)
+    mag = 10 ** math.floor(math.log10(raw))
+    return min((m * mag for m in (1, 2.5, 5, 10)), key=lambda v: abs(v - raw))
+
+
+def chain_contracts(underlying: str, expiry: date, spot: Optional[float], strikes: int,
+                    known: Iterable[OptionContract] = ()) -> List[OptionContract]:
+    """Contracts of one expiry: known ones plus a ladder of strikes around the ATM strike."""
+    contracts = {c.symbol: c for c in known if c.underlying == underlying and c.expiry == expiry}
+    if spot and spot > 0:
+        step = strike_step(underlying, spot)
+        atm = round(spot / step) * step
+        for i in range(-strikes, strikes + 1):
+            k = float(round(atm + i * step, 2))
+            if k <= 0:
+                continue
+            for right in ("C", "P"):
+                sym = option_symbol(underlying, expiry, right, k)
+                contracts.setdefault(sym, OptionContract(sym, underlying, expiry, right, k))
+    return sorted(contracts.values(), key=lambda c: (c.strike, c.right))
+
+
+def is_expired(expiry: date, now: Optional[datetime] = None) -> bool:
+    """True once 15:30 on the expiry date has passed."""
+    return datetime.combine(expiry, EXPIRY_CLOSE) <= (now or datetime.now())
+
+
+def upcoming_expiries(contracts: Iterable[OptionContract], now: Optional[datetime] = None) -> List[date]:
+    """Distinct expiries of contracts that have not expired yet, nearest first."""
+    return sorted({c.expiry for c in contracts if not is_expired(c.expiry, now)})
+
+
+def time_to_expiry(expiry: date, now: Optional[datetime] = None) -> float:
+    """Years until 15:30 on the expiry date (never below one minute)."""
+    now = now or datetime.now()
+    seconds = (datetime.combine(expiry, EXPIRY_CLOSE) - now).total_seconds()
+    return max(seconds, 60.0) / YEAR_SECONDS
+
+
+# -----------------------------
+# Vectorized Black-Scholes
+# -----------------------------
+
+def erf(x: np.ndarray) -> np.ndarray:
+    """Abramowitz-Stegun 7.1.26."""
+    sign = np.sign(x)
+    a = np.abs(x)
+    t = 1.0 / (1.0 + 0.3275911 * a)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return sign * (1.0 - poly * np.exp(-a * a))
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + erf(x / math.sqrt(2.0)))
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / math.sqrt(2.0 * math.pi)
+
+
+def _d1_d2(S, K, T, r, sigma):
+    vol = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma * sigma) * T) / vol
+    return d1, d1 - vol
+
+
+def bs_price(S, K, T, r, sigma, call):
+    d1, d2 = _d1_d2(S, K, T, r, sigma)
+    disc = K * np.exp(-r * T)
+    return np.where(call, S * norm_cdf(d1) - disc * norm_cdf(d2), disc * norm_cdf(-d2) - S * norm_cdf(-d1))
+
+
+def implied_vol(price, S, K, T, r, call, tol: float = 1e-6, max_iter: int = 50) -> np.ndarray:
+    """IV for every row; NaN where the price is outside no-arbitrage bounds or has no time value."""
+    price, K, T = (np.asarray(a, dtype=np.float64) for a in (price, K, T))
+    call = np.asarray(call, dtype=bool)
+    disc = K * np.exp(-r * T)
+    lower = np.where(call, np.maximum(S - disc, 0.0), np.maximum(disc - S, 0.0))
+    upper = np.where(call, S, disc)
+    valid = (price - lower > MIN_TIME_VALUE) & (price < upper)
+    # Prices no volatility in [IV_LOW, IV_HIGH] reaches (e.g. far OTM minutes before expiry)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        valid &= (price > bs_price(S, K, T, r, IV_LOW, call)) & (price < bs_price(S, K, T, r, IV_HIGH, call))
+
+    lo = np.full(price.shape, IV_LOW)
+    hi = np.full(price.shape, IV_HIGH)
+    # Brenner-Subrahmanyam starting point
+    sqrt_t = np.sqrt(T)
+    sigma = np.clip(math.sqrt(2 * math.pi) / sqrt_t * price / S, 0.05, 2.0)
+    active = valid.copy()
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        d1, d2 = _d1_d2(S, K, T, r, sigma)
+        nd1, nd2 = norm_cdf(d1), norm_cdf(d2)
+        # Put via parity terms: N(-x) = 1 - N(x)
+        model = np.where(call, S * nd1 - disc * nd2, disc * (1.0 - nd2) - S * (1.0 - nd1))
+        diff = model - price
+        vega = S * norm_pdf(d1) * sqrt_t
+        active &= np.abs(diff) > tol
+        hi = np.where(active & (diff > 0), sigma, hi)
+        lo = np.where(active & (diff < 0), sigma, lo)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            step = sigma - diff / vega
+        inside = np.isfinite(step) & (step > lo) & (step < hi)
+        sigma = np.where(active, np.where(inside, step, 0.5 * (lo + hi)), sigma)
+    return np.where(valid, sigma, np.nan)
+
+
+def chain_analytics(S: float, K, T, r: float, call, price) -> Dict[str, np.ndarray]:
+    """IV and Greeks for a whole chain; theta per calendar day, vega per 1 vol point."""
+    K, T = np.asarray(K, dtype=np.float64), np.asarray(T, dtype=np.float64)
+    call = np.asarray(call, dtype=bool)
+    iv = implied_vol(price, S, K, T, r, call)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        d1, d2 = _d1_d2(S, K, T, r, iv)
+        pdf = norm_pdf(d1)
+        sqrt_t = np.sqrt(T)
+        disc = K * np.exp(-r * T)
+        delta = np.where(call, norm_cdf(d1), norm_cdf(d1) - 1.0)
+        gamma = pdf / (S * iv * sqrt_t)
+        vega = S * pdf * sqrt_t / 100.0
+        decay = -S * pdf * iv / (2 * sqrt_t)
+        theta = np.where(call, decay - r * disc * norm_cdf(d2), decay + r * disc * norm_cdf(-d2)) / 365.0
+    return {"iv": iv, "delta": delta, "gamma": gamma, "theta": theta, "vega": vega}
+
+
+def _num(v, digits: int = 4):
+    return None if v is None or not np.isfinite(v) else round(float(v), digits)
+
+
+def build_chain(underlying: str, expiry: date, spot: Optional[float], contracts: List[OptionContract],
+                quotes: Dict[str, Dict], r: float, now: Optional[datetime] = None) -> Dict:
+    """Chain rows by strike with quote, IV and Greeks per side."""
+    priced = [c for c in contracts if (quotes.get(c.symbol) or {}).get("ltp")]
+    stats: Dict[str, Dict[str, np.ndarray]] = {}
+    if priced and spot:
+        T = np.full(len(priced), time_to_expiry(expiry, now))
+        out = chain_analytics(spot, [c.strike for c in priced], T, r, [c.right == "C" for c in priced],
+                              [quotes[c.symbol]["ltp"] for c in priced])
+        stats = {c.symbol: {k: v[i] for k, v in out.items()} for i, c in enumerate(priced)}
+
+    rows: Dict[float, Dict] = {}
+    for c in contracts:
+        q = quotes.get(c.symbol)
+        g = stats.get(c.symbol, {})
+        side = {
+            "symbol": c.symbol,
+            "ltp": q["ltp"] if q else None,
+            "volume": q["volume"] if q else None,
+            "iv": _num(g.get("iv") * 100 if g else None, 2),
+            "delta": _num(g.get("delta")),
+            "gamma": _num(g.get("gamma"), 6),
+            "theta": _num(g.get("theta")),
+            "vega": _num(g.get("vega")),
+        }
+        rows.setdefault(c.strike, {"strike": c.strike})["call" if c.right == "C" else "put"] = side
+    atm = min(rows, key=lambda k: abs(k - spot)) if rows and spot else None
+    return {
+        "underlying": underlying,
+        "expiry": expiry_code(expiry),
+        "spot": spot,
+        "atm_strike": atm,
+        "rows": [rows[k] for k in sorted(rows)],
+    }
@@ -0,0 +1,289 @@
+"""
+Asynchronous order dispatch with rate limiting and idempotency.
+
+Callers submit() an order and get an OrderTicket back immediately (status
+QUEUED). A configurable number of dispatcher tasks drain the queue, wait on a
+token-bucket governor so the broker's order-rate limit is respected, and run the
+blocking broker call on a dedicated thread pool so orders go out in parallel
+without stalling the event loop.
+
+Every ticket is keyed by an idempotency key. Submitting a key that is already
+known returns the existing ticket instead of queueing a second order, so the
+frontend auto-trade hook and the auto-buy engine can never double-fire the same
+signal. Signal keys come from SignalLatch: one key per signal episode (symbol and
+side, from the step the signal appears until it drops), so a signal that stays
+on places one order however long it lasts. Callers may also supply their own.
+
+Status flow: QUEUED -> SENT -> PLACED | REJECTED | FAILED. Listeners registered
+with subscribe() are told about every transition.
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+
+QUEUED = "QUEUED"
+SENT = "SENT"
+PLACED = "PLACED"
+REJECTED = "REJECTED"
+FAILED = "FAILED"
+FINAL_STATES = (PLACED, REJECTED, FAILED)
+
+
+def signal_key(symbol: str, side: str, opened: float) -> str:
+    """Idempotency key for the signal episode on symbol/side that opened at `opened`."""
+    return f"signal:{symbol}:{side.upper()}:{int(opened * 1000)}"
+
+
+class SignalLatch:
+    """
+    Open signal episodes per (symbol, side). hold() returns the episode's key,
+    opening an episode if none is open; release() closes the episodes of symbols
+    that were evaluated and no longer signal. An episode nobody has held for
+    `idle` seconds is closed as well, for signals no engine step evaluates
+    (frontend-only strategies).
+    """
+
+    def __init__(self, idle: float = 300.0):
+        self.idle = idle
+        self._open: Dict[Tuple[str, str], List[float]] = {}  # (symbol, side) -> [opened, last held]
+        self._lock = threading.Lock()
+
+    def hold(self, symbol: str, side: str, now: Optional[float] = None) -> str:
+        now = now if now is not None else time.time()
+        pair = (symbol, side.upper())
+        with self._lock:
+            entry = self._open.get(pair)
+            if entry is None or now - entry[1] > self.idle:
+                entry = self._open[pair] = [now, now]
+            entry[1] = now
+            return signal_key(symbol, pair[1], entry[0])
+
+    def release(self, evaluated: Iterable[str], signalled: Iterable[Tuple[str, str]]) -> int:
+        """Close episodes of evaluated symbols whose signal dropped; returns how many closed."""
+        evaluated = set(evaluated)
+        signalled = {(sym, side.upper()) for sym, side in signalled}
+        now = time.time()
+        with self._lock:
+            done = [pair for pair, (_, held) in self._open.items()
+                    if (pair[0] in evaluated and pair not in signalled) or now - held > self.idle]
+            for pair in done:
+                del self._open[pair]
+        return len(done)
+
+    def state(self) -> List[List]:
+        with self._lock:
+            return [[sym, side, opened, held] for (sym, side), (opened, held) in self._open.items()]
+
+    def restore(self, rows: Iterable[List]) -> None:
+        with self._lock:
+            for sym, side, opened, held in rows:
+                self._open.setdefault((sym, side), [float(opened), float(held)])
+
+
+@dataclass
+class OrderTicket:
+    key: str
+    symbol: str
+    quantity: int
+    side: str = "BUY"
+    product: str = "DELIVERY"
+    strategy: str = ""
+    price: float = 0.0
+    source: str = "api"
+    account: str = ""  # broker account to place with; empty means the primary account
+    status: str = QUEUED
+    order_id: Optional[str] = None
+    fill_price: Optional[float] = None
+    message: str = ""
+    created: float = field(default_factory=time.time)
+    updated: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class AsyncTokenBucket:
+    """Token bucket for coroutines sharing one event loop (no locking needed)."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            self._refill()
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return
+            await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+
+class OrderPipeline:
+    def __init__(
+        self,
+        place_fn: Callable[[OrderTicket], Dict],
+        concurrency: int = 4,
+        rate_per_sec: float = 10.0,
+        burst: Optional[float] = None,
+        max_tickets: int = 5000,
+    ) -> None:
+        self.place_fn = place_fn
+        self.concurrency = max(1, concurrency)
+        self.governor = AsyncTokenBucket(rate_per_sec, burst)
+        self.max_tickets = max_tickets
+        self.tickets: "OrderedDict[str, OrderTicket]" = OrderedDict()
+        # Orders arrive from the loop and from other threads (exits fire on the quote poller)
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[OrderTicket], None]] = []
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def subscribe(self, listener: Callable[[OrderTicket], None]) -> None:
+        self._listeners.append(listener)
+
+    def _emit(self, ticket: OrderTicket) -> None:
+        ticket.updated = time.time()
+        for fn in self._listeners:
+            try:
+                fn(ticket)
+            except Exception as e:
+                print(f"Order listener error: {e}")
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="order-dispatch")
+        self._tasks = [asyncio.create_task(self._dispatcher()) for _ in range(self.concurrency)]
+        metrics.order_queue_depth.set_function(lambda: self._queue.qsize() if self._queue else 0)
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        self._tasks = []
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for t in self.tickets.values() if t.status in (QUEUED, SENT))
+
+    def get(self, key: str) -> Optional[OrderTicket]:
+        return self.tickets.get(key)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self.tickets)
+
+    def recent(self, limit: int = 50) -> List[OrderTicket]:
+        with self._lock:
+            return list(self.tickets.values())[-limit:]
+
+    def restore(self, tickets: List[Dict]) -> int:
+        """Re-register tickets saved before a restart so their keys still deduplicate.
+        Tickets that were still in flight are recorded as FAILED: whether the broker got
+        them is unknown, and they are never re-sent."""
+        restored = 0
+        with self._lock:
+            for item in tickets:
+                try:
+                    ticket = OrderTicket(**item)
+                except TypeError:
+                    continue
+                if ticket.key in self.tickets:
+                    continue
+                if ticket.status not in FINAL_STATES:
+                    ticket.status = FAILED
+                    ticket.message = "Interrupted by restart; check the broker order book"
+                self.tickets[ticket.key] = ticket
+                restored += 1
+        return restored
+
+    def submit(self, symbol: str, quantity: int, side: str = "BUY", product: str = "DELIVERY",
+               strategy: str = "", price: float = 0.0, source: str = "api",
+               key: Optional[str] = None, account: str = "") -> Tuple[OrderTicket, bool]:
+        """Queue an order; returns (ticket, duplicate). Never blocks on the broker."""
+        key = key or f"order:{uuid.uuid4().hex}"
+        with self._lock:
+            # Check and insert together: two callers with one key get one order
+            existing = self.tickets.get(key)
+            if existing is None:
+                if self._queue is None:
+                    raise RuntimeError("Order pipeline not started")
+                ticket = OrderTicket(key=key, symbol=symbol, quantity=int(quantity), side=side.upper(),
+                                     product=product, strategy=strategy, price=price, source=source,
+                                     account=account or "")
+                self.tickets[key] = ticket
+                while len(self.tickets) > self.max_tickets:
+                    old_key, old = next(iter(self.tickets.items()))
+                    if old.status not in FINAL_STATES:
+                        break
+                    self.tickets.pop(old_key)
+        if existing is not None:
+            metrics.orders_total.inc(source, "duplicate")
+            return existing, True
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._queue.put_nowait(ticket)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, ticket)
+        self._emit(ticket)
+        return ticket, False
+
+    async def _dispatcher(self) -> None:
+        while True:
+            ticket = await self._queue.get()
+            try:
+                await self.governor.acquire()
+                ticket.status = SENT
+                self._emit(ticket)
+                start = time.perf_counter()
+                try:
+                    result = await self._loop.run_in_executor(self._executor, self.place_fn, ticket)
+                except Exception as e:
+                    result = {"success": False, "message": f"Order dispatch error: {e}", "error": True}
+                metrics.order_dispatch_seconds.observe(time.perf_counter() - start)
+                if result.get("success"):
+                    ticket.status = PLACED
+                    ticket.order_id = str(result.get("order_id", "UNKNOWN"))
+                    ticket.fill_price = result.get("price")
+                else:
+                    ticket.status = FAILED if result.get("error") else REJECTED
+                ticket.message = result.get("message", "")
+                metrics.orders_total.inc(ticket.source, ticket.status.lower())
+                self._emit(ticket)
+            finally:
+                self._queue.task_done()
+
+
+def pipeline_settings() -> Dict[str, float]:
+    """Dispatcher count and order-rate limit from the environment."""
+    return {
+        "concurrency": int(os.getenv("ORDER_DISPATCHERS", "4")),
+        "rate_per_sec": float(os.getenv("ORDER_RATE_PER_SEC", "10")),
+    }
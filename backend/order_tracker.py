@@ -5,7 +5,7 @@ import os
 class OrderTracker:
     def __init__(self, db_path='orders.db'):
         # Store database in user's local app data
-        app_data = os.path.join(os.getenv('LOCALAPPDATA'), 'AntigravityTrader')
+        app_data = os.path.join(os.getenv('LOCALAPPDATA', os.path.expanduser('~')), 'AntigravityTrader')
         os.makedirs(app_data, exist_ok=True)
         self.db_path = os.path.join(app_data, db_path)
         self.init_db()
@@ -0,0 +1,350 @@
+"""
+Parallel Parameter Sweep for Strategy Tuning
+
+Usage:
+  python param_sweep.py --history ../exports/daily.csv --threshold 0.99,0.995,1.0 \\
+      --stop-loss 0,1,2,3 --target 0,2,4,6 --trailing false,true
+  python param_sweep.py --history ../exports/daily.csv --random 500 \\
+      --threshold 0.98:1.0 --lookback 1:20 --stop-loss 0.5:5 --target 1:10 --rank-by profit_factor
+
+Backtests the breakout rule from auto_trade.simple_breakout_strategy (LTP above
+threshold x recent high) with StrategyConfig-style exits (stopLoss %, target %,
+trailingStop) over the CSV written by bulk_export.py.
+
+Value specs are either a comma list ("0.99,0.995") or a range "lo:hi[:step]".
+Grid mode expands ranges by step; --random N samples N parameter sets, drawing
+uniformly inside ranges and picking from lists.
+
+Candles are loaded once into a shared-memory block that every worker maps
+read-only, so the OHLC arrays are never copied per process. Rolling highs and
+entry masks are cached inside each worker and parameter sets are dispatched in
+groups that share the same indicator inputs, so those caches actually hit.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from auto_trade import BREAKOUT_THRESHOLD
+
+# Column order inside the shared candle block
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+O, H, L, C, V = range(len(COLUMNS))
+
+# Metrics where a smaller value ranks higher
+ASCENDING_METRICS = {'max_drawdown'}
+METRICS = ('total_return', 'avg_return', 'win_rate', 'profit_factor', 'max_drawdown', 'trades')
+
+# Per-worker state, populated by _attach_worker()
+_shm = None
+_candles = None
+_index: Dict[str, Tuple[int, int]] = {}
+_high_cache: Dict[Tuple[str, int], np.ndarray] = {}
+_entry_cache: Dict[Tuple[str, int, float], np.ndarray] = {}
+
+
+def load_history(path: str) -> Dict[str, np.ndarray]:
+    """Read a bulk_export.py CSV into per-symbol (n, 5) float64 arrays sorted by ts."""
+    rows: Dict[str, List[Tuple[int, List[float]]]] = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for r in csv.DictReader(f):
+            try:
+                rows.setdefault(r['symbol'], []).append((
+                    int(r['ts']),
+                    [float(r[c]) for c in COLUMNS],
+                ))
+            except (KeyError, ValueError):
+                continue
+    history: Dict[str, np.ndarray] = {}
+    for sym, series in rows.items():
+        series.sort(key=lambda x: x[0])
+        history[sym] = np.array([v for _, v in series], dtype=np.float64)
+    return history
+
+
+def pack_shared(history: Dict[str, np.ndarray]):
+    """Copy all symbols into one shared-memory block once.
+    Returns (shm, shape, index) where index maps symbol -> (start, end) rows.
+    """
+    total = sum(len(a) for a in history.values())
+    shape = (total, len(COLUMNS))
+    shm = shared_memory.SharedMemory(create=True, size=max(total * len(COLUMNS) * 8, 8))
+    block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    index: Dict[str, Tuple[int, int]] = {}
+    pos = 0
+    for sym, arr in history.items():
+        block[pos:pos + len(arr)] = arr
+        index[sym] = (pos, pos + len(arr))
+        pos += len(arr)
+    del block
+    return shm, shape, index
+
+
+def _attach_worker(shm_name: str, shape: Tuple[int, int], index: Dict[str, Tuple[int, int]]):
+    """Pool initializer: map the shared block read-only instead of receiving a copy."""
+    global _shm, _candles, _index
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    _candles = np.ndarray(shape, dtype=np.float64, buffer=_shm.buf)
+    _candles.flags.writeable = False
+    _index = index
+
+
+def _rolling_high(sym: str, lookback: int) -> np.ndarray:
+    """Highest high over the last `lookback` bars (inclusive), cached per worker."""
+    key = (sym, lookback)
+    cached = _high_cache.get(key)
+    if cached is not None:
+        return cached
+    start, end = _index[sym]
+    high = _candles[start:end, H]
+    if lookback <= 1 or len(high) < lookback:
+        out = high
+    else:
+        windows = np.lib.stride_tricks.sliding_window_view(high, lookback)
+        out = np.concatenate([np.maximum.accumulate(high[:lookback - 1]), windows.max(axis=1)])
+    _high_cache[key] = out
+    return out
+
+
+def _entry_mask(sym: str, lookback: int, threshold: float) -> np.ndarray:
+    """Bars where close > threshold x rolling high, i.e. simple_breakout_strategy fires."""
+    key = (sym, lookback, threshold)
+    cached = _entry_cache.get(key)
+    if cached is not None:
+        return cached
+    start, end = _index[sym]
+    mask = _candles[start:end, C] > _rolling_high(sym, lookback) * threshold
+    _entry_cache[key] = mask
+    return mask
+
+
+def _simulate(sym: str, params: Dict[str, Any]) -> List[float]:
+    """Walk one symbol bar by bar and return per-trade returns in percent.
+    Stops are checked before targets within a bar (conservative fill).
+    """
+    start, end = _index[sym]
+    bars = _candles[start:end]
+    entries = np.flatnonzero(_entry_mask(sym, params['lookback'], params['threshold']))
+    if len(entries) == 0:
+        return []
+    sl = params['stop_loss'] / 100.0
+    tg = params['target'] / 100.0
+    trailing = params['trailing']
+    opens, highs, lows, closes = (bars[:, O].tolist(), bars[:, H].tolist(),
+                                  bars[:, L].tolist(), bars[:, C].tolist())
+    n = len(closes)
+    returns: List[float] = []
+    i = 0
+    for e in entries.tolist():
+        if e < i or e >= n - 1:
+            continue
+        entry = closes[e]
+        if entry <= 0:
+            continue
+        peak = entry
+        exit_px = closes[-1]
+        j = e + 1
+        while j < n:
+            if sl > 0:
+                stop = (peak if trailing else entry) * (1 - sl)
+                if lows[j] <= stop:
+                    exit_px = min(opens[j], stop)
+                    break
+            if tg > 0:
+                tgt = entry * (1 + tg)
+                if highs[j] >= tgt:
+                    exit_px = max(opens[j], tgt)
+                    break
+            if highs[j] > peak:
+                peak = highs[j]
+            j += 1
+        returns.append((exit_px / entry - 1) * 100.0)
+        i = j + 1
+    return returns
+
+
+def _score(returns: List[float]) -> Dict[str, float]:
+    if not returns:
+        return {'total_return': 0.0, 'avg_return': 0.0, 'win_rate': 0.0,
+                'profit_factor': 0.0, 'max_drawdown': 0.0, 'trades': 0}
+    r = np.asarray(returns)
+    equity = np.cumsum(r)
+    drawdown = np.maximum.accumulate(np.concatenate([[0.0], equity]))[1:] - equity
+    gains = float(r[r > 0].sum())
+    losses = float(-r[r < 0].sum())
+    # No losing trades: cap instead of inf so results stay JSON/CSV friendly
+    profit_factor = gains / losses if losses > 0 else (999.0 if gains > 0 else 0.0)
+    return {
+        'total_return': round(float(r.sum()), 4),
+        'avg_return': round(float(r.mean()), 4),
+        'win_rate': round(float((r > 0).mean() * 100.0), 2),
+        'profit_factor': round(profit_factor, 4),
+        'max_drawdown': round(float(drawdown.max()), 4),
+        'trades': int(len(r)),
+    }
+
+
+def _run_group(param_sets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Evaluate parameter sets that share (lookback, threshold) across all symbols."""
+    results = []
+    for params in param_sets:
+        returns: List[float] = []
+        for sym in _index:
+            returns.extend(_simulate(sym, params))
+        results.append({**params, **_score(returns)})
+    return results
+
+
+def parse_spec(spec: str, cast):
+    """'a,b,c' -> list; 'lo:hi' or 'lo:hi:step' -> (lo, hi, step or None)."""
+    if ':' in spec:
+        parts = [cast(p) for p in spec.split(':')]
+        return (parts[0], parts[1], parts[2] if len(parts) > 2 else None)
+    return [cast(p) for p in spec.split(',') if p != '']
+
+
+def _parse_bool(s: str) -> bool:
+    return s.strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def expand(spec) -> List:
+    if isinstance(spec, list):
+        return spec
+    lo, hi, step = spec
+    if step is None:
+        return [lo, hi] if lo != hi else [lo]
+    values = []
+    v = lo
+    while v <= hi + 1e-12:
+        values.append(round(v, 6) if isinstance(v, float) else v)
+        v += step
+    return values
+
+
+def sample(spec, rng: random.Random):
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    lo, hi, _ = spec
+    if isinstance(lo, int) and isinstance(hi, int):
+        return rng.randint(lo, hi)
+    return round(rng.uniform(lo, hi), 6)
+
+
+def build_param_sets(specs: Dict[str, Any], n_random: int = 0, seed: int = 0) -> List[Dict[str, Any]]:
+    names = list(specs)
+    if n_random > 0:
+        rng = random.Random(seed)
+        return [{k: sample(specs[k], rng) for k in names} for _ in range(n_random)]
+    return [dict(zip(names, combo)) for combo in itertools.product(*(expand(specs[k]) for k in names))]
+
+
+def rank(results: List[Dict[str, Any]], metrics: List[str]) -> List[Dict[str, Any]]:
+    """Sort lexicographically by the given metrics (best first)."""
+    def key(r):
+        return tuple(r[m] if m in ASCENDING_METRICS else -r[m] for m in metrics)
+    return sorted(results, key=key)
+
+
+def run_sweep(history: Dict[str, np.ndarray], param_sets: List[Dict[str, Any]], workers: int) -> List[Dict[str, Any]]:
+    groups: Dict[Tuple[int, float], List[Dict[str, Any]]] = {}
+    for p in param_sets:
+        groups.setdefault((p['lookback'], p['threshold']), []).append(p)
+    # Split very large groups so every core stays busy, keeping each chunk cache-friendly
+    chunk = max(1, len(param_sets) // (workers * 4))
+    tasks = [g[i:i + chunk] for g in groups.values() for i in range(0, len(g), chunk)]
+
+    shm, shape, index = pack_shared(history)
+    results: List[Dict[str, Any]] = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_worker,
+                                 initargs=(shm.name, shape, index)) as pool:
+            futures = [pool.submit(_run_group, t) for t in tasks]
+            for done, fut in enumerate(as_completed(futures), 1):
+                results.extend(fut.result())
+                if done % max(1, len(futures) // 10) == 0:
+                    print(f"Progress: {len(results)}/{len(param_sets)} parameter sets")
+    finally:
+        shm.close()
+        shm.unlink()
+    return results
+
+
+def write_results(path: str, results: List[Dict[str, Any]]):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if path.endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    else:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+    print(f"✓ Wrote {len(results)} results to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--history', required=True, help='CSV produced by bulk_export.py')
+    parser.add_argument('--threshold', default=str(BREAKOUT_THRESHOLD), help='Breakout threshold(s) vs recent high')
+    parser.add_argument('--lookback', default='1', help='Bars in the rolling high (1 = current bar high)')
+    parser.add_argument('--stop-loss', default='0', help='Stop loss %% (0 disables)')
+    parser.add_argument('--target', default='0', help='Target %% (0 disables)')
+    parser.add_argument('--trailing', default='false', help='Trailing stop flag(s)')
+    parser.add_argument('--random', type=int, default=0, help='Sample N parameter sets instead of the full grid')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rank-by', default='total_return,max_drawdown',
+                        help=f"Comma list from {', '.join(METRICS)}")
+    parser.add_argument('--min-trades', type=int, default=1, help='Drop results with fewer trades')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', help='Write ranked results (.csv or .json)')
+    args = parser.parse_args()
+
+    rank_by = [m.strip() for m in args.rank_by.split(',') if m.strip()]
+    unknown = [m for m in rank_by if m not in METRICS]
+    if unknown:
+        parser.error(f"unknown metric(s): {', '.join(unknown)}")
+
+    specs = {
+        'threshold': parse_spec(args.threshold, float),
+        'lookback': parse_spec(args.lookback, int),
+        'stop_loss': parse_spec(args.stop_loss, float),
+        'target': parse_spec(args.target, float),
+        'trailing': [_parse_bool(s) for s in args.trailing.split(',')],
+    }
+    param_sets = build_param_sets(specs, n_random=args.random, seed=args.seed)
+
+    history = load_history(args.history)
+    if not history:
+        print(f"No usable candles in {args.history}")
+        sys.exit(1)
+    bars = sum(len(a) for a in history.values())
+    print(f"Loaded {len(history)} symbols, {bars} bars; evaluating {len(param_sets)} parameter sets on {args.workers} workers")
+
+    start = time.time()
+    results = run_sweep(history, param_sets, args.workers)
+    elapsed = time.time() - start
+    results = rank([r for r in results if r['trades'] >= args.min_trades], rank_by)
+    print(f"Completed in {elapsed:.1f}s ({len(param_sets) / max(elapsed, 1e-9):.1f} sets/s)")
+
+    cols = list(specs) + list(METRICS)
+    print(' | '.join(cols))
+    for r in results[:args.top]:
+        print(' | '.join(str(r[c]) for c in cols))
+
+    if args.output and results:
+        write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Priority-aware quote polling within a fixed broker budget.
+
+Each poll is one quote request per session, carrying at most POLL_BATCH_SYMBOLS
+instruments. When the subscribed universe fits, every symbol is fetched every
+poll, as before. When it does not, PollScheduler decides which symbols share
+the budget, by weighted fair queuing (stride scheduling):
+
+- every symbol has a virtual finish time `pass`; a poll takes the `capacity`
+  symbols with the smallest pass and advances each by 1 / weight
+- symbols that join the universe (or come back to it) start at the current
+  virtual time, and symbols without any quote yet go first, so nothing starves
+  and a heavy symbol cannot bank credit while it is not subscribed
+- over time a symbol is polled in proportion to its weight, and a symbol whose
+  share is a whole poll or more is fetched on every poll
+
+weight = class weight x volatility boost x proximity boost
+
+    critical   auto-buy enabled                    8
+    high       open position or armed exit         4
+    normal     auto-buy selected, or pinned list   2
+    low        watchlist only                      1
+
+The volatility boost (1..MAX_BOOST) compares the symbol's recent volatility per
+sqrt(second), an EWMA of squared log returns between its polls, with
+VOL_REFERENCE. The proximity boost (1..MAX_BOOST) grows as LTP comes within
+PROXIMITY_PCT of one of its trigger levels (stops, targets, trailing stops, the
+auto-buy breakout level).
+"""
+import heapq
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+CLASS_WEIGHTS = {"critical": 8.0, "high": 4.0, "normal": 2.0, "low": 1.0}
+MAX_BOOST = 4.0
+# Volatility per sqrt(second) that counts as "normal" (about 3% over a trading day)
+VOL_REFERENCE = 0.0002
+VOL_EWMA_ALPHA = 0.2
+# Within this distance (in %) of a trigger level a symbol starts getting boosted
+PROXIMITY_PCT = 1.0
+
+
+class PollScheduler:
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        self.weights = weights or dict(CLASS_WEIGHTS)
+        self._lock = threading.Lock()
+        self.classes: Dict[str, str] = {}           # symbol -> priority class (default low)
+        self.triggers: Dict[str, List[float]] = {}  # symbol -> trigger prices
+        self._pass: Dict[str, float] = {}
+        self._vtime = 0.0
+        self._last: Dict[str, tuple] = {}           # symbol -> (ltp, time) at its last poll
+        self._var: Dict[str, float] = {}            # symbol -> EWMA of squared log return per second
+        self.polls: Dict[str, int] = {}
+
+    def set_priorities(self, classes: Dict[str, str], triggers: Dict[str, List[float]]) -> None:
+        with self._lock:
+            self.classes = classes
+            self.triggers = triggers
+
+    def _volatility_boost(self, symbol: str) -> float:
+        var = self._var.get(symbol)
+        if not var:
+            return 1.0
+        return min(MAX_BOOST, max(1.0, math.sqrt(var) / VOL_REFERENCE))
+
+    def _proximity_boost(self, symbol: str) -> float:
+        levels = self.triggers.get(symbol)
+        last = self._last.get(symbol)
+        if not levels or not last or last[0] <= 0:
+            return 1.0
+        ltp = last[0]
+        distance = min(abs(ltp - level) for level in levels) / ltp * 100.0
+        if distance >= PROXIMITY_PCT:
+            return 1.0
+        return min(MAX_BOOST, PROXIMITY_PCT / max(distance, PROXIMITY_PCT / MAX_BOOST))
+
+    def weight(self, symbol: str) -> float:
+        base = self.weights.get(self.classes.get(symbol, "low"), 1.0)
+        return base * self._volatility_boost(symbol) * self._proximity_boost(symbol)
+
+    def select(self, symbols: Sequence[str], capacity: int, quoted: Iterable[str] = ()) -> List[str]:
+        """Symbols to fetch this poll, at most capacity (0 = no limit), in the given order."""
+        quoted = set(quoted)
+        with self._lock:
+            vtime = self._vtime
+            passes = self._pass
+            for s in symbols:
+                # Joining (or rejoining) symbols start at the current virtual time
+                if passes.get(s, -1.0) < vtime:
+                    passes[s] = vtime
+            if capacity <= 0 or len(symbols) <= capacity:
+                chosen = set(symbols)
+            else:
+                # Never-quoted symbols first: the LTP tier can only update a symbol with a full quote
+                key = lambda s: (s in quoted, passes[s])
+                chosen = set(heapq.nsmallest(capacity, symbols, key=key))
+            for s in chosen:
+                passes[s] += 1.0 / self.weight(s)
+                self.polls[s] = self.polls.get(s, 0) + 1
+            self._vtime = min(passes[s] for s in symbols) if symbols else vtime
+            # Forget symbols that left the universe long ago
+            if len(passes) > 4 * max(len(symbols), 256):
+                live = set(symbols)
+                self._pass = {s: p for s, p in passes.items() if s in live}
+                self._last = {s: v for s, v in self._last.items() if s in live}
+                self._var = {s: v for s, v in self._var.items() if s in live}
+                self.polls = {s: v for s, v in self.polls.items() if s in live}
+        return [s for s in symbols if s in chosen]
+
+    def observe(self, quotes: Dict[str, Dict], now: Optional[float] = None) -> None:
+        """Update per-symbol volatility from the symbols a poll returned."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            for s, q in quotes.items():
+                ltp = q.get("ltp")
+                if not ltp or ltp <= 0:
+                    continue
+                prev = self._last.get(s)
+                self._last[s] = (ltp, now)
+                if prev is None or prev[0] <= 0 or now <= prev[1]:
+                    continue
+                r = math.log(ltp / prev[0])
+                sample = r * r / (now - prev[1])
+                var = self._var.get(s)
+                self._var[s] = sample if var is None else var + VOL_EWMA_ALPHA * (sample - var)
+
+    def to_dict(self, limit: int = 50) -> Dict:
+        with self._lock:
+            symbols = list(self._pass)
+            rows = sorted(
+                ({"symbol": s, "class": self.classes.get(s, "low"), "weight": round(self.weight(s), 2),
+                  "polls": self.polls.get(s, 0)} for s in symbols),
+                key=lambda r: -r["weight"])
+            return {"virtual_time": round(self._vtime, 3), "symbols": len(symbols), "top": rows[:limit]}
@@ -0,0 +1,163 @@
+"""
+Incremental positions and mark-to-market P&L.
+
+PositionBook consumes fills one at a time (apply_fill) and keeps, per symbol,
+net quantity, average price and realized P&L in NumPy columns indexed by a
+symbol -> row map. Nothing ever rescans orders.db after startup.
+
+mark(quotes) updates last price and unrealized P&L for every open position in
+one vectorized pass per quote snapshot:
+
+    unrealized = (last - avg) * qty
+
+Quantities are signed (long > 0, short < 0). Reducing a position realizes
+(price - avg) * closed * sign(qty); flipping through zero opens the remainder
+at the fill price.
+
+A fill without a price (a market order the broker did not report a price for)
+is priced at the symbol's last mark, or, before the first mark, held as pending
+quantity: it counts in net_qty() right away and is folded in at the first quote
+that arrives for the symbol.
+"""
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class PositionBook:
+    def __init__(self, capacity: int = 64):
+        self._lock = threading.Lock()
+        self.index: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.qty = np.zeros(capacity)
+        self.avg = np.zeros(capacity)
+        self.realized = np.zeros(capacity)
+        self.last = np.full(capacity, np.nan)
+        self.unrealized = np.zeros(capacity)
+        self._open_rows = np.empty(0, dtype=np.int64)
+        self.pending: Dict[str, float] = {}  # symbol -> signed quantity filled without a price yet
+
+    def _row(self, symbol: str) -> int:
+        i = self.index.get(symbol)
+        if i is not None:
+            return i
+        i = len(self.symbols)
+        if i >= len(self.qty):
+            grow = len(self.qty)
+            self.qty = np.concatenate([self.qty, np.zeros(grow)])
+            self.avg = np.concatenate([self.avg, np.zeros(grow)])
+            self.realized = np.concatenate([self.realized, np.zeros(grow)])
+            self.last = np.concatenate([self.last, np.full(grow, np.nan)])
+            self.unrealized = np.concatenate([self.unrealized, np.zeros(grow)])
+        self.index[symbol] = i
+        self.symbols.append(symbol)
+        return i
+
+    def apply_fill(self, symbol: str, side: str, quantity: float, price: float) -> None:
+        """Fold one fill into the position for symbol (price <= 0: not known yet)."""
+        if quantity <= 0:
+            return
+        signed = quantity if side.upper() == "BUY" else -quantity
+        with self._lock:
+            if price <= 0:
+                i = self.index.get(symbol)
+                if i is None or np.isnan(self.last[i]):
+                    self.pending[symbol] = self.pending.get(symbol, 0.0) + signed
+                    print(f"Position {symbol}: {side.upper()} {quantity:g} filled without a price; "
+                          f"pricing it at the next quote")
+                    return
+                price = float(self.last[i])
+            self._apply(symbol, signed, price)
+
+    def _apply(self, symbol: str, signed: float, price: float) -> None:
+        i = self._row(symbol)
+        cur = self.qty[i]
+        if cur == 0 or (cur > 0) == (signed > 0):
+            # Opening or adding: weighted average price
+            new_qty = cur + signed
+            self.avg[i] = (self.avg[i] * abs(cur) + price * abs(signed)) / abs(new_qty)
+            self.qty[i] = new_qty
+        else:
+            closed = min(abs(signed), abs(cur))
+            self.realized[i] += (price - self.avg[i]) * closed * np.sign(cur)
+            new_qty = cur + signed
+            if new_qty == 0:
+                self.avg[i] = 0.0
+            elif (new_qty > 0) != (cur > 0):
+                self.avg[i] = price  # flipped: remainder opened at this fill
+            self.qty[i] = new_qty
+        if np.isnan(self.last[i]):
+            self.last[i] = price
+        self.unrealized[i] = (self.last[i] - self.avg[i]) * self.qty[i]
+        self._open_rows = np.flatnonzero(self.qty[:len(self.symbols)] != 0)
+
+    def mark(self, quotes: Dict[str, Dict]) -> None:
+        """Mark all open positions to the latest snapshot in one vectorized update."""
+        rows = self._open_rows
+        if (len(rows) == 0 and not self.pending) or not quotes:
+            return
+        with self._lock:
+            for symbol in list(self.pending):
+                ltp = (quotes.get(symbol) or {}).get("ltp")
+                if ltp:
+                    self._apply(symbol, self.pending.pop(symbol), float(ltp))
+            rows = self._open_rows
+            symbols = self.symbols
+            ltp = np.fromiter(
+                ((quotes.get(symbols[r]) or {}).get("ltp", np.nan) for r in rows.tolist()),
+                dtype=np.float64, count=len(rows),
+            )
+            last = np.where(np.isnan(ltp), self.last[rows], ltp)
+            self.last[rows] = last
+            self.unrealized[rows] = (last - self.avg[rows]) * self.qty[rows]
+
+    def to_dict(self, include_flat: bool = False) -> Dict:
+        with self._lock:
+            n = len(self.symbols)
+            rows = range(n) if include_flat else self._open_rows.tolist()
+            positions = []
+            for r in rows:
+                if not include_flat and self.qty[r] == 0:
+                    continue
+                last = self.last[r]
+                positions.append({
+                    "symbol": self.symbols[r],
+                    "net_qty": float(self.qty[r]),
+                    "avg_price": round(float(self.avg[r]), 4),
+                    "ltp": None if np.isnan(last) else round(float(last), 4),
+                    "realized_pnl": round(float(self.realized[r]), 2),
+                    "unrealized_pnl": round(float(self.unrealized[r]), 2),
+                    "pending_qty": self.pending.get(self.symbols[r], 0.0),
+                })
+            listed = {p["symbol"] for p in positions}
+            for symbol, qty in self.pending.items():
+                if symbol not in listed:
+                    positions.append({"symbol": symbol, "net_qty": qty, "avg_price": None, "ltp": None,
+                                      "realized_pnl": 0.0, "unrealized_pnl": 0.0, "pending_qty": qty})
+            realized = float(self.realized[:n].sum())
+            unrealized = float(self.unrealized[self._open_rows].sum()) if len(self._open_rows) else 0.0
+        return {
+            "positions": positions,
+            "totals": {
+                "realized_pnl": round(realized, 2),
+                "unrealized_pnl": round(unrealized, 2),
+                "total_pnl": round(realized + unrealized, 2),
+                "open_positions": len(self._open_rows),
+                "pending_fills": len(self.pending),
+            },
+        }
+
+    def open_symbols(self) -> List[str]:
+        """Symbols with an open or price-pending position."""
+        rows = self._open_rows
+        return list(dict.fromkeys([self.symbols[i] for i in rows.tolist()] + list(self.pending)))
+
+    def net_qty(self, symbol: str) -> float:
+        """Signed quantity held, including fills still waiting for a price."""
+        i = self.index.get(symbol)
+        return (float(self.qty[i]) if i is not None else 0.0) + self.pending.get(symbol, 0.0)
+
+    def avg_price(self, symbol: str) -> Optional[float]:
+        i = self.index.get(symbol)
+        return float(self.avg[i]) if i is not None and self.qty[i] != 0 else None
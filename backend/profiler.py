@@ -0,0 +1,162 @@
+"""
+On-demand profiling for the running backend.
+
+SamplingProfiler walks sys._current_frames() from a helper thread for a fixed
+time box, so it sees the asyncio loop thread (including whichever coroutine is
+running) and every executor/worker thread without restarting the process. The
+result is in collapsed-stack ("folded") form, one line per unique stack:
+
+    MainThread;uvicorn/server.py:serve;main.py:get_tokens;... 42
+
+which flamegraph.pl, speedscope and inferno read directly.
+
+Per-request timing: when enabled, ServerTimingMiddleware collects span() timings
+recorded during a request and returns them in a Server-Timing header, e.g.
+"broker;dur=21.4, parse;dur=0.8, other;dur=1.9, total;dur=24.1". When disabled,
+span() returns a shared no-op context manager and the middleware passes
+requests straight through.
+"""
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+PROFILE_DIR = os.path.join(os.getenv('LOCALAPPDATA', os.path.expanduser('~')), 'AntigravityTrader', 'profiles')
+MAX_PROFILE_SECONDS = 120
+
+_NULL = nullcontext()
+_spans: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("server_timing", default=None)
+
+# Toggled at runtime from the admin endpoint; SERVER_TIMING=1 enables it at startup
+timing_enabled = os.getenv("SERVER_TIMING", "0") == "1"
+
+
+class _Span:
+    __slots__ = ("spans", "name", "start")
+
+    def __init__(self, spans: Dict[str, float], name: str):
+        self.spans = spans
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.spans[self.name] = self.spans.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+def run_in_executor(fn: Callable, *args, executor=None) -> "asyncio.Future":
+    """loop.run_in_executor carrying the caller's context, so span()s recorded on the
+    worker thread still reach the request's Server-Timing header."""
+    ctx = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(executor, ctx.run, fn, *args)
+
+
+def span(name: str):
+    """Time a block for the Server-Timing header of the current request (accumulates)."""
+    if not timing_enabled:
+        return _NULL
+    spans = _spans.get()
+    if spans is None:
+        return _NULL
+    return _Span(spans, name)
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware; attaches collected spans as a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not timing_enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        spans: Dict[str, float] = {}
+        token = _spans.set(spans)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - start
+                parts = [f"{k};dur={v * 1000:.2f}" for k, v in spans.items()]
+                # Remainder is FastAPI validation/serialization and middleware time
+                parts.append(f"other;dur={max(total - sum(spans.values()), 0.0) * 1000:.2f}")
+                parts.append(f"total;dur={total * 1000:.2f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(parts).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _spans.reset(token)
+
+
+def set_timing(enabled: bool) -> None:
+    global timing_enabled
+    timing_enabled = bool(enabled)
+
+
+class SamplingProfiler:
+    """Time-boxed statistical profiler over all threads of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = False
+
+    def _folded(self, frame, thread_name: str) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        stack.append(thread_name)
+        return ";".join(reversed(stack))
+
+    def run(self, seconds: float, hz: int = 100) -> Dict[str, object]:
+        """Block the calling thread while sampling; returns folded stacks and stats."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        self.running = True
+        try:
+            seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+            interval = 1.0 / max(1, min(hz, 1000))
+            me = threading.get_ident()
+            counts: Counter = Counter()
+            samples = 0
+            end = time.perf_counter() + seconds
+            while time.perf_counter() < end:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    counts[self._folded(frame, names.get(ident, f"thread-{ident}"))] += 1
+                samples += 1
+                time.sleep(interval)
+            folded = "\n".join(f"{stack} {n}" for stack, n in counts.most_common())
+            return {"seconds": seconds, "hz": round(1.0 / interval), "samples": samples,
+                    "stacks": len(counts), "folded": folded}
+        finally:
+            self.running = False
+            self._lock.release()
+
+    @staticmethod
+    def save(folded: str) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"profile-{datetime.now():%Y%m%d-%H%M%S}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(folded + "\n")
+        return path
+
+
+sampling_profiler = SamplingProfiler()
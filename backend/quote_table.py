@@ -0,0 +1,149 @@
+"""
+Shared-memory quote table between the engine process and API workers.
+
+In multi-worker mode (see backend_runner.py) one engine process owns the broker
+sessions, the poller and every trading loop. It publishes each snapshot into a
+multiprocessing.shared_memory block that the API worker processes map read-only.
+
+Layout:
+  header  one record of HEADER_DTYPE
+  rows    capacity records of ROW_DTYPE (same fields as the tick recorder)
+
+Writes are guarded by a seqlock: the writer makes `seq` odd, writes rows and
+header fields, then makes it even again. A reader copies the rows and accepts
+the copy only if `seq` was even and unchanged across the copy; otherwise it
+retries. Readers never block the writer and never take a lock. The seqlock
+allows one writer at a time, so the engine's writes (poller thread, reference
+refresh) serialize on a process-local lock.
+
+Checking for news is a single header read (zero copy); rows are copied only
+when `version` moved. `ref_version` and `watch_version` tell workers to reload
+reference data and watchlists from disk.
+"""
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+SYMBOL_BYTES = 48
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'), ('capacity', '<u4'), ('count', '<u4'), ('seq', '<u8'), ('version', '<u8'),
+    ('updated', '<f8'), ('ref_version', '<u8'), ('watch_version', '<u8'),
+])
+ROW_DTYPE = np.dtype([
+    ('symbol', f'S{SYMBOL_BYTES}'), ('ltp', '<f8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'),
+    ('prev_close', '<f8'), ('volume', '<i8'),
+])
+MAGIC = b'QUOTES01'
+
+
+class SharedQuoteTable:
+    def __init__(self, name: str, capacity: int = 8192, create: bool = False):
+        self.name = name
+        size = HEADER_DTYPE.itemsize + capacity * ROW_DTYPE.itemsize
+        if create:
+            try:
+                # A previous engine that died without cleanup leaves the block behind
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Readers must not unlink the block when they exit (resource_tracker would on < 3.13)
+            try:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+        self.owner = create
+        self._write_lock = threading.Lock()
+        self.header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        if create:
+            self.header[0] = (MAGIC, capacity, 0, 0, 0, 0.0, 0, 0)
+        elif self.header['magic'][0] != MAGIC:
+            raise RuntimeError(f"shared memory '{name}' is not a quote table")
+        self.capacity = int(self.header['capacity'][0])
+        self.rows = np.ndarray((self.capacity,), dtype=ROW_DTYPE, buffer=self.shm.buf,
+                               offset=HEADER_DTYPE.itemsize)
+
+    # -- writer (engine) --
+
+    def publish(self, quotes: Dict[str, Dict], version: int, updated: Optional[float] = None) -> None:
+        n = min(len(quotes), self.capacity)
+        items = list(quotes.items())[:n]
+        staged = np.empty(n, dtype=ROW_DTYPE)
+        staged['symbol'] = [s.encode()[:SYMBOL_BYTES] for s, _ in items]
+        for field in ('ltp', 'open', 'high', 'low'):
+            staged[field] = [q[field] for _, q in items]
+        staged['prev_close'] = [q['prev_close'] if q['prev_close'] is not None else np.nan for _, q in items]
+        staged['volume'] = [q['volume'] for _, q in items]
+        with self._write_lock:
+            h = self.header
+            h['seq'] += 1
+            self.rows[:n] = staged
+            h['count'] = n
+            h['version'] = version
+            h['updated'] = updated if updated is not None else time.time()
+            h['seq'] += 1
+
+    def heartbeat(self, updated: float) -> None:
+        """Same snapshot, fetched again: only the freshness timestamp moves."""
+        with self._write_lock:
+            self.header['updated'] = updated
+
+    def bump(self, field: str) -> None:
+        """Signal workers to reload something ('ref_version' or 'watch_version')."""
+        with self._write_lock:
+            self.header[field] += 1
+
+    # -- reader (API workers) --
+
+    def version(self) -> int:
+        return int(self.header['version'][0])
+
+    def meta(self) -> Tuple[int, float, int, int]:
+        """(version, updated, ref_version, watch_version) without copying rows."""
+        h = self.header[0]
+        return int(h['version']), float(h['updated']), int(h['ref_version']), int(h['watch_version'])
+
+    def read(self, since_version: int = -1, retries: int = 100) -> Optional[Tuple[int, float, Dict[str, Dict]]]:
+        """(version, updated, quotes) if the table moved past since_version, else None."""
+        h = self.header
+        for _ in range(retries):
+            seq = int(h['seq'][0])
+            if seq & 1:
+                time.sleep(0)
+                continue
+            version = int(h['version'][0])
+            if version == since_version:
+                return None
+            n = int(h['count'][0])
+            updated = float(h['updated'][0])
+            rows = self.rows[:n].copy()
+            if int(h['seq'][0]) == seq:
+                return version, updated, _to_quotes(rows)
+        raise TimeoutError("quote table kept changing during read")
+
+    def close(self) -> None:
+        self.header = self.rows = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _to_quotes(rows: np.ndarray) -> Dict[str, Dict]:
+    prev = rows['prev_close']
+    return {
+        sym.decode(): {"ltp": ltp, "open": o, "high": hi, "low": lo,
+                       "volume": vol, "prev_close": None if pc != pc else pc}
+        for sym, ltp, o, hi, lo, pc, vol in zip(
+            rows['symbol'].tolist(), rows['ltp'].tolist(), rows['open'].tolist(), rows['high'].tolist(),
+            rows['low'].tolist(), prev.tolist(), rows['volume'].tolist())
+    }
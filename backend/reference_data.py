@@ -0,0 +1,152 @@
+"""
+Daily reference data: prior close, 52-week range, average volume, market cap.
+
+None of these move during a session, so they are built once per trading day
+from daily candles (MStockClient.get_candles(symbol, '1d', 260)) instead of
+being read from every live payload:
+
+    prev_close    close of the last completed daily candle (before today)
+    week52_high   highest high over the last 252 completed sessions
+    week52_low    lowest low over the same window
+    avg_volume    mean volume of the last 20 completed sessions
+    market_cap    prev_close * shares outstanding, when REFERENCE_SHARES_FILE
+                  (CSV: symbol,shares) lists the symbol; otherwise None
+
+The table lives in memory and is written atomically to reference_data.json
+next to orders.db, so a restart on the same day reuses it without a single
+broker call. build() only fetches symbols that are missing or from an earlier
+day; symbols whose history cannot be fetched are left out and callers fall
+back to the feed's own previous close.
+"""
+import csv
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+WEEK52_SESSIONS = 252
+AVG_VOLUME_SESSIONS = 20
+HISTORY_POINTS = 260
+
+
+def _load_shares(path: Optional[str]) -> Dict[str, float]:
+    shares: Dict[str, float] = {}
+    if not path or not os.path.exists(path):
+        return shares
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                try:
+                    shares[row['symbol'].strip()] = float(row['shares'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+    except OSError as e:
+        print(f"Reference data: cannot read shares file {path}: {e}")
+    return shares
+
+
+def summarize(candles: List[Dict], today: date, shares: Optional[float] = None) -> Optional[Dict]:
+    """Reference row from daily candles (any order); None when no completed session is present."""
+    days = []
+    for c in candles or []:
+        try:
+            ts = float(c.get('ts') or c.get('time') or c.get('timestamp') or 0)
+            day = datetime.fromtimestamp(ts / 1000 if ts > 1e11 else ts).date()
+            if day < today:
+                days.append((day, float(c['high']), float(c['low']), float(c['close']), float(c.get('volume') or 0)))
+        except (KeyError, TypeError, ValueError, OSError):
+            continue
+    if not days:
+        return None
+    days.sort()
+    window = days[-WEEK52_SESSIONS:]
+    recent = days[-AVG_VOLUME_SESSIONS:]
+    prev_close = days[-1][3]
+    return {
+        "prev_close": prev_close,
+        "prev_date": days[-1][0].isoformat(),
+        "week52_high": max(d[1] for d in window),
+        "week52_low": min(d[2] for d in window),
+        "avg_volume": round(sum(d[4] for d in recent) / len(recent), 1),
+        "market_cap": round(prev_close * shares, 2) if shares else None,
+    }
+
+
+class ReferenceData:
+    def __init__(self, filename: str = 'reference_data.json', shares_file: Optional[str] = None):
+        app_data = os.path.join(os.getenv('LOCALAPPDATA', os.path.expanduser('~')), 'AntigravityTrader')
+        os.makedirs(app_data, exist_ok=True)
+        self.path = os.path.join(app_data, filename)
+        self.shares = _load_shares(shares_file)
+        self._lock = threading.Lock()
+        self.symbols: Dict[str, Dict] = {}  # symbol -> reference row (with 'as_of' trade date)
+        self.version = 0
+        self.built = 0.0
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+            self.symbols = stored.get('symbols', {})
+            self.built = float(stored.get('built', 0))
+            self.version += 1
+            print(f"Reference data: loaded {len(self.symbols)} symbols from {self.path}")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Reference data: ignoring unreadable {self.path}: {e}")
+
+    def save(self) -> None:
+        """Atomic write: a crash mid-save leaves the previous file intact."""
+        with self._lock:
+            payload = {'built': self.built, 'symbols': self.symbols}
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        os.replace(tmp, self.path)
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        return self.symbols.get(symbol)
+
+    def missing(self, symbols: Iterable[str], today: Optional[date] = None) -> List[str]:
+        """Symbols without a row for today."""
+        as_of = (today or date.today()).isoformat()
+        return [s for s in symbols if (self.symbols.get(s) or {}).get('as_of') != as_of]
+
+    def build(self, symbols: Iterable[str], fetch: Callable[[str], List[Dict]],
+              today: Optional[date] = None) -> int:
+        """Fetch daily history for symbols not yet built today; returns how many rows were added."""
+        today = today or date.today()
+        todo = self.missing(list(dict.fromkeys(symbols)), today)
+        if not todo:
+            return 0
+        start = time.time()
+        rows: Dict[str, Dict] = {}
+        for symbol in todo:
+            try:
+                row = summarize(fetch(symbol), today, self.shares.get(symbol))
+            except Exception as e:
+                print(f"Reference data: history fetch failed for {symbol}: {e}")
+                continue
+            if row is not None:
+                row['as_of'] = today.isoformat()
+                rows[symbol] = row
+        if rows:
+            with self._lock:
+                self.symbols = {**self.symbols, **rows}
+                self.built = time.time()
+                self.version += 1
+            self.save()
+        print(f"Reference data: {len(rows)}/{len(todo)} symbols built in {time.time() - start:.1f}s")
+        return len(rows)
+
+    def to_dict(self) -> Dict:
+        return {
+            "symbols": len(self.symbols),
+            "version": self.version,
+            "built": datetime.fromtimestamp(self.built).isoformat(timespec='seconds') if self.built else None,
+            "path": self.path,
+        }
@@ -0,0 +1,203 @@
+"""
+Vectorized market screener over the latest quote snapshot.
+
+Screener.update(quotes) folds every snapshot into NumPy columns (one row per
+symbol, rows are stable so per-symbol history survives between snapshots).
+A scan then ranks the whole universe in one pass and returns only the top N:
+
+    gainers / losers         change % against prev close (open when it is missing)
+    volume_spike             volume traded since the last snapshot / its moving average
+    relative_volume          today's volume / average daily volume
+    near_52w_high / _low     distance from the 52-week high / low, in % (negative = beyond it)
+    gap_up / gap_down        today's open against prev close, in %
+
+Filters (min_price, max_price, min_volume, symbols) are boolean masks applied
+before ranking; np.argpartition picks the top N without sorting every row.
+Results are cached per (scan, filters) until the next snapshot changes the data.
+
+Prior close, 52-week range and average daily volume come from set_reference()
+(see reference_data.py); the feed's own previous close is used only for symbols
+without a reference row. Scans that need a missing column skip that symbol.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Weight of the newest per-snapshot volume delta in its moving average
+VOLUME_EWMA_ALPHA = 0.1
+# Deltas needed before a symbol's average is trusted for volume_spike
+VOLUME_MIN_SAMPLES = 5
+
+# scan -> (metric column, descending, only rows whose metric is > 0 / < 0 / any)
+SCANS: Dict[str, Tuple[str, bool, int]] = {
+    "gainers": ("change", True, 1),
+    "losers": ("change", False, -1),
+    "volume_spike": ("volume_spike", True, 1),
+    "relative_volume": ("relative_volume", True, 1),
+    "near_52w_high": ("from_52w_high", False, 0),
+    "near_52w_low": ("from_52w_low", False, 0),
+    "gap_up": ("gap", True, 1),
+    "gap_down": ("gap", False, -1),
+}
+
+
+class Screener:
+    def __init__(self, capacity: int = 256):
+        self._lock = threading.Lock()
+        self.index: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.version = 0
+        self.count = 0  # symbols in the latest snapshot
+        self.ltp = np.full(capacity, np.nan)
+        self.open = np.full(capacity, np.nan)
+        self.prev_close = np.full(capacity, np.nan)
+        self.volume = np.zeros(capacity)
+        self.vol_delta = np.zeros(capacity)
+        self.vol_avg = np.zeros(capacity)
+        self.vol_samples = np.zeros(capacity)
+        self.ref_close = np.full(capacity, np.nan)
+        self.avg_volume = np.full(capacity, np.nan)
+        self.week52_high = np.full(capacity, np.nan)
+        self.week52_low = np.full(capacity, np.nan)
+        self.live = np.zeros(capacity, dtype=bool)  # row present in the latest snapshot
+        self._results: Dict[Tuple, List[Dict]] = {}
+
+    def _grow(self) -> None:
+        grow = len(self.ltp)
+        for name in ("ltp", "open", "prev_close", "ref_close", "avg_volume", "week52_high", "week52_low"):
+            setattr(self, name, np.concatenate([getattr(self, name), np.full(grow, np.nan)]))
+        for name in ("volume", "vol_delta", "vol_avg", "vol_samples"):
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(grow)]))
+        self.live = np.concatenate([self.live, np.zeros(grow, dtype=bool)])
+
+    def _rows(self, symbols: Iterable[str]) -> np.ndarray:
+        index = self.index
+        rows = []
+        for s in symbols:
+            i = index.get(s)
+            if i is None:
+                i = index[s] = len(self.symbols)
+                self.symbols.append(s)
+                if i >= len(self.ltp):
+                    self._grow()
+            rows.append(i)
+        return np.asarray(rows, dtype=np.int64)
+
+    def update(self, quotes: Dict[str, Dict]) -> None:
+        """Load a normalized snapshot into the columns."""
+        if not quotes:
+            return
+        n = len(quotes)
+        values = list(quotes.values())
+        ltp = np.fromiter((q["ltp"] for q in values), dtype=np.float64, count=n)
+        opn = np.fromiter((q["open"] for q in values), dtype=np.float64, count=n)
+        prev = np.fromiter((q["prev_close"] or np.nan for q in values), dtype=np.float64, count=n)
+        vol = np.fromiter((q["volume"] for q in values), dtype=np.float64, count=n)
+        with self._lock:
+            rows = self._rows(quotes)
+            # Volume traded since the last snapshot; a drop means a new session started
+            last_vol = self.volume[rows]
+            delta = np.where(vol >= last_vol, vol - last_vol, 0.0)
+            seen = self.vol_samples[rows] > 0
+            moved = seen & (delta > 0)
+            avg = self.vol_avg[rows]
+            self.vol_avg[rows] = np.where(moved, np.where(avg > 0, avg + VOLUME_EWMA_ALPHA * (delta - avg), delta), avg)
+            self.vol_samples[rows] += moved | ~seen
+            self.vol_delta[rows] = np.where(seen, delta, 0.0)
+            self.ltp[rows] = ltp
+            self.open[rows] = opn
+            self.prev_close[rows] = prev
+            self.volume[rows] = vol
+            self.live[:] = False
+            self.live[rows] = True
+            self.count = n
+            self.version += 1
+            self._results = {}
+
+    def volume_state(self) -> Dict[str, List[float]]:
+        """symbol -> [volume, vol_avg, vol_samples] for warm restarts."""
+        with self._lock:
+            return {s: [float(self.volume[i]), float(self.vol_avg[i]), float(self.vol_samples[i])]
+                    for s, i in self.index.items() if self.vol_samples[i] > 0}
+
+    def restore_volume_state(self, state: Dict[str, List[float]]) -> None:
+        """Seed volume baselines saved by volume_state(), before the first update()."""
+        if not state:
+            return
+        with self._lock:
+            rows = self._rows(state)
+            values = np.asarray(list(state.values()), dtype=np.float64).reshape(-1, 3)
+            self.volume[rows] = values[:, 0]
+            self.vol_avg[rows] = values[:, 1]
+            self.vol_samples[rows] = values[:, 2]
+
+    def set_reference(self, reference: Dict[str, Dict]) -> None:
+        """Adopt per-symbol reference rows (prev_close, week52_high/low, avg_volume)."""
+        with self._lock:
+            rows = self._rows(reference)
+            values = list(reference.values())
+            for col, key in (("ref_close", "prev_close"), ("avg_volume", "avg_volume"),
+                             ("week52_high", "week52_high"), ("week52_low", "week52_low")):
+                getattr(self, col)[rows] = [v.get(key) or np.nan for v in values]
+            self._results = {}
+
+    def _metric(self, name: str, n: int) -> np.ndarray:
+        ltp, opn = self.ltp[:n], self.open[:n]
+        prev = np.where(np.isnan(self.ref_close[:n]), self.prev_close[:n], self.ref_close[:n])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if name == "change":
+                base = np.where(np.isnan(prev), opn, prev)
+                return (ltp - base) / base * 100.0
+            if name == "gap":
+                return (opn - prev) / prev * 100.0
+            if name == "volume_spike":
+                ok = (self.vol_samples[:n] >= VOLUME_MIN_SAMPLES) & (self.vol_avg[:n] > 0)
+                return np.where(ok, self.vol_delta[:n] / self.vol_avg[:n], np.nan)
+            if name == "relative_volume":
+                return self.volume[:n] / self.avg_volume[:n]
+            if name == "from_52w_high":
+                return (self.week52_high[:n] - ltp) / self.week52_high[:n] * 100.0
+            if name == "from_52w_low":
+                return (ltp - self.week52_low[:n]) / self.week52_low[:n] * 100.0
+        raise ValueError(f"unknown metric {name}")
+
+    def scan(self, scan: str, limit: int = 20, min_price: float = 0.0, max_price: Optional[float] = None,
+             min_volume: float = 0.0, symbols: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Top `limit` rows for a scan in SCANS, after filters."""
+        if scan not in SCANS:
+            raise ValueError(f"unknown scan '{scan}' (expected one of {', '.join(SCANS)})")
+        subset = tuple(symbols) if symbols is not None else None
+        key = (scan, limit, min_price, max_price, min_volume, subset)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                return cached
+            n = len(self.symbols)
+            column, descending, sign = SCANS[scan]
+            metric = self._metric(column, n)
+            mask = self.live[:n] & ~np.isnan(metric) & (self.ltp[:n] >= min_price) & (self.volume[:n] >= min_volume)
+            if max_price is not None:
+                mask &= self.ltp[:n] <= max_price
+            if sign:
+                mask &= metric * sign > 0
+            if subset is not None:
+                allowed = np.zeros(n, dtype=bool)
+                allowed[[self.index[s] for s in subset if s in self.index]] = True
+                mask &= allowed
+            rows = np.flatnonzero(mask)
+            keys = -metric[rows] if descending else metric[rows]
+            if len(rows) > limit:
+                part = np.argpartition(keys, limit - 1)[:limit]
+                rows, keys = rows[part], keys[part]
+            rows = rows[np.argsort(keys, kind="stable")]
+            change = self._metric("change", n)
+            result = [{
+                "symbol": self.symbols[r],
+                "ltp": round(float(self.ltp[r]), 2),
+                "change": round(float(change[r]), 2),
+                "volume": int(self.volume[r]),
+                "value": round(float(metric[r]), 4),
+            } for r in rows.tolist()]
+            self._results[key] = result
+            return result
@@ -0,0 +1,216 @@
+"""
+Pool of authenticated mStock sessions, one per stored account.
+
+Every account saved in CredentialStore gets its own MStockClient. Each session
+brings its own rate limits, so market-data work is spread across them:
+
+- get_quotes(symbols) shards the symbol list by crc32(symbol) over the sessions
+  currently in rotation and fetches the shards in parallel. A symbol keeps its
+  session while the healthy set is unchanged. A failed shard is retried once
+  on another session.
+- Orders cannot move between accounts (funds and positions are per account),
+  so client_for(account) routes to that account's session. It returns None
+  while that session is out of rotation.
+
+Health: a session leaves rotation after max_failures consecutive errors or empty
+responses, or when its client reports it is disconnected. After cooldown seconds
+it gets one trial request (half-open); success puts it back in rotation.
+"""
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from credential_store import PRIMARY_ACCOUNT
+from mstock_client import MStockClient
+
+
+class Session:
+    def __init__(self, account: str, client):
+        self.account = account
+        self.client = client
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.last_error = ""
+        self.latency_ms = 0.0  # moving average of quote fetches
+
+    @property
+    def connected(self) -> bool:
+        return bool(self.client is not None and getattr(self.client, "is_connected", False))
+
+    def available(self, now: float) -> bool:
+        return self.connected and now >= self.cooldown_until
+
+    def to_dict(self) -> Dict:
+        now = time.time()
+        return {
+            "account": self.account,
+            "connected": self.connected,
+            "in_rotation": self.available(now),
+            "failures": self.failures,
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - now), 1),
+            "calls": self.calls,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "latency_ms": round(self.latency_ms, 1),
+            "circuit": self.client.breaker.to_dict() if hasattr(self.client, "breaker") else None,
+            "rate": self.client.governor.to_dict() if hasattr(self.client, "governor") else None,
+        }
+
+
+def login_client(creds: Dict) -> MStockClient:
+    """MStockClient for one stored account, logged in."""
+    client = MStockClient()
+    client.api_key = creds['api_key']
+    client.vendor_key = client.vendor_key or creds['api_key']
+    client.client_code = creds['user_id']
+    client.password = creds['password']
+    client.login()
+    return client
+
+
+class SessionPool:
+    def __init__(self, max_failures: int = 3, cooldown: float = 30.0):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def add(self, account: str, client) -> Session:
+        with self._lock:
+            session = self.sessions[account] = Session(account, client)
+            # One fetch thread per session; rebuilt when the pool grows. get_quotes submits
+            # under the same lock, so the old executor only ever finishes work already queued
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.sessions)),
+                                                thread_name_prefix="quote-shard")
+        return session
+
+    def remove(self, account: str) -> Optional[Session]:
+        with self._lock:
+            return self.sessions.pop(account, None)
+
+    def load_accounts(self, store, primary_client=None) -> None:
+        """Add a session per stored account; primary_client stands in for the primary account."""
+        if primary_client is not None:
+            self.add(PRIMARY_ACCOUNT, primary_client)
+        for creds in store.list_mstock_accounts():
+            account = creds['account']
+            if account in self.sessions:
+                continue
+            try:
+                self.add(account, login_client(creds))
+                print(f"Session pool: account '{account}' logged in")
+            except Exception as e:
+                print(f"Session pool: login failed for account '{account}': {e}")
+
+    def healthy(self) -> List[Session]:
+        now = time.time()
+        return [s for s in list(self.sessions.values()) if s.available(now)]
+
+    def _record(self, session: Session, ok: bool, error: str = "", elapsed: float = 0.0) -> None:
+        session.calls += 1
+        if ok:
+            session.failures = 0
+            session.latency_ms = elapsed * 1000 if not session.latency_ms else \
+                0.8 * session.latency_ms + 0.2 * elapsed * 1000
+            return
+        session.errors += 1
+        session.failures += 1
+        session.last_error = error
+        if session.failures >= self.max_failures:
+            session.cooldown_until = time.time() + self.cooldown
+            # Half-open after the cooldown: one more failure sends it straight back
+            session.failures = self.max_failures - 1
+            print(f"Session pool: account '{session.account}' out of rotation for {self.cooldown:.0f}s ({error})")
+
+    def shard(self, symbols: List[str], sessions: Optional[List[Session]] = None) -> List[Tuple[Session, List[str]]]:
+        sessions = sessions if sessions is not None else self.healthy()
+        if not sessions:
+            return []
+        buckets: List[List[str]] = [[] for _ in sessions]
+        n = len(sessions)
+        for s in symbols:
+            buckets[zlib.crc32(s.encode()) % n].append(s)
+        return [(sess, b) for sess, b in zip(sessions, buckets) if b]
+
+    def _fetch(self, session: Session, symbols: List[str], mode: str = "full") -> Tuple[Dict, str]:
+        start = time.perf_counter()
+        try:
+            resp, fmt = session.client.get_data_smart(symbols, mode=mode)
+        except Exception as e:
+            self._record(session, False, str(e))
+            return {}, "error"
+        ok = bool(resp) and fmt != "error"
+        self._record(session, ok, "" if ok else "empty quote response", time.perf_counter() - start)
+        return (resp, fmt) if ok else ({}, "error")
+
+    def get_quotes(self, symbols: List[str], mode: str = "full") -> Tuple[Dict, str]:
+        """Fetch symbols across healthy sessions in parallel; returns (merged response, format).
+        mode is passed to MStockClient.get_data_smart ('full' or 'ltp')."""
+        sessions = self.healthy()
+        shards = self.shard(symbols, sessions)
+        if not shards:
+            return {}, "error"
+        if len(shards) == 1:
+            results = [self._fetch(*shards[0], mode)]
+        else:
+            with self._lock:
+                futures = [self._executor.submit(self._fetch, session, part, mode) for session, part in shards]
+            results = [f.result() for f in futures]
+
+        merged: Dict = {}
+        formats = set()
+        for (session, part), (resp, fmt) in zip(shards, results):
+            if fmt == "error":
+                # Retry the shard once on the next session still in rotation
+                backups = [s for s in self.healthy() if s is not session]
+                if backups:
+                    resp, fmt = self._fetch(backups[zlib.crc32(session.account.encode()) % len(backups)], part, mode)
+            if fmt == "error":
+                continue
+            formats.add(fmt)
+            if isinstance(resp, dict):
+                merged.update(resp)
+            elif isinstance(resp, list):
+                # Key list entries by their own symbol/token; normalize_quotes accepts bare keys
+                for entry in resp:
+                    if isinstance(entry, dict):
+                        key = entry.get("symbol") or entry.get("token") or entry.get("tradingsymbol")
+                        if key:
+                            merged[str(key)] = entry
+        if not merged:
+            return {}, "error"
+        return merged, formats.pop() if len(formats) == 1 else "mixed"
+
+    def client_for(self, account: Optional[str] = None):
+        """Client that places orders for account (primary by default), or None if it is unavailable."""
+        session = self.sessions.get(account or PRIMARY_ACCOUNT)
+        if session is None or not session.available(time.time()):
+            return None
+        return session.client
+
+    def close_all(self) -> None:
+        """Log every session out and empty the pool (credentials reset)."""
+        with self._lock:
+            sessions, self.sessions = list(self.sessions.values()), {}
+        for session in sessions:
+            try:
+                if session.connected and hasattr(session.client, 'logout'):
+                    session.client.logout()
+            except Exception as e:
+                print(f"Session pool: logout failed for '{session.account}': {e}")
+
+    def to_dict(self) -> Dict:
+        return {
+            "sessions": [s.to_dict() for s in self.sessions.values()],
+            "in_rotation": len(self.healthy()),
+        }
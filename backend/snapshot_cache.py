@@ -0,0 +1,122 @@
+"""
+Versioned, pre-serialized quote snapshots for /api/tokens.
+
+The quote poller hands every snapshot to SnapshotCache.update(). The version
+only advances when the quotes actually changed; the JSON body is encoded once per
+version (orjson when installed, else the stdlib json module) and kept as bytes,
+together with a gzip copy once the body is large enough to benefit.
+
+A view (for example a watchlist name and revision) selects which rows are
+built; each view is encoded once per version.
+
+Requests then cost a header comparison and a bytes write:
+- ETag is "<boot>-<version>[-<view>]", so a restarted backend never matches a stale tag
+- If-None-Match on the current tag gets 304 Not Modified
+- Accept-Encoding: gzip gets the cached compressed body (bodies >= gzip_min_bytes)
+"""
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+# Processes sharing one snapshot (API workers) share SNAPSHOT_BOOT_ID so their ETags agree
+_BOOT = os.getenv("SNAPSHOT_BOOT_ID") or f"{int(time.time()):x}{os.getpid():x}"
+
+
+class EncodedSnapshot:
+    __slots__ = ("version", "etag", "body", "_gzip", "_lock")
+
+    def __init__(self, version: int, body: bytes, view_tag: str = ""):
+        self.version = version
+        self.etag = f'"{_BOOT}-{version}{view_tag}"'
+        self.body = body
+        self._gzip: Optional[bytes] = None
+        self._lock = threading.Lock()
+
+    def gzipped(self) -> bytes:
+        if self._gzip is None:
+            with self._lock:
+                if self._gzip is None:
+                    self._gzip = gzip.compress(self.body, compresslevel=5, mtime=0)
+        return self._gzip
+
+
+class SnapshotCache:
+    def __init__(self, build: Callable[[Dict, Hashable], List[Dict]], gzip_min_bytes: int = 2048):
+        self.build = build
+        self.gzip_min_bytes = gzip_min_bytes
+        self.version = 0
+        self.updated = 0.0  # wall clock of the last update() call with data
+        self._quotes: Optional[Dict] = None
+        self._encoded: Dict[Hashable, EncodedSnapshot] = {}
+        self._lock = threading.Lock()
+
+    def update(self, quotes: Dict, version: Optional[int] = None) -> bool:
+        """Adopt a snapshot; returns True if it differs from the current one.
+        version adopts another process's numbering instead of counting locally."""
+        if not quotes:
+            return False
+        with self._lock:
+            self.updated = time.time()
+            if version is not None:
+                if version == self.version:
+                    return False
+            elif quotes is self._quotes or quotes == self._quotes:
+                return False
+            self._quotes = quotes
+            self.version = version if version is not None else self.version + 1
+            self._encoded = {}
+            return True
+
+    def touch(self) -> None:
+        """New version of the same quotes, for when other inputs to build() changed."""
+        with self._lock:
+            if self._quotes is not None:
+                self.version += 1
+                self._encoded = {}
+
+    def invalidate(self) -> None:
+        """Treat the snapshot as stale so the next reader fetches (e.g. new symbols subscribed)."""
+        self.updated = 0.0
+
+    def age(self) -> float:
+        return time.time() - self.updated if self.updated else float("inf")
+
+    def encoded(self, view: Hashable = None) -> Optional[EncodedSnapshot]:
+        """Serialized body of view for the current version, encoded on first use."""
+        with self._lock:
+            enc, quotes, version = self._encoded.get(view), self._quotes, self.version
+        if enc is not None or quotes is None:
+            return enc
+        view_tag = "" if view is None else f"-{zlib.crc32(repr(view).encode()):x}"
+        enc = EncodedSnapshot(version, dumps(self.build(quotes, view)), view_tag)
+        with self._lock:
+            if self.version == version:
+                self._encoded[view] = enc
+        return enc
+
+    def negotiate(self, enc: EncodedSnapshot, if_none_match: Optional[str],
+                  accept_encoding: Optional[str]) -> Tuple[int, bytes, Dict[str, str]]:
+        """(status, body, headers) for a request against enc."""
+        headers = {"ETag": enc.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if if_none_match and (if_none_match.strip() == "*" or enc.etag in if_none_match):
+            return 304, b"", headers
+        if accept_encoding and "gzip" in accept_encoding and len(enc.body) >= self.gzip_min_bytes:
+            headers["Content-Encoding"] = "gzip"
+            return 200, enc.gzipped(), headers
+        return 200, enc.body, headers
@@ -0,0 +1,183 @@
+"""
+Strategy evaluation in worker processes, sharded by symbol.
+
+NotifyAutoBuyEngine.step() normally calls its strategy on the calling thread,
+so a CPU-heavy strategy (multi-timeframe indicators, ML scoring) competes with
+the API for the GIL. StrategyPool moves that work into STRATEGY_WORKERS
+processes and plugs into the engine as its strategy_fn: it exposes the same
+.batch(TickBatch) -> [(row, StrategySignal)] hook as simple_breakout_strategy,
+so the engine keeps notification, margin checks and order routing.
+
+- Each symbol belongs to one worker, chosen by crc32(symbol) % workers. The
+  mapping is stable across steps and restarts, so state a strategy keeps per
+  symbol (rolling windows, model features) stays inside one process.
+- A step splits the batch by shard and sends every shard its rows at once, as
+  typed arrays. Symbol names are sent to a worker only the first time it sees
+  them. Replies carry only the rows that signalled.
+- A worker that dies or misses the timeout is restarted and its shard
+  contributes no signals to that step. Its per-symbol strategy state starts
+  over.
+
+The strategy must be importable by name (a module-level function, optionally
+with a .batch attribute): workers are spawned, not forked, so they do not
+inherit the server's threads and locks.
+"""
+import multiprocessing
+import threading
+import zlib
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+
+from auto_trade import MarketTick, StrategySignal, TickBatch, token_id, token_name
+
+COLUMNS = ("ltp", "open", "high", "low", "volume", "timestamp")
+
+
+def shard_of(symbol: str, shards: int) -> int:
+    return zlib.crc32(symbol.encode()) % shards
+
+
+def _evaluate(strategy_fn: Callable, batch: TickBatch) -> List[Tuple[int, str, float, str]]:
+    batch_fn = getattr(strategy_fn, "batch", None)
+    if batch_fn is not None:
+        hits = batch_fn(batch)
+    else:
+        hits = [(i, strategy_fn(row)) for i, row in enumerate(batch)]
+    return [(i, s.signal, s.score, s.reason) for i, s in hits if s.signal != "NONE"]
+
+
+def _worker_main(conn, strategy_fn: Callable) -> None:
+    """Worker loop: (new names, token ids, columns...) in, signalling rows out."""
+    local: Dict[int, int] = {}  # engine token id -> this process's token id
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError, KeyboardInterrupt):
+            return
+        if msg is None:
+            return
+        names, tids, *columns = msg
+        for tid, name in names.items():
+            local[tid] = token_id(name)
+        batch = TickBatch()
+        batch.token_id = array("I", [local[t] for t in tids])
+        for name, values in zip(COLUMNS, columns):
+            setattr(batch, name, values)
+        try:
+            reply = _evaluate(strategy_fn, batch)
+        except Exception as e:
+            reply = f"{type(e).__name__}: {e}"  # the exception itself may not pickle
+        conn.send(reply)
+
+
+class StrategyPool:
+    def __init__(self, strategy_fn: Callable, workers: int = 2, timeout: float = 5.0):
+        self.strategy_fn = strategy_fn
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.restarts = 0
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()  # one step at a time: replies are matched by order
+        self._procs: List[Optional[multiprocessing.Process]] = [None] * self.workers
+        self._conns: list = [None] * self.workers
+        self._known: List[set] = [set() for _ in range(self.workers)]  # token ids each worker has named
+        self._shard: Dict[int, int] = {}  # token id -> shard
+        for i in range(self.workers):
+            self._start(i)
+
+    def _start(self, i: int) -> None:
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_worker_main, args=(child, self.strategy_fn),
+                                 name=f"strategy-{i}", daemon=True)
+        proc.start()
+        child.close()
+        self._procs[i], self._conns[i] = proc, parent
+        self._known[i] = set()
+
+    def _restart(self, i: int, error) -> None:
+        print(f"Strategy worker {i} failed ({error}); restarting")
+        self.restarts += 1
+        proc, conn = self._procs[i], self._conns[i]
+        try:
+            conn.close()
+        except OSError:
+            pass
+        if proc is not None and proc.is_alive():
+            proc.terminate()
+            proc.join(1)
+        self._start(i)
+
+    def __call__(self, tick: MarketTick) -> StrategySignal:
+        """Per-tick fallback for callers that pass MarketTick lists; runs in this process."""
+        return self.strategy_fn(tick)
+
+    def batch(self, batch: TickBatch) -> List[Tuple[int, StrategySignal]]:
+        """Evaluate every row in the worker owning its symbol; (row, signal) for rows that signal."""
+        n = self.workers
+        rows: List[List[int]] = [[] for _ in range(n)]
+        shard = self._shard
+        for i, tid in enumerate(batch.token_id):
+            s = shard.get(tid)
+            if s is None:
+                s = shard[tid] = shard_of(token_name(tid), n)
+            rows[s].append(i)
+
+        with self._lock:
+            sent = []
+            for s in range(n):
+                if not rows[s]:
+                    continue
+                idx = rows[s]
+                tids = array("I", [batch.token_id[i] for i in idx])
+                known = self._known[s]
+                names = {t: token_name(t) for t in set(tids) if t not in known}
+                msg = (names, tids, *(array(getattr(batch, c).typecode, [getattr(batch, c)[i] for i in idx])
+                                      for c in COLUMNS))
+                try:
+                    self._conns[s].send(msg)
+                except (OSError, ValueError) as e:
+                    self._restart(s, e)
+                    continue
+                known.update(names)
+                sent.append(s)
+
+            out: List[Tuple[int, StrategySignal]] = []
+            for s in sent:
+                conn = self._conns[s]
+                try:
+                    if not conn.poll(self.timeout):
+                        raise TimeoutError(f"no reply in {self.timeout}s")
+                    reply = conn.recv()
+                except (EOFError, OSError, TimeoutError) as e:
+                    self._restart(s, e)
+                    continue
+                if isinstance(reply, str):
+                    print(f"Strategy error in worker {s}: {reply}")
+                    continue
+                idx = rows[s]
+                for j, signal, score, reason in reply:
+                    i = idx[j]
+                    out.append((i, StrategySignal(token=batch.token(i), signal=signal, score=score, reason=reason)))
+        out.sort(key=lambda x: x[0])
+        return out
+
+    def to_dict(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for p in self._procs if p is not None and p.is_alive()),
+            "restarts": self.restarts,
+            "symbols": len(self._shard),
+        }
+
+    def close(self) -> None:
+        for conn in self._conns:
+            try:
+                conn.send(None)
+                conn.close()
+            except (OSError, ValueError):
+                pass
+        for proc in self._procs:
+            if proc is not None:
+                proc.join(2)
+                if proc.is_alive():
+                    proc.terminate()
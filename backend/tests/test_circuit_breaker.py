@@ -0,0 +1,124 @@
+import pytest
+
+import mstock_client
+from mstock_client import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, MStockClient
+
+
+def _trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+
+def test_opens_after_threshold_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    assert not breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    _trip(breaker)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.release_trial()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_failed_trial_doubles_timeout_up_to_max():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0, max_timeout=120.0)
+    breaker.base_timeout = breaker.reset_timeout = 50.0
+    _trip(breaker)
+    breaker.opened_at -= 50.0
+    assert breaker.allow()
+    assert breaker.record_failure()
+    assert (breaker.state, breaker.reset_timeout) == (OPEN, 100.0)
+    assert not breaker.allow()
+
+    breaker.opened_at -= 100.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.reset_timeout == 120.0
+
+    breaker.opened_at -= 120.0
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.reset_timeout == 50.0
+
+
+@pytest.fixture
+def client(monkeypatch):
+    for name, value in (("MSTOCK_API_KEY", "key"), ("MSTOCK_USER_ID", "user"), ("MSTOCK_PASSWORD", "pw"),
+                        ("BROKER_RELOGIN_BACKOFF", "2")):
+        monkeypatch.setenv(name, value)
+    return MStockClient()
+
+
+def test_relogin_backoff_grows_and_resets(client, monkeypatch):
+    attempts = []
+    monkeypatch.setattr(client, "login", lambda: attempts.append(1) and False)
+
+    assert not client.check_health()
+    assert client.login_backoff == 4.0 and client.next_login_at > 0
+    assert not client.check_health()
+    assert len(attempts) == 1  # still backing off
+
+    for expected in (8.0, 16.0):
+        client.next_login_at = 0.0
+        client.check_health()
+        assert client.login_backoff == expected
+
+    def login():
+        client.is_connected = True
+        return True
+
+    monkeypatch.setattr(client, "login", login)
+    client.next_login_at = 0.0
+    assert client.check_health()
+    assert (client.login_backoff, client.next_login_at) == (2.0, 0.0)
+
+
+class _Broker:
+    def __init__(self):
+        self.calls = 0
+
+    def place_order(self, **kwargs):
+        self.calls += 1
+        return {"order_id": "X1", "average_price": 10.0}
+
+
+def test_order_refused_by_open_circuit_is_an_error(client):
+    client.client, client.is_connected = _Broker(), True
+    result = client.place_order("NSE:ABC", 1)
+    assert result["success"] and result["price"] == 10.0
+
+    _trip(client.breaker)
+    result = client.place_order("NSE:ABC", 1)
+    assert not result["success"] and result["error"]
+    assert client.client.calls == 1
+
+
+def test_order_without_rate_token_is_an_error(client, monkeypatch):
+    client.client, client.is_connected = _Broker(), True
+
+    def no_token(cls, max_wait=None):
+        raise mstock_client.RateLimited(f"mStock {cls} rate limit")
+
+    monkeypatch.setattr(client.governor, "acquire", no_token)
+    result = client.place_order("NSE:ABC", 1)
+    assert result["error"] and client.client.calls == 0
+    assert client.breaker.allow()
@@ -0,0 +1,84 @@
+from exit_monitor import ExitMonitor, ExitRule, TRIGGERED
+
+
+def _monitor():
+    fired = []
+    return ExitMonitor(lambda p, reason, price: fired.append((p.id, reason, price))), fired
+
+
+def test_stop_and_target_trigger_once():
+    mon, fired = _monitor()
+    stop = mon.arm("ABC", 10, 100.0, ExitRule(stop_pct=2))
+    target = mon.arm("ABC", 10, 100.0, ExitRule(target_pct=5))
+    assert (stop.stop, target.target) == (98.0, 105.0)
+
+    assert mon.on_quotes({"ABC": {"ltp": 101.0}}) == []
+    assert mon.on_quotes({"ABC": {"ltp": 97.5}}) == [stop]
+    assert mon.on_quotes({"ABC": {"ltp": 106.0}}) == [target]
+    assert mon.on_quotes({"ABC": {"ltp": 90.0}}) == []
+    assert fired == [(stop.id, "stop_loss", 97.5), (target.id, "target", 106.0)]
+    assert stop.status == TRIGGERED and not mon.active
+
+
+def test_other_leg_dropped_after_exit():
+    mon, fired = _monitor()
+    p = mon.arm("ABC", 10, 100.0, ExitRule(stop_pct=2, target_pct=5))
+    mon.on_quotes({"ABC": {"ltp": 105.0}})
+    mon.on_quotes({"ABC": {"ltp": 90.0}})
+    assert fired == [(p.id, "target", 105.0)]
+
+
+def test_short_protection_uses_inverted_levels():
+    mon, fired = _monitor()
+    p = mon.arm("ABC", 5, 100.0, ExitRule(stop_pct=2, target_pct=5), direction=-1)
+    assert (p.stop, p.target, p.exit_side) == (102.0, 95.0, "BUY")
+    mon.on_quotes({"ABC": {"ltp": 101.0}})
+    mon.on_quotes({"ABC": {"ltp": 102.5}})
+    assert fired == [(p.id, "stop_loss", 102.5)]
+
+
+def test_trailing_groups_merge_on_new_high():
+    mon, fired = _monitor()
+    early = mon.arm("ABC", 1, 100.0, ExitRule(stop_pct=5, trailing=True))
+    mon.on_quotes({"ABC": {"ltp": 104.0}})
+    late = mon.arm("ABC", 1, 102.0, ExitRule(stop_pct=2, trailing=True))
+    assert len(mon.books["ABC"][1].groups) == 2
+
+    mon.on_quotes({"ABC": {"ltp": 110.0}})
+    groups = mon.books["ABC"][1].groups
+    assert len(groups) == 1 and groups[0][0] == 110.0
+    assert mon.levels()["ABC"] == [104.5, 107.8]
+
+    assert mon.on_quotes({"ABC": {"ltp": 107.0}}) == [late]
+    assert mon.on_quotes({"ABC": {"ltp": 104.0}}) == [early]
+    assert [r for _, r, _ in fired] == ["trailing_stop", "trailing_stop"]
+
+
+def test_cancel_symbol_only_touches_direction():
+    mon, _ = _monitor()
+    mon.arm("ABC", 1, 100.0, ExitRule(stop_pct=2))
+    mon.arm("ABC", 1, 100.0, ExitRule(target_pct=2))
+    short = mon.arm("ABC", 1, 100.0, ExitRule(stop_pct=2), direction=-1)
+    assert mon.cancel_symbol("ABC") == 2
+    assert list(mon.active) == [short.id]
+
+
+def test_restore_keeps_trailing_peak_and_continues_ids():
+    mon, _ = _monitor()
+    trail = mon.arm("ABC", 1, 100.0, ExitRule(stop_pct=5, trailing=True))
+    stop = mon.arm("XYZ", 1, 50.0, ExitRule(stop_pct=10))
+    mon.on_quotes({"ABC": {"ltp": 120.0}, "XYZ": {"ltp": 44.0}})
+    state = mon.state()
+
+    restored, fired = _monitor()
+    assert restored.restore(state) == 1
+    assert [p["id"] for p in restored.to_dict()["recent_exits"]] == [stop.id]
+    assert restored.levels() == {"ABC": [114.0]}
+    assert restored.on_quotes({"ABC": {"ltp": 113.0}})[0].id == trail.id
+    assert restored.arm("ABC", 1, 100.0, ExitRule(stop_pct=1)).id == "P000003"
+
+
+def test_restore_skips_ids_still_in_use():
+    mon, _ = _monitor()
+    mon.restore({"active": [], "closed": []}, used_ids=["P000007"])
+    assert mon.arm("ABC", 1, 100.0, ExitRule(stop_pct=1)).id == "P000008"
@@ -0,0 +1,67 @@
+import time
+
+from margin_ledger import MarginLedger
+
+
+def test_reserve_is_idempotent_and_refuses_overcommit():
+    ledger = MarginLedger(available=1000.0)
+    assert ledger.try_reserve("a", 600.0)
+    assert ledger.try_reserve("a", 600.0)
+    assert not ledger.try_reserve("b", 500.0)
+    assert ledger.available() == 400.0
+
+
+def test_release_returns_reservation():
+    ledger = MarginLedger(available=1000.0)
+    ledger.try_reserve("a", 600.0)
+    assert ledger.release("a") == 600.0
+    assert ledger.release("a") == 0.0
+    assert ledger.available() == 1000.0
+
+
+def test_settle_at_fill_cost_and_credit_sale():
+    ledger = MarginLedger(available=1000.0)
+    ledger.try_reserve("buy", 600.0)
+    assert ledger.settle("buy", 550.0) == 550.0
+    assert ledger.available() == 450.0
+    assert ledger.to_dict()["open_reservations"] == 0
+
+    assert ledger.settle("sell", -550.0) == -550.0
+    assert ledger.available() == 1000.0
+    assert ledger.settle("unknown") == 0.0
+
+
+def test_sync_drops_settlements_it_includes():
+    ledger = MarginLedger(available=1000.0)
+    ledger.try_reserve("buy", 300.0)
+    ledger.settle("buy")
+    ledger.try_reserve("open", 100.0)
+    ledger.sync(700.0, utilized=300.0, as_of=time.time() + 1)
+    snap = ledger.snapshot()
+    assert (snap.available, snap.utilized) == (600.0, 400.0)
+
+    ledger.settle("late", 50.0)
+    ledger.sync(700.0, as_of=time.time() - 60)
+    assert ledger.available() == 550.0
+
+
+def test_unpriced_fill_keeps_reservation_until_covered():
+    ledger = MarginLedger(available=1000.0)
+    ledger.try_reserve("buy", 400.0)
+    ledger.filled_unpriced("buy")
+    ledger.sync(1000.0, as_of=time.time() - 60)
+    assert ledger.available() == 600.0
+    assert ledger.to_dict()["unpriced_fills"] == 1
+
+    ledger.sync(580.0, as_of=time.time() + 1)
+    assert ledger.available() == 580.0
+    assert ledger.to_dict()["open_reservations"] == 0
+
+
+def test_unpriced_fill_settles_when_cost_arrives():
+    ledger = MarginLedger(available=1000.0)
+    ledger.try_reserve("buy", 400.0)
+    ledger.filled_unpriced("buy")
+    assert ledger.settle("buy", 390.0) == 390.0
+    assert ledger.available() == 610.0
+    assert ledger.to_dict()["unpriced_fills"] == 0
@@ -0,0 +1,52 @@
+from market_data import merge_ltp, merge_quotes, normalize_quotes
+
+
+def _q(ltp, open_=100.0, high=105.0, low=95.0, volume=1000, prev_close=99.0):
+    return {"ltp": ltp, "open": open_, "high": high, "low": low, "volume": volume, "prev_close": prev_close}
+
+
+def test_merge_ltp_takes_price_and_keeps_session_fields():
+    base = {"NSE:A": _q(101.0)}
+    fresh = normalize_quotes({"NSE:A": {"ltp": 102.5}}, ["NSE:A"])
+    merged = merge_ltp(base, fresh, ["NSE:A"])
+    assert merged["NSE:A"] == _q(102.5)
+
+
+def test_merge_ltp_widens_high_and_low():
+    base = {"NSE:A": _q(101.0), "NSE:B": _q(101.0)}
+    fresh = {"NSE:A": _q(110.0, 110.0, 110.0, 110.0, 0, None),
+             "NSE:B": _q(90.0, 90.0, 90.0, 90.0, 0, None)}
+    merged = merge_ltp(base, fresh, ["NSE:A", "NSE:B"])
+    assert (merged["NSE:A"]["high"], merged["NSE:A"]["low"]) == (110.0, 95.0)
+    assert (merged["NSE:B"]["high"], merged["NSE:B"]["low"]) == (105.0, 90.0)
+
+
+def test_merge_ltp_volume_never_goes_backwards():
+    base = {"NSE:A": _q(101.0, volume=1000), "NSE:B": _q(101.0, volume=1000)}
+    fresh = {"NSE:A": _q(102.0, volume=1500), "NSE:B": _q(102.0, volume=0)}
+    merged = merge_ltp(base, fresh, ["NSE:A", "NSE:B"])
+    assert merged["NSE:A"]["volume"] == 1500
+    assert merged["NSE:B"]["volume"] == 1000
+
+
+def test_merge_ltp_missing_symbols():
+    base = {"NSE:A": _q(101.0), "NSE:B": _q(50.0)}
+    fresh = {"NSE:A": _q(102.0), "NSE:C": _q(10.0)}
+    merged = merge_ltp(base, fresh, ["NSE:A", "NSE:B", "NSE:C"])
+    # B keeps its last full quote; C waits for one
+    assert merged["NSE:B"] is base["NSE:B"]
+    assert "NSE:C" not in merged
+    assert list(merged) == ["NSE:A", "NSE:B"]
+
+
+def test_merge_ltp_does_not_mutate_base():
+    base = {"NSE:A": _q(101.0)}
+    merge_ltp(base, {"NSE:A": _q(120.0)}, ["NSE:A"])
+    assert base["NSE:A"] == _q(101.0)
+
+
+def test_merge_quotes_prefers_fresh_and_falls_back_to_base():
+    base = {"NSE:A": _q(101.0), "NSE:B": _q(50.0)}
+    fresh = {"NSE:A": _q(103.0, high=104.0), "NSE:C": _q(10.0)}
+    merged = merge_quotes(base, fresh, ["NSE:A", "NSE:B", "NSE:C", "NSE:D"])
+    assert merged == {"NSE:A": fresh["NSE:A"], "NSE:B": base["NSE:B"], "NSE:C": fresh["NSE:C"]}
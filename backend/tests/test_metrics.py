@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from metrics import Counter, Gauge, Histogram, MetricsMiddleware, Registry, _Metric
+
+
+def test_counter_exposition_escapes_labels():
+    registry = Registry()
+    c = registry.counter("orders_total", "Orders", ("source", "result"))
+    c.inc("api", "placed")
+    c.inc("api", "placed", amount=2)
+    c.inc('we"ird\\', "x\ny")
+    assert registry.counter("orders_total", "again") is c
+    assert registry.render() == (
+        "# HELP orders_total Orders\n"
+        "# TYPE orders_total counter\n"
+        'orders_total{source="api",result="placed"} 3\n'
+        'orders_total{source="we\\"ird\\\\",result="x\\ny"} 1\n'
+    )
+
+
+def test_gauge_values_and_callback():
+    g = Gauge("depth", "Depth", ("class",))
+    g.inc("quote")
+    g.inc("quote")
+    g.dec("quote")
+    g.set(0.25, "bulk")
+    assert g.samples() == ['depth{class="quote"} 1', 'depth{class="bulk"} 0.25']
+
+    lazy = Gauge("staleness", "Staleness")
+    lazy.set_function(lambda: 1.5)
+    assert lazy.samples() == ["staleness 1.5"] and lazy.value() == 1.5
+    lazy.set_function(lambda: 1 / 0)
+    assert lazy.samples() == []
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("latency_seconds", "Latency", ("method",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(v, "get")
+    assert h.count("get") == 4
+    assert h.samples() == [
+        'latency_seconds_bucket{method="get",le="0.1"} 2',
+        'latency_seconds_bucket{method="get",le="1"} 3',
+        'latency_seconds_bucket{method="get",le="+Inf"} 4',
+        'latency_seconds_sum{method="get"} 3.65',
+        'latency_seconds_count{method="get"} 4',
+    ]
+
+
+def test_timer_observes_once():
+    h = Histogram("step_seconds", "Step")
+    with h.time():
+        pass
+    assert h.count() == 1
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric("x", "y")
+
+
+def test_middleware_labels_by_route_template(monkeypatch):
+    import metrics
+
+    seconds = Histogram("http_seconds", "t", ("method", "path"))
+    total = Counter("http_total", "n", ("method", "path", "status"))
+    monkeypatch.setattr(metrics, "http_request_seconds", seconds)
+    monkeypatch.setattr(metrics, "http_requests_total", total)
+
+    class Route:
+        path = "/api/items/{id}"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route()
+        await send({"type": "http.response.start", "status": 404})
+
+    async def send(message):
+        pass
+
+    asyncio.run(MetricsMiddleware(app)({"type": "http", "method": "GET"}, None, send))
+    assert total.value("GET", "/api/items/{id}", "404") == 1
+    assert seconds.count("GET", "/api/items/{id}") == 1
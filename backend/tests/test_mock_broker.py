@@ -0,0 +1,39 @@
+import pytest
+
+from mock_broker import MockBrokerError, MockMConnect
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    monkeypatch.setenv("MOCK_BROKER_LATENCY_MS", "0")
+    monkeypatch.setenv("MOCK_BROKER_JITTER_MS", "0")
+    monkeypatch.setenv("MOCK_BROKER_CASH", "100000")
+    return MockMConnect()
+
+
+def test_round_trip_frees_utilized_margin(broker):
+    buy = broker.place_order("NSE", "ABC", 10, side="BUY")
+    cost = buy["average_price"] * 10
+    funds = broker.get_fund_summary()
+    assert funds["utilized"] == round(cost, 2)
+
+    broker.place_order("NSE", "ABC", 4, side="SELL")
+    assert broker.get_fund_summary()["utilized"] == round(cost * 0.6, 2)
+    broker.place_order("NSE", "ABC", 6, side="SELL")
+    assert broker.get_fund_summary()["utilized"] == 0.0
+    assert not broker._holdings
+
+
+def test_sell_beyond_holdings_releases_only_held_cost(broker):
+    buy = broker.place_order("NSE", "ABC", 2, side="BUY")
+    broker.place_order("NSE", "XYZ", 1, side="BUY")
+    other = broker.get_fund_summary()["utilized"] - buy["average_price"] * 2
+    broker.place_order("NSE", "ABC", 5, side="SELL")
+    assert broker.get_fund_summary()["utilized"] == pytest.approx(other, abs=0.01)
+
+
+def test_buy_beyond_cash_is_refused(broker):
+    broker.cash = 1.0
+    with pytest.raises(MockBrokerError):
+        broker.place_order("NSE", "ABC", 1, side="BUY")
+    assert broker.utilized == 0.0 and not broker._holdings
@@ -0,0 +1,95 @@
+import math
+import warnings
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from options import (YEAR_SECONDS, OptionContract, bs_price, build_chain, chain_analytics, chain_contracts,
+                     implied_vol, is_expired, norm_cdf, option_symbol, parse_expiry, parse_option_symbol,
+                     strike_step, time_to_expiry, upcoming_expiries)
+
+
+def test_norm_cdf_accuracy():
+    x = np.linspace(-5, 5, 101)
+    exact = np.array([0.5 * (1 + math.erf(v / math.sqrt(2))) for v in x])
+    assert np.max(np.abs(norm_cdf(x) - exact)) < 1.5e-7
+
+
+def test_prices_match_textbook_values():
+    # Hull, Options, Futures and Other Derivatives: S=42, K=40, r=10%, sigma=20%, T=0.5
+    call, put = bs_price(42.0, np.array([40.0, 40.0]), 0.5, 0.1, 0.2, np.array([True, False]))
+    assert (round(call, 2), round(put, 2)) == (4.76, 0.81)
+
+
+def test_greeks_match_textbook_values():
+    # Hull: S=49, K=50, r=5%, sigma=20%, T=20 weeks
+    T = np.full(2, 0.3846)
+    right = np.array([True, False])
+    price = bs_price(49.0, np.array([50.0, 50.0]), T, 0.05, 0.2, right)
+    out = chain_analytics(49.0, [50.0, 50.0], T, 0.05, right, price)
+    assert out["iv"] == pytest.approx([0.2, 0.2], abs=1e-5)
+    assert out["delta"] == pytest.approx([0.522, -0.478], abs=1e-3)
+    assert out["gamma"][0] == pytest.approx(0.066, abs=1e-3) and out["gamma"][1] == pytest.approx(out["gamma"][0])
+    assert out["vega"][0] == pytest.approx(0.121, abs=1e-3)
+    assert out["theta"][0] * 365 == pytest.approx(-4.31, abs=0.01)
+
+
+def test_implied_vol_round_trips_across_strikes():
+    K = np.array([90.0, 95.0, 100.0, 105.0, 110.0] * 2)
+    call = np.array([True] * 5 + [False] * 5)
+    sigma = np.array([0.2, 0.3, 0.6, 1.2, 2.5] * 2)
+    T = np.full(10, 0.1)
+    price = bs_price(100.0, K, T, 0.06, sigma, call)
+    assert implied_vol(price, 100.0, K, T, 0.06, call) == pytest.approx(sigma, rel=1e-4)
+
+
+def test_prices_outside_bounds_have_no_iv():
+    K = np.array([100.0, 120.0, 50.0])
+    # above spot, below intrinsic, no time value
+    iv = implied_vol(np.array([101.0, 10.0, 50.0 + 50.0 * (1 - math.exp(-0.06 * 0.1))]), 100.0, K,
+                     np.full(3, 0.1), 0.06, np.array([True, False, True]))
+    assert np.isnan(iv).all()
+
+
+def test_deep_otm_near_expiry_raises_no_warning():
+    K = np.array([10000.0, 30000.0, 24000.0])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        out = chain_analytics(24000.0, K, np.full(3, 60.0 / YEAR_SECONDS), 0.06, np.array([True, True, False]),
+                              np.array([0.05, 0.05, 300.0]))
+    # Far OTM at a tick: no volatility up to IV_HIGH is worth that much a minute before expiry
+    assert np.isnan(out["iv"][:2]).all() and np.isnan(out["delta"][:2]).all()
+
+
+def test_symbols_and_expiries():
+    c = parse_option_symbol("NFO:NIFTY14AUG25C24600")
+    assert c == OptionContract("NFO:NIFTY14AUG25C24600", "NIFTY", date(2025, 8, 14), "C", 24600.0)
+    assert parse_option_symbol("banknifty28aug25p51000.5").strike == 51000.5
+    assert parse_option_symbol("NSE:INFY") is None
+    assert parse_expiry("31FEB25") is None and parse_expiry("x") is None
+    assert option_symbol("NIFTY", date(2025, 8, 14), "P", 24600.0) == "NFO:NIFTY14AUG25P24600"
+
+    now = datetime(2025, 8, 14, 15, 29)
+    assert not is_expired(date(2025, 8, 14), now)
+    assert is_expired(date(2025, 8, 14), datetime(2025, 8, 14, 15, 30))
+    assert time_to_expiry(date(2025, 8, 14), now) == 60.0 / YEAR_SECONDS
+    assert time_to_expiry(date(2025, 8, 14), datetime(2025, 8, 13, 15, 30)) == pytest.approx(1 / 365)
+    known = [parse_option_symbol(s) for s in ("NIFTY14AUG25C1", "NIFTY21AUG25C1", "NIFTY07AUG25C1")]
+    assert upcoming_expiries(known, now) == [date(2025, 8, 14), date(2025, 8, 21)]
+
+
+def test_chain_ladder_and_rows():
+    exp = date(2025, 8, 14)
+    assert strike_step("NIFTY", 24000) == 50 and strike_step("INFY", 1480) == 10
+    known = [parse_option_symbol("NIFTY14AUG25C26000"), parse_option_symbol("NIFTY21AUG25C24000")]
+    contracts = chain_contracts("NIFTY", exp, 24610.0, 2, known)
+    assert sorted({c.strike for c in contracts}) == [24500, 24550, 24600, 24650, 24700, 26000]
+    assert len(contracts) == 11
+
+    quotes = {"NFO:NIFTY14AUG25C24600": {"ltp": 150.0, "volume": 10}}
+    chain = build_chain("NIFTY", exp, 24610.0, contracts, quotes, 0.06, now=datetime(2025, 8, 7, 10, 0))
+    assert chain["atm_strike"] == 24600 and chain["expiry"] == "14AUG25"
+    atm = next(r for r in chain["rows"] if r["strike"] == 24600)
+    assert 5 < atm["call"]["iv"] < 50 and 0 < atm["call"]["delta"] < 1
+    assert atm["put"]["iv"] is None and atm["put"]["ltp"] is None
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pytest
+
+from order_pipeline import FAILED, PLACED, OrderPipeline, SignalLatch, signal_key
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_duplicate_key_places_one_order():
+    placed = []
+
+    def place(ticket):
+        placed.append(ticket.key)
+        return {"success": True, "order_id": 42, "price": 101.5, "message": "ok"}
+
+    async def scenario():
+        pipeline = OrderPipeline(place, concurrency=2, rate_per_sec=0)
+        await pipeline.start()
+        first, dup1 = pipeline.submit("ABC", 10, key="signal:ABC:BUY:1")
+        second, dup2 = pipeline.submit("ABC", 10, key="signal:ABC:BUY:1")
+        await pipeline._queue.join()
+        await pipeline.stop()
+        return first, dup1, second, dup2
+
+    first, dup1, second, dup2 = _run(scenario())
+    assert (dup1, dup2) == (False, True)
+    assert second is first
+    assert placed == ["signal:ABC:BUY:1"]
+    assert (first.status, first.order_id, first.fill_price) == (PLACED, "42", 101.5)
+
+
+def test_dispatch_error_marks_failed():
+    def place(ticket):
+        raise ConnectionError("down")
+
+    async def scenario():
+        pipeline = OrderPipeline(place, concurrency=1, rate_per_sec=0)
+        await pipeline.start()
+        ticket, _ = pipeline.submit("ABC", 1)
+        await pipeline._queue.join()
+        await pipeline.stop()
+        return ticket
+
+    ticket = _run(scenario())
+    assert ticket.status == FAILED and "down" in ticket.message
+
+
+def test_submit_before_start_raises_but_known_key_deduplicates():
+    pipeline = OrderPipeline(lambda t: {"success": True})
+    pipeline.restore([{"key": "k1", "symbol": "ABC", "quantity": 1, "status": PLACED}])
+    ticket, duplicate = pipeline.submit("ABC", 1, key="k1")
+    assert duplicate and ticket.status == PLACED
+    with pytest.raises(RuntimeError):
+        pipeline.submit("ABC", 1, key="k2")
+
+
+def test_restore_fails_in_flight_tickets():
+    pipeline = OrderPipeline(lambda t: {"success": True})
+    saved = [
+        {"key": "done", "symbol": "ABC", "quantity": 1, "status": PLACED},
+        {"key": "sent", "symbol": "ABC", "quantity": 1, "status": "SENT"},
+        {"key": "bad", "unknown_field": 1},
+    ]
+    assert pipeline.restore(saved) == 2
+    assert pipeline.restore(saved) == 0
+    assert pipeline.get("done").status == PLACED
+    assert pipeline.get("sent").status == FAILED
+    assert pipeline.keys() == ["done", "sent"]
+
+
+def test_signal_latch_episodes():
+    latch = SignalLatch(idle=300)
+    now = time.time()
+    key = latch.hold("ABC", "buy", now=now)
+    assert key == signal_key("ABC", "BUY", now)
+    assert latch.hold("ABC", "BUY", now=now + 1) == key
+
+    # Still signalling: the episode stays open
+    assert latch.release(["ABC"], [("ABC", "buy")]) == 0
+    assert latch.hold("ABC", "BUY", now=now + 2) == key
+
+    restored = SignalLatch()
+    restored.restore(latch.state())
+    assert restored.hold("ABC", "BUY", now=now + 3) == key
+
+    assert latch.release(["ABC"], []) == 1
+    assert latch.hold("ABC", "BUY", now=now + 4) != key
+
+
+def test_signal_latch_idle_episode_reopens():
+    latch = SignalLatch(idle=60)
+    key = latch.hold("ABC", "SELL", now=1000.0)
+    assert latch.hold("ABC", "SELL", now=1061.0) != key
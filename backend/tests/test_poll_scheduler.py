@@ -0,0 +1,79 @@
+import pytest
+
+from poll_scheduler import MAX_BOOST, PollScheduler
+
+
+def _run(sched, symbols, capacity, polls):
+    for _ in range(polls):
+        sched.select(symbols, capacity, quoted=symbols)
+    return dict(sched.polls)
+
+
+def test_everything_polled_when_universe_fits():
+    sched = PollScheduler()
+    assert sched.select(["NSE:B", "NSE:A"], 5) == ["NSE:B", "NSE:A"]
+    assert sched.select(["NSE:B", "NSE:A"], 0) == ["NSE:B", "NSE:A"]
+
+
+def test_polls_follow_class_weights():
+    sched = PollScheduler()
+    symbols = ["NSE:C", "NSE:H", "NSE:N", "NSE:L"]
+    sched.set_priorities({"NSE:C": "critical", "NSE:H": "high", "NSE:N": "normal"}, {})
+    polls = _run(sched, symbols, 1, 150)
+    for s, expected in zip(symbols, (80, 40, 20, 10)):
+        assert polls[s] == pytest.approx(expected, abs=2)
+
+
+def test_equal_weights_share_evenly():
+    sched = PollScheduler()
+    symbols = [f"NSE:S{i}" for i in range(10)]
+    polls = _run(sched, symbols, 3, 100)
+    assert set(polls.values()) == {30}
+
+
+def test_unquoted_symbols_go_first():
+    sched = PollScheduler()
+    symbols = ["NSE:A", "NSE:B", "NSE:C", "NSE:D"]
+    sched.set_priorities({"NSE:A": "critical", "NSE:B": "critical"}, {})
+    assert sched.select(symbols, 2, quoted=["NSE:A", "NSE:B"]) == ["NSE:C", "NSE:D"]
+
+
+def test_rejoining_symbol_does_not_bank_credit():
+    sched = PollScheduler()
+    symbols = ["NSE:A", "NSE:B"]
+    sched.select(symbols + ["NSE:C"], 1, quoted=symbols + ["NSE:C"])
+    # C sits out for a long while, then must share fairly instead of catching up
+    _run(sched, symbols, 1, 100)
+    before = sched.polls.get("NSE:C", 0)
+    polls = _run(sched, symbols + ["NSE:C"], 1, 30)
+    assert polls["NSE:C"] - before == pytest.approx(10, abs=1)
+
+
+def test_volatility_boost_is_capped():
+    sched = PollScheduler()
+    sched.observe({"NSE:A": {"ltp": 100.0}, "NSE:B": {"ltp": 100.0}}, now=1000.0)
+    assert sched.weight("NSE:A") == 1.0
+    sched.observe({"NSE:A": {"ltp": 100.0}, "NSE:B": {"ltp": 110.0}}, now=1001.0)
+    assert sched.weight("NSE:A") == 1.0
+    assert sched.weight("NSE:B") == MAX_BOOST
+
+
+def test_proximity_boost_grows_near_triggers():
+    sched = PollScheduler()
+    sched.set_priorities({"NSE:A": "normal"}, {"NSE:A": [100.0]})
+    sched.observe({"NSE:A": {"ltp": 105.0}}, now=1000.0)
+    assert sched.weight("NSE:A") == 2.0
+    sched.observe({"NSE:A": {"ltp": 100.5}}, now=1000.0)
+    assert sched.weight("NSE:A") == pytest.approx(2.0 * 100.5 / 50.0)
+    sched.observe({"NSE:A": {"ltp": 100.01}}, now=1000.0)
+    assert sched.weight("NSE:A") == 2.0 * MAX_BOOST
+
+
+def test_boosted_symbol_gets_more_polls():
+    sched = PollScheduler()
+    symbols = ["NSE:A", "NSE:B"]
+    sched.set_priorities({}, {"NSE:A": [100.0]})
+    sched.observe({"NSE:A": {"ltp": 100.01}, "NSE:B": {"ltp": 50.0}}, now=1000.0)
+    polls = _run(sched, symbols, 1, 50)
+    assert polls["NSE:A"] == pytest.approx(40, abs=1)
+    assert sched.to_dict()["top"][0]["symbol"] == "NSE:A"
@@ -0,0 +1,56 @@
+import pytest
+
+from positions import PositionBook
+
+
+def test_average_realized_and_flip():
+    book = PositionBook(capacity=1)
+    book.apply_fill("ABC", "BUY", 10, 100.0)
+    book.apply_fill("ABC", "BUY", 10, 110.0)
+    assert book.avg_price("ABC") == 105.0
+
+    book.apply_fill("ABC", "SELL", 5, 120.0)
+    assert book.net_qty("ABC") == 15
+    book.apply_fill("ABC", "SELL", 20, 90.0)
+    assert book.net_qty("ABC") == -5
+    assert book.avg_price("ABC") == 90.0
+    totals = book.to_dict()["totals"]
+    assert totals["realized_pnl"] == pytest.approx(5 * 15 - 15 * 15)
+
+    book.apply_fill("XYZ", "BUY", 1, 10.0)  # grows past capacity
+    assert book.open_symbols() == ["ABC", "XYZ"]
+
+
+def test_mark_updates_unrealized():
+    book = PositionBook()
+    book.apply_fill("ABC", "BUY", 10, 100.0)
+    book.apply_fill("XYZ", "SELL", 2, 50.0)
+    book.mark({"ABC": {"ltp": 103.0}, "XYZ": {"ltp": 45.0}})
+    rows = {p["symbol"]: p for p in book.to_dict()["positions"]}
+    assert rows["ABC"]["unrealized_pnl"] == 30.0
+    assert rows["XYZ"]["unrealized_pnl"] == 10.0
+    book.apply_fill("ABC", "SELL", 10, 103.0)
+    assert book.open_symbols() == ["XYZ"]
+
+
+def test_unpriced_fill_uses_last_mark():
+    book = PositionBook()
+    book.apply_fill("ABC", "BUY", 10, 100.0)
+    book.mark({"ABC": {"ltp": 104.0}})
+    book.apply_fill("ABC", "BUY", 10, 0.0)
+    assert book.avg_price("ABC") == 102.0
+    assert not book.pending
+
+
+def test_unpriced_fill_waits_for_first_quote():
+    book = PositionBook()
+    book.apply_fill("ABC", "BUY", 10, 0.0)
+    assert book.net_qty("ABC") == 10
+    assert book.open_symbols() == ["ABC"]
+    assert book.to_dict()["totals"]["pending_fills"] == 1
+
+    book.mark({"OTHER": {"ltp": 1.0}})
+    assert book.pending == {"ABC": 10}
+    book.mark({"ABC": {"ltp": 98.0}})
+    assert not book.pending
+    assert (book.net_qty("ABC"), book.avg_price("ABC")) == (10, 98.0)
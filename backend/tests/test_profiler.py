@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import profiler
+from profiler import SamplingProfiler, ServerTimingMiddleware, span
+
+
+@pytest.fixture
+def timing(monkeypatch):
+    monkeypatch.setattr(profiler, "timing_enabled", True)
+
+
+def _request(app):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(ServerTimingMiddleware(app)({"type": "http"}, None, send))
+    return dict(sent[0].get("headers", []))
+
+
+def _timings(header: bytes):
+    return {name: float(dur.split("=")[1]) for name, dur in (p.split(";") for p in header.decode().split(", "))}
+
+
+def test_spans_accumulate_into_header(timing):
+    async def app(scope, receive, send):
+        for _ in range(2):
+            with span("broker"):
+                time.sleep(0.005)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    timings = _timings(_request(app)[b"server-timing"])
+    assert list(timings) == ["broker", "other", "total"]
+    # Two 5 ms sleeps; allow for sleep returning a hair early on a coarse clock
+    assert timings["broker"] >= 9.5
+    assert timings["total"] >= timings["broker"] + timings["other"] - 0.01
+
+
+def test_spans_survive_executor_hop(timing):
+    def work():
+        with span("broker"):
+            time.sleep(0.005)
+
+    async def app(scope, receive, send):
+        await profiler.run_in_executor(work)
+        await send({"type": "http.response.start", "status": 200})
+
+    assert "broker" in _timings(_request(app)[b"server-timing"])
+
+
+def test_disabled_timing_passes_through(monkeypatch):
+    monkeypatch.setattr(profiler, "timing_enabled", False)
+
+    async def app(scope, receive, send):
+        assert span("broker") is profiler._NULL
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    assert b"server-timing" not in _request(app)
+
+
+def test_span_outside_a_request_is_a_no_op(timing):
+    assert span("broker") is profiler._NULL
+
+
+def test_sampling_profiler_folds_other_threads():
+    stop = threading.Event()
+
+    def busy_worker():
+        while not stop.is_set():
+            sum(range(1000))
+
+    t = threading.Thread(target=busy_worker, name="busy")
+    t.start()
+    try:
+        result = SamplingProfiler().run(0.2, hz=200)
+    finally:
+        stop.set()
+        t.join()
+    assert result["samples"] > 0
+    assert any(line.startswith("busy;") and "busy_worker" in line for line in result["folded"].splitlines())
+    # The sampling thread itself is never sampled
+    assert not any(line.startswith("MainThread;") for line in result["folded"].splitlines())
+
+
+def test_one_profile_at_a_time():
+    p = SamplingProfiler()
+    p._lock.acquire()
+    with pytest.raises(RuntimeError):
+        p.run(0.1)
@@ -0,0 +1,68 @@
+import os
+import threading
+import uuid
+
+import pytest
+
+from quote_table import SharedQuoteTable
+
+
+def _quote(ltp, prev_close=100.0):
+    return {"ltp": ltp, "open": 100.0, "high": 110.0, "low": 90.0, "prev_close": prev_close, "volume": 1000}
+
+
+@pytest.fixture
+def table():
+    t = SharedQuoteTable(f"qt-test-{os.getpid()}-{uuid.uuid4().hex[:8]}", capacity=16, create=True)
+    yield t
+    t.close()
+
+
+def test_publish_and_read(table):
+    table.publish({"ABC": _quote(101.0), "XYZ": _quote(55.5, prev_close=None)}, version=3, updated=12.5)
+    version, updated, quotes = table.read()
+    assert (version, updated) == (3, 12.5)
+    assert quotes["ABC"]["ltp"] == 101.0
+    assert quotes["XYZ"]["prev_close"] is None
+    assert table.read(since_version=3) is None
+
+
+def test_meta_and_bump(table):
+    table.publish({"ABC": _quote(1.0)}, version=1, updated=5.0)
+    table.heartbeat(9.0)
+    table.bump("ref_version")
+    assert table.meta() == (1, 9.0, 1, 0)
+
+
+def test_reader_retries_while_writer_active(table):
+    table.publish({"ABC": _quote(1.0)}, version=1)
+    table.header["seq"] += 1  # writer mid-publish
+    with pytest.raises(TimeoutError):
+        table.read(retries=3)
+    table.header["seq"] += 1
+    assert table.read()[0] == 1
+
+
+def test_concurrent_writers_never_tear(table):
+    stop = threading.Event()
+
+    def writer(base):
+        v = 0
+        while not stop.is_set():
+            v += 1
+            table.publish({f"S{i}": _quote(base) for i in range(16)}, version=base * 1_000_000 + v)
+
+    threads = [threading.Thread(target=writer, args=(b,)) for b in (1, 2)]
+    for t in threads:
+        t.start()
+    try:
+        for _ in range(500):
+            try:
+                _, _, quotes = table.read(retries=10_000)
+            except TimeoutError:
+                continue
+            assert len({q["ltp"] for q in quotes.values()}) == 1
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+import mstock_client
+from mstock_client import BrokerUnavailable, MStockClient, RateGovernor, _is_outage, _is_rate_limited, _status_code
+
+
+def test_higher_classes_go_first():
+    governor = RateGovernor(rate=4, class_rates={}, burst=1)
+    governor.acquire("bulk")  # empty the session bucket
+    served = []
+
+    def call(cls):
+        governor.acquire(cls)
+        served.append(cls)
+
+    threads = [threading.Thread(target=call, args=(cls,)) for cls in ("bulk", "candle", "account", "quote", "order")]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 2
+    while sum(governor.waiting.values()) < 5 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    for t in threads:
+        t.join(timeout=5)
+    assert served == ["order", "quote", "candle", "account", "bulk"]
+
+
+def test_class_rate_limits_only_its_class():
+    governor = RateGovernor(rate=0, class_rates={"candle": 1})
+    governor.acquire("candle")
+    with pytest.raises(mstock_client.RateLimited):
+        governor.acquire("candle", max_wait=0.05)
+    assert governor.acquire("quote", max_wait=0.05) < 0.05
+
+
+def test_rate_limit_halves_rate_then_recovers():
+    governor = RateGovernor(rate=10, class_rates={}, min_fraction=0.1, recovery=1.0)
+    governor.throttled("quote")
+    assert governor.rate == 5.0 and governor.session.tokens == 0.0
+    governor.throttled("quote")  # same burst: no second cut
+    assert governor.rate == 5.0
+
+    governor._recovered_at -= 0.25
+    governor._recover(time.monotonic())
+    assert governor.rate == pytest.approx(7.5, abs=0.1)
+    governor._recovered_at -= 1.0
+    governor._recover(time.monotonic())
+    assert governor.rate == 10.0
+
+
+def test_rate_cut_stops_at_min_fraction():
+    governor = RateGovernor(rate=10, class_rates={}, min_fraction=0.1)
+    for _ in range(6):
+        governor._cut_at = 0.0
+        governor.throttled("quote")
+    assert governor.rate == 1.0 and governor.throttles == 6
+
+
+class _Response:
+    status_code = 429
+
+
+class _HTTPError(Exception):
+    def __init__(self, message, status=None, response=None):
+        super().__init__(message)
+        if status is not None:
+            self.status = status
+        if response is not None:
+            self.response = response
+
+
+@pytest.mark.parametrize("error, code", [
+    (_HTTPError("throttled", status=429), 429),
+    (_HTTPError("throttled", response=_Response()), 429),
+    (Exception("429 Too Many Requests"), 429),
+    (Exception("HTTP 400 Bad Request"), 400),
+    (Exception("Request failed, status: 503"), 503),
+    (Exception("status code=400 invalid quantity"), 400),
+    (Exception("read timed out (timeout=4000)"), None),
+    (Exception("order 400123 not found"), None),
+])
+def test_status_code_shapes(error, code):
+    assert _status_code(error) == code
+
+
+def test_error_classification():
+    assert _is_rate_limited(Exception("429 Too Many Requests"))
+    assert _is_rate_limited(Exception("Rate limit exceeded"))
+    assert not _is_rate_limited(Exception("status: 503"))
+    assert not _is_outage(Exception("HTTP 400 Bad Request"))
+    assert not _is_outage(Exception("Insufficient funds"))
+    assert _is_outage(ConnectionError("connection reset; timeout=4000"))
+    assert _is_outage(Exception("status: 503"))
+
+
+class _Broker:
+    def get_fund_summary(self):
+        return {"available": 1000.0, "utilized": 10.0}
+
+    def get_ltp(self, symbols):
+        return {"NSE:ABC": 1.0}
+
+    def get_orderbook(self):
+        return []
+
+
+@pytest.fixture
+def client(monkeypatch):
+    c = MStockClient()
+    c.client, c.is_connected = _Broker(), True
+    classes = []
+    monkeypatch.setattr(c.governor, "acquire", lambda cls, max_wait=None: classes.append(cls) or 0.0)
+    return c, classes
+
+
+def test_methods_are_paced_in_their_class(client):
+    c, classes = client
+    assert c.get_margin() == (1000.0, 10.0)
+    c.get_data([{"exchange": "NSE", "token": "ABC"}])
+    c._sdk("get_orderbook")
+    assert classes == ["account", "quote", "bulk"]
+
+
+def test_open_breaker_refuses_before_taking_a_token(client):
+    c, classes = client
+    for _ in range(c.breaker.failure_threshold):
+        c.breaker.record_failure()
+    with pytest.raises(BrokerUnavailable):
+        c._sdk("get_ltp", [])
+    assert classes == []
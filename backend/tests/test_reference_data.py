@@ -0,0 +1,71 @@
+import random
+from datetime import date, datetime, timedelta
+
+from reference_data import AVG_VOLUME_SESSIONS, WEEK52_SESSIONS, ReferenceData, summarize
+
+TODAY = date(2026, 10, 19)
+
+
+def _candle(day, high, low, close, volume, ms=True):
+    ts = datetime(day.year, day.month, day.day, 9, 15).timestamp()
+    return {"ts": ts * 1000 if ms else ts, "open": close, "high": high, "low": low, "close": close, "volume": volume}
+
+
+def _history(sessions):
+    """One candle per day up to yesterday; the oldest day has the extreme range."""
+    days = [TODAY - timedelta(days=sessions - i) for i in range(sessions)]
+    return [_candle(d, 200.0 + i if i == 0 else 110.0 + i * 0.01, 10.0 if i == 0 else 90.0,
+                    100.0 + i, 1000 * (i + 1)) for i, d in enumerate(days)]
+
+
+def test_uses_only_completed_sessions():
+    candles = [_candle(TODAY - timedelta(days=2), 105, 95, 100, 10), _candle(TODAY - timedelta(days=1), 110, 98, 108, 30),
+               _candle(TODAY, 500, 1, 300, 999)]
+    row = summarize(candles, TODAY)
+    assert row["prev_close"] == 108 and row["prev_date"] == (TODAY - timedelta(days=1)).isoformat()
+    assert (row["week52_high"], row["week52_low"], row["avg_volume"]) == (110, 95, 20.0)
+    assert summarize([_candle(TODAY, 1, 1, 1, 1)], TODAY) is None
+    assert summarize([], TODAY) is None
+
+
+def test_52_week_and_volume_windows():
+    history = _history(WEEK52_SESSIONS + 1)
+    row = summarize(history, TODAY)
+    # The oldest session (high 200, low 10) falls out of the 252-session window
+    assert row["week52_high"] < 200 and row["week52_low"] == 90.0
+    assert summarize(history[1:] + history[:1], TODAY)["week52_high"] == row["week52_high"]
+    recent = [c["volume"] for c in history[-AVG_VOLUME_SESSIONS:]]
+    assert row["avg_volume"] == round(sum(recent) / AVG_VOLUME_SESSIONS, 1)
+
+    assert summarize(_history(WEEK52_SESSIONS), TODAY)["week52_high"] == 200.0
+
+
+def test_order_timestamp_units_and_bad_rows():
+    candles = [_candle(TODAY - timedelta(days=1), 110, 98, 108, 30, ms=False),
+               _candle(TODAY - timedelta(days=3), 105, 95, 100, 10),
+               {"ts": "bad", "high": 1, "low": 1, "close": 1}, {"ts": 0}]
+    random.Random(1).shuffle(candles)
+    row = summarize(candles, TODAY, shares=1_000)
+    assert row["prev_close"] == 108 and row["market_cap"] == 108_000
+    assert summarize(candles, TODAY)["market_cap"] is None
+
+
+def test_build_fetches_only_missing_and_persists(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path))
+    fetched = []
+
+    def fetch(symbol):
+        fetched.append(symbol)
+        if symbol == "NSE:BAD":
+            raise ConnectionError("down")
+        return _history(30)
+
+    ref = ReferenceData()
+    assert ref.build(["NSE:A", "NSE:B", "NSE:A", "NSE:BAD"], fetch, today=TODAY) == 2
+    assert ref.build(["NSE:A"], fetch, today=TODAY) == 0
+    assert fetched == ["NSE:A", "NSE:B", "NSE:BAD"]
+    assert ref.missing(["NSE:A", "NSE:BAD"], today=TODAY) == ["NSE:BAD"]
+    assert ref.missing(["NSE:A"], today=TODAY + timedelta(days=1)) == ["NSE:A"]
+
+    reloaded = ReferenceData()
+    assert reloaded.get("NSE:A") == ref.get("NSE:A") and reloaded.get("NSE:A")["as_of"] == TODAY.isoformat()
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from screener import VOLUME_MIN_SAMPLES, Screener
+
+
+def _q(ltp, prev_close=100.0, open_=None, volume=1000):
+    return {"ltp": ltp, "open": open_ if open_ is not None else ltp, "prev_close": prev_close, "volume": volume}
+
+
+def test_gainers_and_losers_rank_by_change():
+    s = Screener()
+    s.update({"A": _q(105.0), "B": _q(110.0), "C": _q(95.0), "D": _q(100.0), "E": _q(90.0, prev_close=None, open_=100.0)})
+    assert [r["symbol"] for r in s.scan("gainers")] == ["B", "A"]
+    assert [r["symbol"] for r in s.scan("losers")] == ["E", "C"]
+    assert s.scan("gainers")[0] == {"symbol": "B", "ltp": 110.0, "change": 10.0, "volume": 1000, "value": 10.0}
+
+
+def test_top_n_matches_a_full_sort():
+    rng = np.random.default_rng(3)
+    prices = rng.uniform(80, 120, 500)
+    s = Screener(capacity=8)  # grows as rows arrive
+    s.update({f"S{i}": _q(float(p)) for i, p in enumerate(prices)})
+    expected = [f"S{i}" for i in np.argsort(-prices) if prices[i] > 100][:25]
+    assert [r["symbol"] for r in s.scan("gainers", limit=25)] == expected
+
+
+def test_filters_are_masks():
+    s = Screener()
+    s.update({"A": _q(105.0, volume=10), "B": _q(1100.0, prev_close=1000.0), "C": _q(52.0, prev_close=50.0)})
+    assert [r["symbol"] for r in s.scan("gainers", min_price=60)] == ["B", "A"]
+    assert [r["symbol"] for r in s.scan("gainers", max_price=500)] == ["A", "C"]
+    assert [r["symbol"] for r in s.scan("gainers", min_volume=100)] == ["B", "C"]
+    assert [r["symbol"] for r in s.scan("gainers", symbols=["C", "missing"])] == ["C"]
+
+
+def test_only_symbols_in_the_latest_snapshot_are_ranked():
+    s = Screener()
+    s.update({"A": _q(105.0), "B": _q(110.0)})
+    first = s.scan("gainers")
+    assert s.scan("gainers") is first  # cached until the data changes
+    s.update({"A": _q(105.0)})
+    assert [r["symbol"] for r in s.scan("gainers")] == ["A"]
+
+
+def test_volume_spike_waits_for_warm_up():
+    s = Screener()
+    volume = 0
+    # The first snapshot is a sample too: it sets the baseline
+    for _ in range(VOLUME_MIN_SAMPLES - 1):
+        volume += 100
+        s.update({"A": _q(100.0, volume=volume)})
+        assert s.scan("volume_spike") == []
+    volume += 1000
+    s.update({"A": _q(100.0, volume=volume)})
+    spike = s.scan("volume_spike")
+    # The average already includes this delta: 100 + 0.1 * (1000 - 100)
+    assert [r["symbol"] for r in spike] == ["A"] and spike[0]["value"] == round(1000 / 190, 4)
+
+
+def test_volume_state_round_trip():
+    s = Screener()
+    for v in (100, 200, 300):
+        s.update({"A": _q(100.0, volume=v)})
+    restored = Screener()
+    restored.restore_volume_state(s.volume_state())
+    assert restored.volume_state() == s.volume_state()
+
+
+def test_reference_columns_drive_52w_gap_and_relative_volume():
+    s = Screener()
+    s.update({"A": _q(98.0, prev_close=50.0, open_=102.0, volume=3000), "B": _q(60.0, prev_close=50.0, open_=50.0)})
+    s.set_reference({"A": {"prev_close": 100.0, "week52_high": 100.0, "week52_low": 70.0, "avg_volume": 1000},
+                     "B": {"prev_close": 50.0, "week52_high": 120.0, "week52_low": 40.0}})
+    assert s.scan("near_52w_high")[0] == {"symbol": "A", "ltp": 98.0, "change": -2.0, "volume": 3000, "value": 2.0}
+    assert [r["symbol"] for r in s.scan("gap_up")] == ["A"]
+    assert [(r["symbol"], r["value"]) for r in s.scan("relative_volume")] == [("A", 3.0)]
+
+
+def test_unknown_scan():
+    with pytest.raises(ValueError):
+        Screener().scan("nope")
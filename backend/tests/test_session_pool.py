@@ -0,0 +1,91 @@
+import time
+
+from session_pool import SessionPool
+
+
+class _Client:
+    def __init__(self, fail=False, as_list=False):
+        self.is_connected = True
+        self.fail = fail
+        self.as_list = as_list
+        self.requests = []
+
+    def get_data_smart(self, symbols, mode="full"):
+        self.requests.append(list(symbols))
+        if self.fail:
+            raise ConnectionError("reset")
+        if self.as_list:
+            return [{"symbol": s, "ltp": 1.0} for s in symbols], "plain_strings"
+        return {s: {"ltp": 1.0} for s in symbols}, "exchange_symbol"
+
+
+def _pool(*clients, **kw):
+    pool = SessionPool(**kw)
+    for i, client in enumerate(clients):
+        pool.add(f"acct{i}", client)
+    return pool
+
+
+SYMBOLS = [f"NSE:S{i}" for i in range(40)]
+
+
+def test_shards_cover_every_symbol_once_and_are_stable():
+    pool = _pool(_Client(), _Client(), _Client())
+    shards = pool.shard(SYMBOLS)
+    assert sorted(s for _, part in shards for s in part) == sorted(SYMBOLS)
+    assert len(shards) == 3
+    again = {sess.account: part for sess, part in pool.shard(list(reversed(SYMBOLS)))}
+    assert {sess.account: sorted(part) for sess, part in shards} == {a: sorted(p) for a, p in again.items()}
+
+
+def test_get_quotes_fetches_shards_in_parallel_and_merges():
+    clients = [_Client(), _Client(as_list=True)]
+    pool = _pool(*clients)
+    quotes, fmt = pool.get_quotes(SYMBOLS)
+    assert set(quotes) == set(SYMBOLS)
+    assert fmt == "mixed"
+    assert all(c.requests for c in clients)
+
+
+def test_failed_shard_is_retried_on_another_session():
+    bad, good = _Client(fail=True), _Client()
+    pool = _pool(bad, good, max_failures=3)
+    quotes, _ = pool.get_quotes(SYMBOLS)
+    assert set(quotes) == set(SYMBOLS)
+    assert sorted(s for r in good.requests for s in r) == sorted(SYMBOLS)
+    assert pool.sessions["acct0"].failures == 1
+
+
+def test_session_cools_down_after_max_failures_then_gets_one_trial():
+    bad, good = _Client(fail=True), _Client()
+    pool = _pool(bad, good, max_failures=2, cooldown=60)
+    pool.get_quotes(SYMBOLS)
+    pool.get_quotes(SYMBOLS)
+    assert [s.account for s in pool.healthy()] == ["acct1"]
+    assert pool.client_for("acct0") is None
+
+    # Cooldown over: one more failure sends it straight back
+    pool.sessions["acct0"].cooldown_until = time.time() - 1
+    assert len(pool.healthy()) == 2
+    pool.get_quotes(SYMBOLS)
+    assert [s.account for s in pool.healthy()] == ["acct1"]
+
+    bad.fail = False
+    pool.sessions["acct0"].cooldown_until = time.time() - 1
+    pool.get_quotes(SYMBOLS)
+    assert pool.sessions["acct0"].failures == 0 and len(pool.healthy()) == 2
+
+
+def test_disconnected_sessions_leave_rotation():
+    a, b = _Client(), _Client()
+    pool = _pool(a, b)
+    b.is_connected = False
+    assert [s.account for s in pool.healthy()] == ["acct0"]
+    assert pool.client_for("acct0") is a and pool.client_for("acct1") is None
+    quotes, fmt = pool.get_quotes(SYMBOLS)
+    assert set(quotes) == set(SYMBOLS) and not b.requests
+
+
+def test_no_sessions_is_an_error():
+    assert SessionPool().get_quotes(SYMBOLS) == ({}, "error")
+    assert _pool(_Client(fail=True), max_failures=5).get_quotes(SYMBOLS) == ({}, "error")
@@ -0,0 +1,58 @@
+import gzip
+import json
+
+from snapshot_cache import SnapshotCache
+
+
+def _cache(**kw):
+    return SnapshotCache(lambda quotes, view: [{"symbol": s, **q} for s, q in sorted(quotes.items())
+                                               if view is None or s in view], **kw)
+
+
+def test_version_moves_only_on_change():
+    cache = _cache()
+    assert not cache.update({})
+    assert cache.update({"ABC": {"ltp": 1.0}})
+    assert not cache.update({"ABC": {"ltp": 1.0}})
+    assert cache.update({"ABC": {"ltp": 2.0}})
+    assert cache.version == 2
+    assert not cache.update({"ABC": {"ltp": 3.0}}, version=2)
+    assert cache.update({"ABC": {"ltp": 3.0}}, version=9) and cache.version == 9
+
+
+def test_etag_round_trip_gets_304():
+    cache = _cache()
+    cache.update({"ABC": {"ltp": 1.0}})
+    enc = cache.encoded()
+    assert cache.encoded() is enc
+    status, body, headers = cache.negotiate(enc, None, None)
+    assert status == 200 and json.loads(body) == [{"symbol": "ABC", "ltp": 1.0}]
+
+    status, body, _ = cache.negotiate(enc, headers["ETag"], None)
+    assert (status, body) == (304, b"")
+
+    cache.update({"ABC": {"ltp": 2.0}})
+    fresh = cache.encoded()
+    assert fresh.etag != enc.etag
+    assert cache.negotiate(fresh, headers["ETag"], None)[0] == 200
+
+
+def test_views_have_distinct_tags():
+    cache = _cache()
+    cache.update({"ABC": {"ltp": 1.0}, "XYZ": {"ltp": 2.0}})
+    full, view = cache.encoded(), cache.encoded(("XYZ",))
+    assert full.etag != view.etag
+    assert json.loads(view.body) == [{"symbol": "XYZ", "ltp": 2.0}]
+
+
+def test_gzip_only_above_threshold():
+    cache = _cache(gzip_min_bytes=64)
+    cache.update({"ABC": {"ltp": 1.0}})
+    small = cache.encoded()
+    assert "Content-Encoding" not in cache.negotiate(small, None, "gzip")[2]
+
+    cache.update({f"S{i}": {"ltp": float(i)} for i in range(20)})
+    large = cache.encoded()
+    status, body, headers = cache.negotiate(large, None, "gzip, deflate")
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body) == large.body
@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+
+from auto_trade import MarketTick, StrategySignal, TickBatch, simple_breakout_strategy
+from strategy_pool import StrategyPool, shard_of
+
+# Strategies are module-level so spawned workers can import them by name
+
+
+def pid_strategy(tick):
+    """Signals every row and reports which process evaluated it; ltp picks a failure mode."""
+    if tick.ltp == -1:
+        os._exit(1)
+    if tick.ltp == -2:
+        time.sleep(5)
+    if tick.ltp == -3:
+        raise ValueError("bad tick")
+    return StrategySignal(token=tick.token, signal="BUY", reason=str(os.getpid()))
+
+
+def _batch(prices):
+    return TickBatch.from_quotes({s: {"ltp": p, "open": 1.0, "high": 100.0, "low": 1.0, "volume": 1}
+                                  for s, p in prices.items()}, 1000.0)
+
+
+SYMBOLS = [f"NSE:S{i}" for i in range(12)]
+
+
+@pytest.fixture
+def pool():
+    pools = []
+
+    def make(strategy, **kw):
+        p = StrategyPool(strategy, **kw)
+        pools.append(p)
+        return p
+
+    yield make
+    for p in pools:
+        p.close()
+
+
+def test_pool_matches_in_process_evaluation(pool):
+    batch = _batch({s: 99.8 if i % 3 else 50.0 for i, s in enumerate(SYMBOLS)})
+    expected = [(i, s.signal) for i, s in simple_breakout_strategy.batch(batch)]
+    got = pool(simple_breakout_strategy, workers=3).batch(batch)
+    assert [(i, s.signal) for i, s in got] == expected
+    assert all(s.token == batch.token(i) for i, s in got)
+
+
+def test_symbols_stay_on_their_shard(pool):
+    p = pool(pid_strategy, workers=3)
+    first = {s.token: s.reason for _, s in p.batch(_batch({s: 1.0 for s in SYMBOLS}))}
+    again = {s.token: s.reason for _, s in p.batch(_batch({s: 2.0 for s in reversed(SYMBOLS)}))}
+    assert first == again
+    for a in SYMBOLS:
+        for b in SYMBOLS:
+            assert (first[a] == first[b]) == (shard_of(a, 3) == shard_of(b, 3))
+    assert p.to_dict()["symbols"] == len(SYMBOLS) and p.to_dict()["alive"] == 3
+
+
+def test_dead_worker_is_restarted_and_its_shard_skipped(pool):
+    p = pool(pid_strategy, workers=2, timeout=2.0)
+    victim = SYMBOLS[0]
+    prices = {s: 1.0 for s in SYMBOLS}
+    prices[victim] = -1
+    got = {s.token for _, s in p.batch(_batch(prices))}
+    assert p.restarts == 1
+    assert got == {s for s in SYMBOLS if shard_of(s, 2) != shard_of(victim, 2)}
+    assert {s.token for _, s in p.batch(_batch({s: 1.0 for s in SYMBOLS}))} == set(SYMBOLS)
+
+
+def test_slow_worker_times_out_and_is_restarted(pool):
+    p = pool(pid_strategy, workers=1, timeout=0.5)
+    assert p.batch(_batch({"NSE:SLOW": -2})) == []
+    assert p.restarts == 1
+    assert [s.token for _, s in p.batch(_batch({"NSE:OK": 1.0}))] == ["NSE:OK"]
+
+
+def test_strategy_error_drops_the_shard_without_restart(pool):
+    p = pool(pid_strategy, workers=1)
+    assert p.batch(_batch({"NSE:A": -3, "NSE:B": 1.0})) == []
+    assert p.restarts == 0
+
+
+def test_per_tick_fallback_runs_in_process(pool):
+    p = pool(pid_strategy, workers=1)
+    tick = MarketTick(token="NSE:A", ltp=1.0, open=1.0, high=1.0, low=1.0, volume=1, timestamp=0.0)
+    assert p(tick).reason == str(os.getpid())
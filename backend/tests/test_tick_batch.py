@@ -0,0 +1,60 @@
+from auto_trade import (MarginSnapshot, MarketTick, NotifyAutoBuyEngine, TickBatch, TokenAutoBuyConfig,
+                        simple_breakout_strategy, token_id, token_name)
+
+QUOTES = {
+    "NSE:AAA": {"ltp": 99.9, "open": 95.0, "high": 100.0, "low": 94.0, "volume": 1000},
+    "NSE:BBB": {"ltp": 50.0, "open": 52.0, "high": 55.0, "low": 49.0, "volume": None},
+    "NSE:CCC": {"ltp": 10.0, "open": 9.0, "high": 10.0, "low": 8.5, "volume": 5},
+}
+
+
+def _ticks(quotes, ts):
+    return [MarketTick(token=s, ltp=q["ltp"], open=q["open"], high=q["high"], low=q["low"],
+                       volume=q["volume"] or 0, timestamp=ts) for s, q in quotes.items()]
+
+
+def test_from_quotes_rows_match_ticks():
+    batch = TickBatch.from_quotes(QUOTES, 1000.0)
+    assert len(batch) == 3
+    assert [row.to_tick() for row in batch] == _ticks(QUOTES, 1000.0)
+    assert list(batch.volume) == [1000, 0, 5]
+    assert batch.token(1) == "NSE:BBB" == batch.row(1).token
+
+
+def test_append_and_token_ids_are_shared():
+    batch = TickBatch()
+    batch.append("NSE:AAA", 1.0, 1.0, 1.0, 1.0, 7, 5.0)
+    assert batch.token_id[0] == token_id("NSE:AAA")
+    assert token_name(token_id("NSE:AAA")) == "NSE:AAA"
+    row = batch.row(0)
+    assert (row.ltp, row.volume, row.timestamp) == (1.0, 7, 5.0)
+
+
+def test_batch_strategy_matches_per_tick_strategy():
+    batch = TickBatch.from_quotes(QUOTES, 1000.0)
+    by_batch = {(batch.token(i), sig.signal) for i, sig in simple_breakout_strategy.batch(batch)}
+    by_tick = {(t.token, s.signal) for t in _ticks(QUOTES, 1000.0)
+               for s in [simple_breakout_strategy(t)] if s.signal != "NONE"}
+    assert by_batch == by_tick == {("NSE:AAA", "BUY"), ("NSE:CCC", "BUY")}
+
+
+def _run_engine(ticks):
+    sent, orders = [], []
+    engine = NotifyAutoBuyEngine(
+        token_config=[TokenAutoBuyConfig("NSE:AAA", autobuy=True, quantity=2)],
+        get_latest_ticks=lambda: ticks,
+        get_margin=lambda: MarginSnapshot(available=1_000.0),
+        send_notification=lambda kind, payload: sent.append((kind, payload["token"])),
+        place_buy_order=lambda token, qty: (orders.append((token, qty)) or True, "ID1"),
+    )
+    engine.step()
+    return sent, orders, engine
+
+
+def test_engine_treats_batch_and_ticks_alike():
+    batch_run = _run_engine(TickBatch.from_quotes(QUOTES, 1000.0))
+    tick_run = _run_engine(_ticks(QUOTES, 1000.0))
+    assert batch_run[:2] == tick_run[:2]
+    assert batch_run[1] == [("NSE:AAA", 2)]
+    assert batch_run[2].evaluated == tick_run[2].evaluated == set(QUOTES)
+    assert batch_run[2].signals == {"NSE:AAA": "BUY", "NSE:CCC": "BUY"}
@@ -0,0 +1,69 @@
+import glob
+import os
+from datetime import datetime
+
+import pytest
+
+from tick_recorder import RECORD, TickRecorder, TickReplayer, open_segment
+
+
+def _quote(ltp, prev_close=100.0, volume=10):
+    return {"ltp": ltp, "open": 100.0, "high": 110.0, "low": 90.0, "prev_close": prev_close, "volume": volume}
+
+
+def _record(directory, snapshots, **kw):
+    recorder = TickRecorder(directory=str(directory), **kw)
+    recorder.start()
+    for ts, quotes in snapshots:
+        recorder.record(quotes, ts=ts)
+    recorder.stop()
+    return sorted(glob.glob(os.path.join(str(directory), "*.bin")))
+
+
+def _at(hh, mm, ss=0):
+    return datetime(2026, 10, 19, hh, mm, ss).timestamp()
+
+
+def test_record_replay_round_trip(tmp_path):
+    snapshots = [
+        (_at(10, 0), {"NSE:ABC": _quote(101.0), "NSE:XYZ": _quote(55.5, prev_close=None)}),
+        (_at(10, 1), {"NSE:XYZ": _quote(56.0, volume=20)}),
+        (_at(10, 2), {"NSE:ABC": _quote(102.5), "NSE:NEW": _quote(9.0)}),
+    ]
+    paths = _record(tmp_path, snapshots)
+    assert len(paths) == 1
+    records, symbols = open_segment(paths[0])
+    assert len(records) == 5 and symbols == ["NSE:ABC", "NSE:XYZ", "NSE:NEW"]
+    assert list(TickReplayer(paths).snapshots()) == snapshots
+
+
+def test_time_window_and_torn_record(tmp_path):
+    snapshots = [(_at(9, 59), {"A": _quote(1.0)}), (_at(10, 0), {"A": _quote(2.0)}), (_at(10, 6), {"A": _quote(3.0)})]
+    paths = _record(tmp_path, snapshots)
+    with open(paths[0], "ab") as f:
+        f.write(b"\0" * (RECORD.size // 2))
+    assert len(open_segment(paths[0])[0]) == 3
+    replayed = list(TickReplayer(paths, start="10:00", end="10:05").snapshots())
+    assert [q["A"]["ltp"] for _, q in replayed] == [2.0]
+
+
+def test_segments_rotate_by_size(tmp_path):
+    snapshots = [(_at(10, 0, s), {f"S{i}": _quote(float(s)) for i in range(4)}) for s in range(6)]
+    paths = _record(tmp_path, snapshots, max_bytes=RECORD.size * 8)
+    assert len(paths) > 1
+    assert [ts for ts, _ in TickReplayer(paths).snapshots()] == [ts for ts, _ in snapshots]
+
+
+def test_disabled_recorder_writes_nothing(tmp_path):
+    assert _record(tmp_path, [(_at(10, 0), {"A": _quote(1.0)})], enabled=False) == []
+
+
+@pytest.mark.parametrize("value, speed", [("max", None), (None, None), ("0", None), ("10x", 10.0), ("1", 1.0)])
+def test_parse_speed(value, speed):
+    assert TickReplayer.parse_speed(value) == speed
+
+
+def test_delay_scales_with_speed():
+    assert TickReplayer([], speed=10).delay(100.0, 105.0) == 0.5
+    assert TickReplayer([], speed=10).delay(None, 105.0) == 0.0
+    assert TickReplayer([], speed=None).delay(100.0, 105.0) == 0.0
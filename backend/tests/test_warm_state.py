@@ -0,0 +1,32 @@
+import gzip
+import json
+import time
+
+from warm_state import WarmState
+
+
+def test_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path))
+    sections = {"quotes": {"ABC": {"ltp": 1.5}}, "orders": [{"key": "k1"}], "signals": [["ABC", "BUY", 1.0, 2.0]]}
+    state = WarmState()
+    assert state.save(sections)
+    assert not state.save(sections)
+    assert WarmState().load(max_age=60) == sections
+
+
+def test_missing_old_and_corrupt_snapshots_are_ignored(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path))
+    state = WarmState()
+    assert state.load(max_age=60) is None
+
+    state.save({"quotes": {}})
+    with open(state.path, "rb") as f:
+        stored = json.loads(gzip.decompress(f.read()))
+    stored["saved"] = time.time() - 3600
+    with open(state.path, "wb") as f:
+        f.write(gzip.compress(json.dumps(stored).encode()))
+    assert state.load(max_age=60) is None
+
+    with open(state.path, "wb") as f:
+        f.write(b"not gzip")
+    assert state.load(max_age=60) is None
@@ -0,0 +1,62 @@
+import time
+
+from watchlists import SubscriptionRegistry, WatchlistStore, normalize_symbol
+
+
+def test_symbols_are_refcounted_across_owners():
+    reg = SubscriptionRegistry()
+    assert reg.subscribe("ui:default", ["NSE:A", "NSE:B"])
+    assert not reg.subscribe("autobuy", ["NSE:B"])
+    assert set(reg.symbols()) == {"NSE:A", "NSE:B"}
+
+    reg.unsubscribe("ui:default")
+    assert reg.symbols() == ("NSE:B",)
+    reg.unsubscribe("autobuy")
+    assert reg.symbols() == () and not reg.has("autobuy")
+
+
+def test_version_moves_only_when_the_union_changes():
+    reg = SubscriptionRegistry()
+    reg.subscribe("a", ["NSE:A"])
+    version = reg.version
+    assert not reg.subscribe("a", ["NSE:A"])
+    assert not reg.subscribe("b", ["NSE:A"])
+    assert reg.version == version
+
+    assert not reg.subscribe("b", [])  # A still held by owner a
+    assert reg.version == version
+    reg.subscribe("a", ["NSE:C"])
+    assert reg.version == version + 1 and reg.symbols() == ("NSE:C",)
+
+
+def test_leases_expire_and_renew():
+    reg = SubscriptionRegistry()
+    reg.subscribe("ui:x", ["NSE:A"], ttl=10)
+    reg.subscribe("ui:y", ["NSE:B"], ttl=10)
+    reg.subscribe("exits", ["NSE:A"])
+    assert reg.renew("ui:y", 100)
+    assert not reg.renew("ui:missing", 100)
+
+    assert reg.expire(now=time.time() + 50) == ["ui:x"]
+    assert set(reg.symbols()) == {"NSE:A", "NSE:B"}
+    assert set(reg.leased()) == {"ui:y"}
+    assert reg.expire(now=time.time() + 200) == ["ui:y"]
+    assert reg.symbols() == ("NSE:A",)
+
+
+def test_normalize_symbol():
+    assert normalize_symbol(" infy ") == "NSE:INFY"
+    assert normalize_symbol("nfo:nifty25dec24500ce") == "NFO:NIFTY25DEC24500CE"
+
+
+def test_store_saves_normalized_lists_with_revisions(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path))
+    store = WatchlistStore(seed=["NSE:INFY"])
+    assert store.get("default") == ["NSE:INFY"] and store.revision("default") == 1
+    assert store.save("swing", ["tcs", "NSE:TCS", " ", "nse:infy"]) == ["NSE:TCS", "NSE:INFY"]
+    store.save("swing", ["tcs"])
+    assert store.revision("swing") == 2
+
+    reopened = WatchlistStore()
+    assert reopened.names() == ["default", "swing"] and reopened.get("swing") == ["NSE:TCS"]
+    assert reopened.delete("swing") and not reopened.delete("swing")
@@ -0,0 +1,326 @@
+"""
+Tick Recorder and Replay
+
+Every normalized quote snapshot (see market_data.normalize_quotes) is appended
+to a compact binary log so production behaviour can be reproduced later.
+
+Segment layout (little endian):
+  header  16 bytes   b'TICKLOG1' + uint32 record size + uint32 reserved
+  records 64 bytes   ts f8 | symbol id u4 | pad 4 | ltp, open, high, low, prev_close f8 | volume i8
+A sidecar '<segment>.symbols' file lists one symbol per line; the line number is
+the symbol id. Fixed-size records let replay map a segment straight into a
+NumPy structured array without parsing.
+
+Recording is off the hot path: record() only enqueues the snapshot dict and a
+background thread packs and writes it. Segments rotate by size and by day.
+
+Usage:
+  python tick_recorder.py replay <segment.bin>... [--speed max|1|10] [--start 10:00] [--end 10:05]
+                                 [--selection autobuy.json]
+Replays the logs through NotifyAutoBuyEngine (orders are simulated) and prints
+every notification, e.g. to answer "why did auto-buy fire on INFY at 10:02?".
+The API can replay the same logs by starting the backend with
+TICK_REPLAY=<glob> and TICK_REPLAY_SPEED=max|N.
+"""
+import argparse
+import glob
+import json
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b'TICKLOG1'
+HEADER = struct.Struct('<8sII')
+RECORD = struct.Struct('<dI4x5dq')
+RECORD_DTYPE = np.dtype([
+    ('ts', '<f8'), ('sym', '<u4'), ('_pad', 'V4'),
+    ('ltp', '<f8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('prev_close', '<f8'),
+    ('volume', '<i8'),
+])
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+DEFAULT_DIR = os.path.join(os.getenv('LOCALAPPDATA', os.path.expanduser('~')), 'AntigravityTrader', 'ticks')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class TickRecorder:
+    """Append-only, rotating binary log of quote snapshots."""
+
+    def __init__(self, directory: str = DEFAULT_DIR, max_bytes: int = DEFAULT_MAX_BYTES, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Tuple[float, Dict[str, Dict]]]]" = queue.Queue(maxsize=10_000)
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._sym_file = None
+        self._sym_ids: Dict[str, int] = {}
+        self._day = None
+        self._size = 0
+        self.current_path: Optional[str] = None
+
+    def start(self):
+        if not self.enabled or self._thread:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="tick-recorder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._close_segment()
+
+    def record(self, quotes: Dict[str, Dict], ts: Optional[float] = None) -> None:
+        """Hot path: enqueue only. Drops (and counts) snapshots if the writer falls behind."""
+        if not self.enabled or not quotes:
+            return
+        try:
+            self._queue.put_nowait((ts if ts is not None else time.time(), quotes))
+        except queue.Full:
+            self.dropped += 1
+
+    # -- writer thread -----------------------------------------------------
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write(*item)
+                # Drain whatever queued up meanwhile before flushing once
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self._flush()
+                        return
+                    self._write(*item)
+                self._flush()
+            except Exception as e:
+                print(f"Tick recorder write error: {e}")
+
+    def _flush(self):
+        if self._file:
+            self._file.flush()
+
+    def _close_segment(self):
+        for f in (self._file, self._sym_file):
+            if f:
+                try:
+                    f.close()
+                except Exception:
+                    pass
+        self._file = self._sym_file = None
+
+    def _open_segment(self, ts: float):
+        self._close_segment()
+        stamp = datetime.fromtimestamp(ts)
+        base = os.path.join(self.directory, f"ticks-{stamp:%Y%m%d-%H%M%S}")
+        path = base + ".bin"
+        n = 1
+        while os.path.exists(path):
+            path = f"{base}-{n}.bin"
+            n += 1
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, RECORD.size, 0))
+        self._sym_file = open(path + ".symbols", 'w', encoding='utf-8')
+        self._sym_ids = {}
+        self._day = stamp.date()
+        self._size = HEADER.size
+        self.current_path = path
+
+    def _write(self, ts: float, quotes: Dict[str, Dict]):
+        if (self._file is None or self._size >= self.max_bytes
+                or datetime.fromtimestamp(ts).date() != self._day):
+            self._open_segment(ts)
+        buf = bytearray(RECORD.size * len(quotes))
+        new_syms = []
+        off = 0
+        nan = float('nan')
+        for sym, q in quotes.items():
+            sid = self._sym_ids.get(sym)
+            if sid is None:
+                sid = self._sym_ids[sym] = len(self._sym_ids)
+                new_syms.append(sym)
+            pc = q.get("prev_close")
+            RECORD.pack_into(
+                buf, off, ts, sid,
+                q["ltp"], q["open"], q["high"], q["low"],
+                nan if pc is None else pc,
+                int(q.get("volume", 0)),
+            )
+            off += RECORD.size
+        if new_syms:
+            # Symbols must be durable before any record that references them
+            self._sym_file.write("".join(s + "\n" for s in new_syms))
+            self._sym_file.flush()
+        self._file.write(buf)
+        self._size += len(buf)
+
+
+# -----------------------------
+# Reading & Replay
+# -----------------------------
+
+def open_segment(path: str) -> Tuple[np.ndarray, List[str]]:
+    """Memory-map a segment; returns (records, symbols) without copying the records."""
+    with open(path + ".symbols", encoding='utf-8') as f:
+        symbols = [line.rstrip("\n") for line in f]
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            return np.empty(0, dtype=RECORD_DTYPE), symbols
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, rec_size, _ = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC or rec_size != RECORD.size:
+        raise ValueError(f"{path}: not a tick log segment")
+    count = (size - HEADER.size) // RECORD.size  # ignore a torn trailing record
+    return np.frombuffer(mm, dtype=RECORD_DTYPE, count=count, offset=HEADER.size), symbols
+
+
+def _time_of_day(hhmm: Optional[str]) -> Optional[float]:
+    if not hhmm:
+        return None
+    parts = [int(p) for p in hhmm.split(":")]
+    while len(parts) < 3:
+        parts.append(0)
+    return parts[0] * 3600 + parts[1] * 60 + parts[2]
+
+
+class TickReplayer:
+    """Yield recorded snapshots in order and compute pacing for 1x, Nx or max speed."""
+
+    def __init__(self, paths: List[str], speed: Optional[float] = None,
+                 start: Optional[str] = None, end: Optional[str] = None):
+        self.paths = sorted(paths)
+        self.speed = speed  # None or <= 0 means as fast as possible
+        self.start = _time_of_day(start)
+        self.end = _time_of_day(end)
+
+    @staticmethod
+    def parse_speed(value: Optional[str]) -> Optional[float]:
+        if value is None or str(value).lower() in ("", "max", "0"):
+            return None
+        return float(str(value).rstrip("xX"))
+
+    def delay(self, prev_ts: Optional[float], ts: float) -> float:
+        if prev_ts is None or not self.speed or self.speed <= 0:
+            return 0.0
+        return max(ts - prev_ts, 0.0) / self.speed
+
+    def _in_window(self, ts: float) -> bool:
+        if self.start is None and self.end is None:
+            return True
+        d = datetime.fromtimestamp(ts)
+        tod = d.hour * 3600 + d.minute * 60 + d.second
+        return (self.start is None or tod >= self.start) and (self.end is None or tod <= self.end)
+
+    def snapshots(self) -> Iterator[Tuple[float, Dict[str, Dict]]]:
+        for path in self.paths:
+            recs, symbols = open_segment(path)
+            if len(recs) == 0:
+                continue
+            ts = recs['ts']
+            # One snapshot = a run of records sharing the same timestamp
+            bounds = np.concatenate([[0], np.flatnonzero(np.diff(ts)) + 1, [len(recs)]])
+            cols = {name: recs[name] for name in ("ltp", "open", "high", "low", "prev_close", "volume")}
+            sym_ids = recs['sym']
+            for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+                t = float(ts[a])
+                if not self._in_window(t):
+                    continue
+                ltp, op, hi, lo, pc, vol = (cols[k][a:b].tolist() for k in
+                                            ("ltp", "open", "high", "low", "prev_close", "volume"))
+                quotes = {}
+                for i, sid in enumerate(sym_ids[a:b].tolist()):
+                    quotes[symbols[sid]] = {
+                        "ltp": ltp[i], "open": op[i], "high": hi[i], "low": lo[i],
+                        "volume": vol[i], "prev_close": None if pc[i] != pc[i] else pc[i],
+                    }
+                yield t, quotes
+
+
+def replay_paths(pattern: str) -> List[str]:
+    paths: List[str] = []
+    for p in pattern.split(os.pathsep):
+        paths.extend(glob.glob(p))
+    return sorted(x for x in paths if x.endswith(".bin"))
+
+
+# Always-on recorder instance; set TICK_RECORDER=0 to disable
+tick_recorder = TickRecorder(enabled=os.getenv("TICK_RECORDER", "1") != "0")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    rp = sub.add_parser('replay', help='Replay segments through NotifyAutoBuyEngine')
+    rp.add_argument('paths', nargs='+')
+    rp.add_argument('--speed', default='max', help="'max', or a multiplier such as 1 or 10")
+    rp.add_argument('--start', help='Only replay from HH:MM[:SS]')
+    rp.add_argument('--end', help='Only replay until HH:MM[:SS]')
+    rp.add_argument('--selection', help='JSON list of {token, autobuy, quantity} like /api/autobuy/selection')
+    rp.add_argument('--margin', type=float, default=100000.0)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from auto_trade import NotifyAutoBuyEngine, TokenAutoBuyConfig, TickBatch, MarginSnapshot
+
+    selection = []
+    if args.selection:
+        with open(args.selection, encoding='utf-8') as f:
+            selection = [TokenAutoBuyConfig(token=i["token"], autobuy=bool(i.get("autobuy", False)),
+                                            quantity=int(i.get("quantity", 1))) for i in json.load(f)]
+
+    replayer = TickReplayer(args.paths, TickReplayer.parse_speed(args.speed), args.start, args.end)
+    current: Dict[str, object] = {"ts": 0.0, "quotes": {}}
+
+    def get_ticks():
+        return TickBatch.from_quotes(current["quotes"], current["ts"])
+
+    def notify(kind, payload):
+        print(f"{datetime.fromtimestamp(current['ts']):%H:%M:%S} NOTIFY[{kind}] {payload}")
+
+    def place_buy(token, qty):
+        return True, f"REPLAY-{int(current['ts'])}"
+
+    engine = NotifyAutoBuyEngine(
+        token_config=selection,
+        get_latest_ticks=get_ticks,
+        get_margin=lambda: MarginSnapshot(available=args.margin),
+        send_notification=notify,
+        place_buy_order=place_buy,
+    )
+
+    started = time.time()
+    prev_ts = None
+    count = 0
+    for ts, quotes in replayer.snapshots():
+        wait = replayer.delay(prev_ts, ts)
+        if wait:
+            time.sleep(wait)
+        current["ts"], current["quotes"] = ts, quotes
+        engine.step()
+        engine.log.entries.clear()
+        prev_ts = ts
+        count += 1
+    print(f"Replayed {count} snapshots in {time.time() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Warm-start snapshots of in-memory engine state.
+
+Without them a restarted backend begins cold: no quotes until the first poll,
+no auto-buy selection, no armed exits and no memory of which signals already
+became orders. main.py periodically hands WarmState.save() a dict of sections
+
+    quotes         last normalized snapshot and when it was fetched
+    screener       per-symbol volume baselines (the screener's running history)
+    subscriptions  leased watchlist subscriptions and their expiry
+    autobuy        auto-buy selection (NotifyAutoBuyEngine.token_config_map)
+    exits          armed protections, including trailing-stop peaks
+    orders         recent order tickets; their idempotency keys keep a signal that
+                   already produced an order from placing it again
+    signals        open signal episodes, so a signal that stays on across the restart
+                   keeps its order key
+    notifications  the notification buffer
+
+and restores them in its startup hook, before uvicorn accepts requests.
+
+The file is gzip-compressed JSON, written to a temp file and moved into place
+with os.replace, so a crash mid-save leaves the previous snapshot intact. An
+unchanged payload is not rewritten. load() ignores snapshots from another day
+or older than max_age seconds.
+"""
+import gzip
+import json
+import os
+import time
+import zlib
+from datetime import date
+from typing import Dict, Optional
+
+from snapshot_cache import dumps
+
+FORMAT = 1
+
+
+class WarmState:
+    def __init__(self, filename: str = 'warm_state.json.gz'):
+        app_data = os.path.join(os.getenv('LOCALAPPDATA', os.path.expanduser('~')), 'AntigravityTrader')
+        os.makedirs(app_data, exist_ok=True)
+        self.path = os.path.join(app_data, filename)
+        self.saved = 0.0
+        self._crc: Optional[int] = None
+
+    def save(self, sections: Dict) -> bool:
+        """Write sections atomically; False if they match what was last written."""
+        body = dumps(sections)
+        crc = zlib.crc32(body)
+        if crc == self._crc:
+            return False
+        now = time.time()
+        header = dumps({'format': FORMAT, 'saved': now, 'date': date.fromtimestamp(now).isoformat()})
+        # Header first so load() can reject old files without parsing the sections
+        payload = header[:-1] + b',"sections":' + body + b'}'
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(gzip.compress(payload, compresslevel=1, mtime=0))
+        os.replace(tmp, self.path)
+        self._crc = crc
+        self.saved = now
+        return True
+
+    def load(self, max_age: float) -> Optional[Dict]:
+        """Sections of a snapshot saved today within max_age seconds, else None."""
+        try:
+            with open(self.path, 'rb') as f:
+                stored = json.loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError) as e:
+            print(f"Warm state: ignoring unreadable {self.path}: {e}")
+            return None
+        saved = float(stored.get('saved', 0))
+        age = time.time() - saved
+        if stored.get('format') != FORMAT or stored.get('date') != date.today().isoformat() or age > max_age:
+            print(f"Warm state: skipping snapshot from {time.ctime(saved)}")
+            return None
+        print(f"Warm state: restoring snapshot saved {age:.1f}s ago")
+        return stored.get('sections') or {}
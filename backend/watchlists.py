@@ -0,0 +1,199 @@
+"""
+Runtime watchlists and the symbol subscription registry.
+
+WatchlistStore persists named symbol lists in watchlists.db next to orders.db;
+the first run seeds a 'default' list from the built-in token set.
+
+SubscriptionRegistry decides what the market-data poller fetches. Each consumer
+registers the symbols it needs under an owner name:
+
+    ui:<watchlist>   a client polling /api/tokens for that list (leased, expires)
+    autobuy          the auto-buy selection
+    exits            symbols with armed stop/target levels
+    pinned:<name>    watchlists kept live without a client (PINNED_WATCHLISTS)
+
+Symbols are reference-counted across owners. subscribe() applies only the
+difference against the owner's previous set, and the fetch list (symbols()) is
+rebuilt only when a symbol enters or leaves the union. The version counter
+tells callers when that happened.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from market_data import split_symbol
+
+
+def normalize_symbol(symbol: str) -> str:
+    """'infy' -> 'NSE:INFY'; exchange-qualified symbols keep their exchange."""
+    ex, sym = split_symbol(symbol.strip())
+    return f"{ex.upper()}:{sym.upper()}"
+
+
+class WatchlistStore:
+    def __init__(self, db_path='watchlists.db', seed: Optional[List[str]] = None):
+        app_data = os.path.join(os.getenv('LOCALAPPDATA', os.path.expanduser('~')), 'AntigravityTrader')
+        os.makedirs(app_data, exist_ok=True)
+        self.db_path = os.path.join(app_data, db_path)
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[int, List[str]]] = {}  # name -> (revision, symbols)
+        self.init_db(seed or [])
+
+    def init_db(self, seed: List[str]):
+        """Create the table, seed 'default' on first run and load everything into memory"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS watchlists (
+                name TEXT PRIMARY KEY,
+                symbols TEXT NOT NULL,
+                revision INTEGER DEFAULT 1,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('SELECT COUNT(*) FROM watchlists')
+        if cursor.fetchone()[0] == 0 and seed:
+            cursor.execute('INSERT INTO watchlists (name, symbols) VALUES (?, ?)',
+                           ('default', json.dumps(seed)))
+        conn.commit()
+        conn.close()
+        self.reload()
+
+    def reload(self):
+        """Re-read every list from disk (another process may have edited them)"""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute('SELECT name, revision, symbols FROM watchlists').fetchall()
+        conn.close()
+        self._cache = {name: (rev, json.loads(symbols)) for name, rev, symbols in rows}
+
+    def names(self) -> List[str]:
+        return sorted(self._cache)
+
+    def get(self, name: str) -> Optional[List[str]]:
+        entry = self._cache.get(name)
+        return entry[1] if entry else None
+
+    def revision(self, name: str) -> int:
+        entry = self._cache.get(name)
+        return entry[0] if entry else 0
+
+    def list(self) -> List[Dict]:
+        return [{"name": n, "symbols": self._cache[n][1], "revision": self._cache[n][0]} for n in self.names()]
+
+    def save(self, name: str, symbols: Iterable[str]) -> List[str]:
+        """Create or replace a watchlist; symbols are normalized and de-duplicated in order"""
+        cleaned = list(dict.fromkeys(normalize_symbol(s) for s in symbols if s and s.strip()))
+        with self._lock:
+            rev = self.revision(name) + 1
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('''
+                INSERT OR REPLACE INTO watchlists (name, symbols, revision, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (name, json.dumps(cleaned), rev))
+            conn.commit()
+            conn.close()
+            self._cache[name] = (rev, cleaned)
+        return cleaned
+
+    def delete(self, name: str) -> bool:
+        with self._lock:
+            conn = sqlite3.connect(self.db_path)
+            deleted = conn.execute('DELETE FROM watchlists WHERE name = ?', (name,)).rowcount
+            conn.commit()
+            conn.close()
+            self._cache.pop(name, None)
+        return deleted > 0
+
+
+class SubscriptionRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._owners: Dict[str, frozenset] = {}
+        self._leases: Dict[str, float] = {}  # owner -> expiry (wall clock)
+        self._refs: Dict[str, int] = {}      # insertion-ordered: first subscriber sets position
+        self._symbols: Tuple[str, ...] = ()
+        self.version = 0
+
+    def subscribe(self, owner: str, symbols: Iterable[str], ttl: Optional[float] = None) -> bool:
+        """Set owner's symbols (replacing its previous set). Returns True if new symbols joined the union."""
+        new = frozenset(symbols)
+        with self._lock:
+            if ttl is not None:
+                self._leases[owner] = time.time() + ttl
+            old = self._owners.get(owner, frozenset())
+            if new == old:
+                return False
+            self._owners[owner] = new
+            added = self._apply(new - old, old - new)
+            if not new:
+                self._owners.pop(owner, None)
+                self._leases.pop(owner, None)
+            return added
+
+    def renew(self, owner: str, ttl: float) -> bool:
+        """Extend owner's lease without re-diffing its symbols; False if it is not subscribed."""
+        with self._lock:
+            if owner not in self._owners:
+                return False
+            self._leases[owner] = time.time() + ttl
+            return True
+
+    def has(self, owner: str) -> bool:
+        return owner in self._owners
+
+    def unsubscribe(self, owner: str) -> None:
+        self.subscribe(owner, ())
+
+    def _apply(self, add, remove) -> bool:
+        changed = added = False
+        refs = self._refs
+        for s in add:
+            n = refs.get(s, 0)
+            refs[s] = n + 1
+            if n == 0:
+                changed = added = True
+        for s in remove:
+            n = refs.get(s, 0) - 1
+            if n <= 0:
+                refs.pop(s, None)
+                changed = True
+            else:
+                refs[s] = n
+        if changed:
+            self._symbols = tuple(refs)
+            self.version += 1
+        return added
+
+    def expire(self, now: Optional[float] = None) -> List[str]:
+        """Drop leased owners whose lease ran out (e.g. a closed browser tab)"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            stale = [o for o, until in self._leases.items() if until < now]
+        for owner in stale:
+            self.unsubscribe(owner)
+        return stale
+
+    def symbols(self) -> Tuple[str, ...]:
+        return self._symbols
+
+    def leased(self) -> Dict[str, Dict]:
+        """owner -> {symbols, expires} for every leased owner (e.g. to carry over a restart)."""
+        with self._lock:
+            return {o: {"symbols": list(self._owners[o]), "expires": until}
+                    for o, until in self._leases.items() if o in self._owners}
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            now = time.time()
+            return {
+                "version": self.version,
+                "symbols": len(self._symbols),
+                "owners": {
+                    o: {"symbols": len(s),
+                        "expires_in": round(self._leases[o] - now, 1) if o in self._leases else None}
+                    for o, s in self._owners.items()
+                },
+            }
@@ -25,13 +25,19 @@ export const useAutoTradeExecution = ({ tokens, strategies }: UseAutoTradeProps)
         if (!tokens || tokens.length === 0) return;
 
         tokens.forEach(token => {
+            // A signal that dropped (or flipped side) may fire again when it comes back
+            for (const side of ['BUY', 'SELL']) {
+                if (token.signal !== side) processedSignals.current.delete(`signal:${token.symbol}:${side}`);
+            }
+
             // Only process if there's a BUY or SELL signal
             if (token.signal !== 'BUY' && token.signal !== 'SELL') return;
 
-            // Create unique key for this signal
-            const signalKey = `${token.symbol}-${token.signal}-${Date.now()}`;
+            // One key per symbol/side; the server maps it to the open signal episode it
+            // shares with the auto-buy engine, so repeats from any window collapse
+            const signalKey = `signal:${token.symbol}:${token.signal}`;
 
-            // Check if we already processed this signal recently
+            // Already acted on while this signal stays on
             if (processedSignals.current.has(signalKey)) return;
 
             // Find matching strategy
@@ -56,13 +62,9 @@ export const useAutoTradeExecution = ({ tokens, strategies }: UseAutoTradeProps)
                     quantity: config.quantity,
                     order_type: token.signal,
                     strategy: token.strategy,
-                    price: token.ltp
+                    price: token.ltp,
+                    idempotency_key: signalKey
                 });
-
-                // Clear old processed signals after 5 minutes to allow re-triggering
-                setTimeout(() => {
-                    processedSignals.current.delete(signalKey);
-                }, 5 * 60 * 1000);
             }
         });
     }, [tokens, strategies]);
@@ -75,6 +77,7 @@ async function executeTrade(order: {
     order_type: string;
     strategy: string;
     price: number;
+    idempotency_key: string;
 }) {
     try {
         const response = await fetch('http://127.0.0.1:8000/api/execute-trade', {
@@ -86,13 +89,17 @@ async function executeTrade(order: {
         const result = await response.json();
 
         if (result.success) {
-            console.log(`✅ Trade Executed: ${result.message}`);
-            console.log(`Order ID: ${result.order_id}`);
+            if (result.duplicate) {
+                console.log(`↩️ Duplicate signal ignored: ${result.idempotency_key} (${result.status})`);
+                return;
+            }
+            console.log(`✅ Trade Queued: ${result.message}`);
+            console.log(`Order Key: ${result.idempotency_key}`);
 
             // Show desktop notification
             if ('Notification' in window && Notification.permission === 'granted') {
-                new Notification('🚀 Trade Executed!', {
-                    body: `${order.order_type} ${order.quantity} ${order.symbol}\nStrategy: ${order.strategy}\nOrder ID: ${result.order_id}`,
+                new Notification('🚀 Trade Submitted!', {
+                    body: `${order.order_type} ${order.quantity} ${order.symbol}\nStrategy: ${order.strategy}\nStatus: ${result.status}`,
                     icon: 'data:image/svg+xml,<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100"><text y="75" font-size="75">💰</text></svg>',
                     requireInteraction: true
                 });